@@ -4,6 +4,9 @@ from datetime import datetime
 from enum import Enum
 from pydantic import validator
 
+# Requests accepted in one batch analysis call
+BATCH_MAX_ITEMS = 50
+
 
 class Language(str, Enum):
     ENGLISH = "english"
@@ -23,6 +26,10 @@ class RentalAnalysisRequest(BaseModel):
     document_content: Optional[str] = None
     language: Language = Language.ENGLISH
     voice_output: bool = False
+    # OCR confidence of document_content in [0, 1], None if it wasn't OCR'd
+    document_quality: Optional[float] = Field(None, ge=0, le=1)
+    # Re-analyze an edited lease: only clauses changed since this analysis are re-checked
+    previous_analysis_id: Optional[str] = None
 
     class Config:
         schema_extra = {
@@ -31,7 +38,8 @@ class RentalAnalysisRequest(BaseModel):
                 "property_address": "123 Main St, Anytown, NY 10001",
                 "document_content": None,
                 "language": "english",
-                "voice_output": False
+                "voice_output": False,
+                "document_quality": None
             }
         }
 
@@ -56,6 +64,24 @@ class ClauseAnalysis(BaseModel):
     legal_reference: Optional[str] = None  # Changed from california_law to be more generic
 
 
+class PreliminaryFlag(BaseModel):
+    """A red flag found by the local pre-screen, before any LLM analysis."""
+    rule: str
+    flag: str
+    severity: str
+    description: str
+    text: str
+
+
+class SuspectLeaserMatch(BaseModel):
+    """A reported suspect leaser whose contact details appear in the lease or listing."""
+    id: Optional[str] = None
+    name: Optional[str] = None
+    flags: List[str] = []
+    reported_count: int = 0
+    matched_on: List[str] = []
+
+
 class ScamLikelihood(str, Enum):
     LOW = "Low"
     MEDIUM = "Medium"
@@ -79,6 +105,15 @@ class TrustworthinessGrade(str, Enum):
     F = "F"
 
 
+class PrescreenResponse(BaseModel):
+    """Instant result of the local red-flag pre-screen."""
+    scam_likelihood: ScamLikelihood
+    score: float
+    clear_cut: bool
+    flags: List[PreliminaryFlag] = []
+    elapsed_ms: float
+
+
 class CaliforniaTenantRights(BaseModel):
     """Model for California-specific tenant rights information"""
     relevant_statutes: List[str] = []
@@ -101,6 +136,12 @@ class AnalysisResult(BaseModel):
     raw_response: Optional[str] = None
     tenant_rights: Optional[Dict[str, List[str]]] = None  # Changed from california_tenant_rights
     key_lease_terms: Optional[Dict[str, Any]] = None
+    preliminary_flags: Optional[List[PreliminaryFlag]] = None
+    previous_analysis_id: Optional[str] = None
+    changed_clauses: Optional[List[str]] = None
+    suspect_leaser_matches: Optional[List[SuspectLeaserMatch]] = None
+    partial: Optional[bool] = None  # Only the local pre-screen finished within the request deadline
+    lease_cluster_id: Optional[str] = None  # Cluster of near-identical uploaded leases
     
     # Convert from non-Enum to Enum if needed
     @validator('scam_likelihood', pre=True)
@@ -159,3 +200,29 @@ class AnalysisResult(BaseModel):
                 }
             }
         }
+
+
+class BatchAnalysisRequest(BaseModel):
+    """Several analyses submitted at once."""
+    items: List[RentalAnalysisRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class BatchAnalysisItem(BaseModel):
+    """One line of a batch analysis stream: the result or error for items[index]."""
+    index: int
+    result: Optional[AnalysisResult] = None
+    error: Optional[str] = None
+
+
+class LeaseClusterStats(BaseModel):
+    """A cluster of near-identical uploaded leases (one lease template)."""
+    id: str
+    size: int
+    high_risk_count: int  # Leases in the cluster Gemini analyzed as high scam likelihood
+    analyzed_count: int = 0  # Leases in the cluster Gemini analyzed (not answered from the cluster)
+    recent_count: int  # Leases in the cluster uploaded in the last 7 days
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    scam_likelihood: Optional[ScamLikelihood] = None
+    risk_level: Optional[str] = None
+    verdict_analysis_id: Optional[str] = None  # Analysis whose verdict copies of the template get
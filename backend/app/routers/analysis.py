@@ -1,15 +1,21 @@
-from fastapi import APIRouter, HTTPException, Body, Depends
-from typing import Dict, Any
-from app.models.rental import RentalAnalysisRequest, AnalysisResult
+from fastapi import APIRouter, HTTPException, Body, Depends, Header, Query
+from typing import Dict, Any, List, Optional
+from app.models.rental import RentalAnalysisRequest, AnalysisResult, PrescreenResponse, BatchAnalysisRequest, LeaseClusterStats
 from app.services.analysis_service import AnalysisService
-from fastapi.responses import JSONResponse
+from app.utils.idempotency import idempotent, request_fingerprint
+from app.utils.deadline import DeadlineExceeded
+from app.utils.projection import parse_fields
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 router = APIRouter(prefix="/analysis", tags=["analysis"])
 
 
 @router.post("/analyze-rental", response_model=AnalysisResult)
 async def analyze_rental(
-    request: RentalAnalysisRequest = Body(...)
+    request: RentalAnalysisRequest = Body(...),
+    idempotency_key: Optional[str] = Header(None),
+    include_raw: bool = False,
+    fields: Optional[str] = None
 ) -> AnalysisResult:
     """
     Analyze a rental based on provided information.
@@ -22,8 +28,17 @@ async def analyze_rental(
     Additional options:
     - language: Preferred language for results
     - voice_output: Whether voice output is requested
+
+    Response shape:
+    - fields: Comma-separated fields to return (the required ones are always included)
+    - include_raw: Include the raw Gemini response (left out by default)
+
+    A retry with the same Idempotency-Key header gets the original response
+    instead of a second analysis.
     """
     try:
+        selected = parse_fields(fields, AnalysisResult)
+
         # Validate that at least one of the required fields is provided
         if not (request.listing_url or request.property_address or request.document_content):
             raise HTTPException(
@@ -31,21 +46,100 @@ async def analyze_rental(
                 detail="At least one of listing_url, property_address, or document_content must be provided"
             )
 
-        # Process the analysis
-        result = await AnalysisService.analyze_rental(request)
-        return result
+        # Process the analysis, once per Idempotency-Key
+        async def run_analysis() -> Response:
+            result = await AnalysisService.analyze_rental(request)
+            return Response(content=AnalysisService.result_json(result, selected, include_raw), media_type="application/json")
+
+        return await idempotent(
+            "analyze_rental", idempotency_key, request_fingerprint(request.json(), include_raw, fields), run_analysis
+        )
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"{str(e)}. Please try again.")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"An error occurred: {str(e)}")
 
 
+@router.post("/prescreen", response_model=PrescreenResponse)
+async def prescreen_rental(
+    request: RentalAnalysisRequest = Body(...)
+) -> PrescreenResponse:
+    """
+    Instant preview of known scam markers in a lease document.
+
+    Runs only the local red-flag pre-screen (no LLM call) on document_content
+    and returns preliminary flags with a provisional scam likelihood.
+    """
+    try:
+        return await AnalysisService.prescreen(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/batch")
+async def analyze_batch(
+    request: BatchAnalysisRequest = Body(...),
+    include_raw: bool = False,
+    fields: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Analyze many rentals in one call.
+
+    Takes up to 50 analysis requests in `items` and streams NDJSON: one line
+    per item as soon as its analysis finishes, in completion order, each with
+    the item's `index` and either its `result` or an `error`. `fields` and
+    `include_raw` shape each result as in /analyze-rental.
+    """
+    try:
+        selected = parse_fields(fields, AnalysisResult)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if selected:
+        shape = {"include": {"index": True, "error": True, "result": selected}}
+    else:
+        shape = {"exclude": None if include_raw else {"result": {"raw_response"}}}
+
+    async def lines():
+        async for item in AnalysisService.analyze_batch(request.items):
+            yield item.json(**shape) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/lease-clusters", response_model=List[LeaseClusterStats])
+async def get_lease_clusters(
+    limit: int = Query(20, ge=1, le=100),
+    min_size: int = Query(2, ge=1)
+) -> List[LeaseClusterStats]:
+    """
+    Lease templates uploaded again and again, most active first.
+
+    Each cluster groups near-identical uploaded leases (the same template
+    with small edits) with its size, recent uploads and verdict.
+    """
+    return await AnalysisService.get_lease_clusters(limit=limit, min_size=min_size)
+
+
 @router.get("/{analysis_id}", response_model=AnalysisResult)
-async def get_analysis(analysis_id: str) -> AnalysisResult:
-    """Retrieve a previously performed analysis by ID."""
-    result = await AnalysisService.get_analysis_by_id(analysis_id)
+async def get_analysis(analysis_id: str, include_raw: bool = False, fields: Optional[str] = None) -> Response:
+    """
+    Retrieve a previously performed analysis by ID.
+
+    The raw Gemini response is left out unless include_raw=true; `fields`
+    (comma-separated) returns only those fields, plus the required ones.
+    """
+    try:
+        selected = parse_fields(fields, AnalysisResult)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await AnalysisService.get_analysis_json(analysis_id, include_raw=include_raw, fields=selected)
     if result is None:
         raise HTTPException(status_code=404, detail="Analysis not found")
-    return result
+    # Already serialized from a validated AnalysisResult
+    return Response(content=result, media_type="application/json")
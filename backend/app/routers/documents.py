@@ -1,20 +1,32 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from typing import List, Optional
 from datetime import datetime
 import uuid
 
+from pymongo import DESCENDING
+
 from app.utils.db import Database
+from app.utils.pagination import after_cursor, next_cursor, NEXT_CURSOR_HEADER
+from app.utils.projection import parse_fields, mongo_projection
+
+# Newest first; _id breaks ties between documents created at the same time
+DOCUMENT_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 
 @router.get("/")
 async def list_documents(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     min_score: Optional[int] = Query(None, ge=0, le=100),
     type: Optional[str] = Query(
-        None, description="Document type (e.g., lease, listing)")
+        None, description="Document type (e.g., lease, listing)"),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return (default: all)")
 ):
     """
     List fake rental documents with optional filtering.
@@ -23,6 +35,10 @@ async def list_documents(
     - limit: Maximum number of documents to return
     - min_score: Minimum scam score
     - type: Document type filter
+    - cursor: Continue after the previous page (faster than skip for deep pages)
+    - fields: Only return these fields (and _id)
+
+    The X-Next-Cursor response header holds the cursor of the next page.
     """
     db = Database.get_db()
     fake_documents = db.fake_documents
@@ -34,10 +50,23 @@ async def list_documents(
     if type:
         query["type"] = type
 
+    try:
+        query = after_cursor(query, DOCUMENT_SORT, cursor)
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The sort keys are read too, for the next cursor
+    projection = mongo_projection(selected | {"_id", "created_at"}) if selected else None
+
     # Execute query
-    cursor = fake_documents.find(query).skip(
-        skip).limit(limit).sort("created_at", -1)
-    documents = await cursor.to_list(length=limit)
+    results = fake_documents.find(query, projection).skip(
+        skip).limit(limit).sort(DOCUMENT_SORT)
+    documents = await results.to_list(length=limit)
+
+    page_cursor = next_cursor(documents, DOCUMENT_SORT, limit)
+    if page_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page_cursor
 
     # Convert ObjectId to string for JSON serialization
     for doc in documents:
@@ -69,7 +98,9 @@ async def get_document(document_id: str):
 @router.get("/search/")
 async def search_documents(
     query: str = Query(..., min_length=3),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return (default: all)")
 ):
     """
     Search for fake documents using text search.
@@ -77,10 +108,16 @@ async def search_documents(
     db = Database.get_db()
     fake_documents = db.fake_documents
 
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    projection = mongo_projection(selected | {"_id"}) if selected else {}
+
     # Text search using MongoDB's text index
     cursor = fake_documents.find(
         {"$text": {"$search": query}},
-        {"score": {"$meta": "textScore"}}
+        {**projection, "score": {"$meta": "textScore"}}
     ).sort([("score", {"$meta": "textScore"})]).limit(limit)
 
     documents = await cursor.to_list(length=limit)
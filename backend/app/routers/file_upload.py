@@ -1,33 +1,35 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Response
-from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Response, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, List, Optional, Set
 from app.models.rental import RentalAnalysisRequest, AnalysisResult, Language
 from app.services.analysis_service import AnalysisService
-from app.utils.pdf_parser import extract_text_from_pdf
-import io
-import os
-import pytesseract
-from PIL import Image
-import pillow_heif
-import platform
+from app.utils.extractors import extract_document, ExtractedDocument
+from app.utils.document_merge import merge_documents
+from app.utils.ocr import combined_quality
+from app.utils.multipart_stream import iter_multipart_parts, MultipartStreamError, StreamedPart
+from app.utils.idempotency import idempotent, request_fingerprint
+from app.utils.deadline import DeadlineExceeded
+from app.utils.projection import parse_fields
+import asyncio
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Register HEIF/HEIC file format with Pillow
-pillow_heif.register_heif_opener()
+# Document kinds produced by OCR, which need a minimum amount of recognised text
+OCR_KINDS = ("image", "heic")
 
-# Set the Tesseract executable path based on operating system
-if platform.system() == 'Darwin':  # macOS
-    pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'
-elif platform.system() == 'Windows':
-    # Default Windows path, adjust if necessary
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-# Linux will use the default path which is usually correct if installed via package manager
+# OCR output below this quality score is too unreliable to analyze
+MIN_OCR_QUALITY = 0.3
+
+LOW_QUALITY_DETAIL = "The image is too blurry or dark to read reliably. Please upload a sharper, well-lit photo or try a different document format."
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
+# Maximum size of a single uploaded file
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+
 
 @router.options("/document")
 async def options_document():
@@ -41,114 +43,84 @@ async def upload_document(
     listing_url: Optional[str] = Form(None),
     property_address: Optional[str] = Form(None),
     language: Language = Form(Language.ENGLISH),
-    voice_output: bool = Form(False)
+    voice_output: bool = Form(False),
+    idempotency_key: Optional[str] = Header(None),
+    include_raw: bool = False,
+    fields: Optional[str] = None
 ) -> AnalysisResult:
     """
     Upload a lease document for analysis.
 
-    - file: Lease document file (PDF, text, or image)
+    - file: Lease document file (PDF, Word, text, or image)
     - listing_url: Optional URL of the rental listing
     - property_address: Optional physical address
     - language: Preferred language for results
     - voice_output: Whether voice output is requested
+
+    The fields and include_raw query parameters shape the response as in
+    /analysis/analyze-rental. A retry with the same Idempotency-Key header
+    gets the original response instead of a second analysis.
     """
     try:
-        # Read the file content
-        content = await file.read()
+        selected = parse_fields(fields, AnalysisResult)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Read the file content
+    content = await file.read()
+
+    return await idempotent(
+        "upload_document",
+        idempotency_key,
+        request_fingerprint(content, file.filename, listing_url, property_address, language.value, voice_output, include_raw, fields),
+        lambda: _analyze_upload(content, file, listing_url, property_address, language, voice_output, selected, include_raw)
+    )
 
+
+async def _analyze_upload(
+    content: bytes,
+    file: UploadFile,
+    listing_url: Optional[str],
+    property_address: Optional[str],
+    language: Language,
+    voice_output: bool,
+    selected: Optional[Set[str]] = None,
+    include_raw: bool = False
+) -> Response:
+    """Extract text from a single uploaded document and analyze it."""
+    try:
         # Check file size (limiting to 10MB)
-        if len(content) > 10 * 1024 * 1024:  # 10MB
+        if len(content) > MAX_UPLOAD_SIZE:
             raise HTTPException(
                 status_code=400,
                 detail="File size exceeds the 10MB limit"
             )
 
-        # Extract text based on file type
-        document_content = ""
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        content_type = file.content_type or ""
-        
-        logger.info(f"Processing file: {file.filename}, type: {content_type}, extension: {file_extension}")
-        
-        if file_extension == '.pdf':
-            # Parse PDF document
-            try:
-                document_content = extract_text_from_pdf(content)
-            except ValueError as pdf_error:
-                # Use the specific error message from the PDF parser
-                raise HTTPException(
-                    status_code=400,
-                    detail=str(pdf_error)
-                )
-            except Exception as e:
-                logger.error(f"Unexpected error parsing PDF: {str(e)}")
-                raise HTTPException(
-                    status_code=400,
-                    detail="Could not extract text from the PDF. The file might be corrupted, password-protected, or in an unsupported format."
-                )
-        elif content_type.startswith('image/') or file_extension in ['.heic', '.heif']:
-            # Process image using OCR
-            try:
-                # Check if it's a HEIC/HEIF file that needs special handling
-                is_heic = file_extension in ['.heic', '.heif'] or content_type in ['image/heic', 'image/heif']
-                
-                # Open the image using PIL with HEIC support
-                image = Image.open(io.BytesIO(content))
-                
-                # Convert HEIC to JPEG format for better compatibility
-                if is_heic:
-                    logger.info(f"Converting HEIC/HEIF image to JPEG: {file.filename}")
-                    try:
-                        # Convert to RGB mode if not already
-                        if image.mode != 'RGB':
-                            image = image.convert('RGB')
-                        
-                        # Create a BytesIO object to hold the converted JPEG
-                        jpeg_buffer = io.BytesIO()
-                        
-                        # Save as PNG instead of JPEG for better reliability
-                        image.save(jpeg_buffer, format='PNG')
-                        
-                        # Reset buffer position
-                        jpeg_buffer.seek(0)
-                        
-                        # Reopen as PNG for OCR processing
-                        image = Image.open(jpeg_buffer)
-                        logger.info(f"Successfully converted HEIC image to PNG format")
-                    except Exception as convert_error:
-                        logger.error(f"Error during HEIC conversion: {str(convert_error)}")
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Error converting HEIC image: {str(convert_error)}"
-                        )
-                
-                # Perform OCR to extract text
-                logger.info(f"Performing OCR on image: {file.filename}")
-                document_content = pytesseract.image_to_string(image)
-                logger.info(f"OCR completed, extracted {len(document_content)} characters")
-                
-                # Check if we got meaningful text
-                if not document_content or len(document_content.strip()) < 50:
-                    # If we got very little text, the OCR might have failed
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Could not extract enough text from the image. Please upload a clearer image or try a different document format."
-                    )
-            except Exception as e:
-                logger.error(f"Error processing image {file.filename}: {str(e)}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Error processing image: {str(e)}"
-                )
-        else:
-            # For other file types, treat as text
-            try:
-                document_content = content.decode("utf-8", errors="ignore")
-            except UnicodeDecodeError:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Unsupported file format. Please upload a PDF, image, or text document."
-                )
+        # Extract text based on the detected file type (magic bytes, not extension)
+        try:
+            extracted = await run_in_threadpool(
+                extract_document, content, file.filename, file.content_type
+            )
+        except ValueError as extraction_error:
+            # Extractors raise ValueError with a user-facing message
+            raise HTTPException(
+                status_code=400,
+                detail=str(extraction_error)
+            )
+        document_content = extracted.text
+
+        # Check if OCR produced meaningful text
+        if extracted.kind in OCR_KINDS and len(document_content.strip()) < 50:
+            # If we got very little text, the OCR might have failed
+            raise HTTPException(
+                status_code=400,
+                detail="Could not extract enough text from the image. Please upload a clearer image or try a different document format."
+            )
+        if extracted.quality_score is not None and extracted.quality_score < MIN_OCR_QUALITY:
+            raise HTTPException(
+                status_code=400,
+                detail=LOW_QUALITY_DETAIL
+            )
 
         # Check if we successfully extracted text
         if not document_content or document_content.strip() == "":
@@ -163,7 +135,8 @@ async def upload_document(
             property_address=property_address,
             document_content=document_content,
             language=language,
-            voice_output=voice_output
+            voice_output=voice_output,
+            document_quality=extracted.quality_score
         )
 
         # Process analysis
@@ -172,15 +145,17 @@ async def upload_document(
             
             # Create a response with explicit CORS headers
             return Response(
-                content=result.json(),
+                content=AnalysisService.result_json(result, selected, include_raw),
                 media_type="application/json",
                 headers={
                     "Access-Control-Allow-Origin": "*",
                     "Access-Control-Allow-Methods": "POST, OPTIONS",
-                    "Access-Control-Allow-Headers": "Content-Type, Authorization, Accept"
+                    "Access-Control-Allow-Headers": "Content-Type, Authorization, Accept, Idempotency-Key"
                 }
             )
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error analyzing document: {str(e)}")
             raise HTTPException(
@@ -193,6 +168,11 @@ async def upload_document(
             status_code=400,
             detail="Could not decode the document. Please ensure it's a valid text file."
         )
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=504,
+            detail=f"{str(e)}. Please try again, or upload fewer or smaller files."
+        )
     except HTTPException:
         # Re-raise HTTP exceptions without modification
         raise
@@ -221,168 +201,223 @@ async def options_documents():
         headers={
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "POST, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization, Accept"
+            "Access-Control-Allow-Headers": "Content-Type, Authorization, Accept, Idempotency-Key"
         }
     )
 
 
-@router.post("/documents", response_model=AnalysisResult)
-async def upload_multiple_documents(
-    files: list[UploadFile] = File(...),
-    listing_url: Optional[str] = Form(None),
-    property_address: Optional[str] = Form(None),
-    language: Language = Form(Language.ENGLISH),
-    voice_output: bool = Form(False)
-) -> AnalysisResult:
+def _extract_part(filename: str, content_type: str, content: bytes) -> ExtractedDocument:
+    """
+    Extract text from a single uploaded file of a multi-file submission.
+
+    Runs in a worker thread so OCR and PDF parsing don't block the event loop
+    while the remaining files are still being received.
+    """
+    try:
+        return extract_document(content, filename, content_type)
+    except ValueError as extraction_error:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error in file {filename}: {str(extraction_error)}"
+        )
+
+
+def _parse_form_bool(value: Optional[str]) -> bool:
+    """Parse a boolean form field the same way FastAPI's Form(bool) does."""
+    if value is None:
+        return False
+    return value.strip().lower() in ("1", "true", "on", "yes")
+
+
+# The body is parsed by hand (see _analyze_multiple_uploads), so its form
+# fields are declared for the OpenAPI schema here
+MULTIPLE_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                            "description": "Lease documents (PDF, Word, text, or images including HEIC/HEIF)"
+                        },
+                        "listing_url": {"type": "string", "description": "URL of the rental listing"},
+                        "property_address": {"type": "string", "description": "Physical address"},
+                        "language": {
+                            "type": "string",
+                            "enum": [language.value for language in Language],
+                            "default": Language.ENGLISH.value,
+                            "description": "Preferred language for results"
+                        },
+                        "voice_output": {"type": "boolean", "default": False, "description": "Whether voice output is requested"}
+                    }
+                }
+            }
+        }
+    },
+    "parameters": [
+        {"name": "fields", "in": "query", "required": False, "schema": {"type": "string"}},
+        {"name": "include_raw", "in": "query", "required": False, "schema": {"type": "boolean", "default": False}},
+        {"name": "Idempotency-Key", "in": "header", "required": False, "schema": {"type": "string"}}
+    ]
+}
+
+
+@router.post("/documents", response_model=AnalysisResult, openapi_extra=MULTIPLE_UPLOAD_BODY)
+async def upload_multiple_documents(request: Request) -> AnalysisResult:
     """
     Upload multiple lease documents (like multiple photos of a lease) for combined analysis.
 
-    - files: Multiple files (PDF, text, or images including HEIC/HEIF)
+    See _analyze_multiple_uploads for the form fields; the fields and
+    include_raw query parameters shape the response as in
+    /analysis/analyze-rental. A retry with the same Idempotency-Key header
+    gets the original response instead of a second analysis. The files are
+    streamed straight into extraction, so the parts are hashed as they
+    arrive; a retry's body is read and hashed the same way, and a key reused
+    for different files gets a 422.
+    """
+    try:
+        selected = parse_fields(request.query_params.get("fields"), AnalysisResult)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    include_raw = _parse_form_bool(request.query_params.get("include_raw"))
+    query = (request.query_params.get("fields"), include_raw)
+
+    async def read_fingerprint() -> str:
+        digests = []
+        try:
+            async for part in iter_multipart_parts(request, max_part_size=MAX_UPLOAD_SIZE):
+                digests.append(_part_digest(part))
+        except MultipartStreamError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return request_fingerprint(*digests, *query)
+
+    return await idempotent(
+        "upload_documents",
+        request.headers.get("Idempotency-Key"),
+        None,
+        lambda set_fingerprint: _analyze_multiple_uploads(
+            request, selected, include_raw,
+            lambda digests: set_fingerprint(request_fingerprint(*digests, *query))
+        ),
+        read_fingerprint
+    )
+
+
+def _part_digest(part: StreamedPart) -> str:
+    """Hash of one multipart part, for the request fingerprint."""
+    return request_fingerprint(part.name, part.filename or "", part.content_type, part.data)
+
+
+async def _analyze_multiple_uploads(
+    request: Request,
+    selected: Optional[Set[str]] = None,
+    include_raw: bool = False,
+    on_body_read: Optional[Callable[[List[str]], None]] = None
+) -> Response:
+    """
+    Upload multiple lease documents (like multiple photos of a lease) for combined analysis.
+
+    The multipart body is parsed as it streams in: each file is handed to text
+    extraction as soon as its part is complete, so OCR of the first photos
+    overlaps with the upload of the later ones. Each part is hashed as it
+    arrives and on_body_read gets the hashes once the whole body is in.
+
+    Form fields:
+    - files: Multiple files (PDF, Word, text, or images including HEIC/HEIF)
     - listing_url: Optional URL of the rental listing
     - property_address: Optional physical address
     - language: Preferred language for results
     - voice_output: Whether voice output is requested
     """
-    if not files or len(files) == 0:
-        raise HTTPException(
-            status_code=400,
-            detail="No files provided for analysis"
-        )
-    
+    extraction_tasks = []
+    fields = {}
+    digests = []
+
     try:
-        # Process each file and combine the extracted text
-        combined_text = []
-        
-        for file in files:
-            # Read the file content
-            content = await file.read()
-
-            # Check individual file size (limiting to 10MB)
-            if len(content) > 10 * 1024 * 1024:  # 10MB
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {file.filename} exceeds the 10MB limit"
-                )
-
-            # Extract text based on file type
-            document_content = ""
-            file_extension = os.path.splitext(file.filename)[1].lower()
-            content_type = file.content_type or ""
-            
-            logger.info(f"Processing file: {file.filename}, type: {content_type}, extension: {file_extension}")
-            
-            if file_extension == '.pdf':
-                # Parse PDF document
-                try:
-                    document_content = extract_text_from_pdf(content)
-                except ValueError as pdf_error:
-                    # Use the specific error message from the PDF parser
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Error in file {file.filename}: {str(pdf_error)}"
-                    )
-                except Exception as e:
-                    logger.error(f"Unexpected error parsing PDF {file.filename}: {str(e)}")
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Could not extract text from the PDF {file.filename}. The file might be corrupted, password-protected, or in an unsupported format."
-                    )
-            elif content_type.startswith('image/') or file_extension in ['.heic', '.heif']:
-                # Process image using OCR
-                try:
-                    # Check if it's a HEIC/HEIF file that needs special handling
-                    is_heic = file_extension in ['.heic', '.heif'] or content_type in ['image/heic', 'image/heif']
-                    
-                    # Open the image using PIL with HEIC support
-                    image = Image.open(io.BytesIO(content))
-                    
-                    # Convert HEIC to JPEG format for better compatibility
-                    if is_heic:
-                        logger.info(f"Converting HEIC/HEIF image to JPEG: {file.filename}")
-                        try:
-                            # Convert to RGB mode if not already
-                            if image.mode != 'RGB':
-                                image = image.convert('RGB')
-                            
-                            # Create a BytesIO object to hold the converted JPEG
-                            jpeg_buffer = io.BytesIO()
-                            
-                            # Save as PNG instead of JPEG for better reliability
-                            image.save(jpeg_buffer, format='PNG')
-                            
-                            # Reset buffer position
-                            jpeg_buffer.seek(0)
-                            
-                            # Reopen as PNG for OCR processing
-                            image = Image.open(jpeg_buffer)
-                            logger.info(f"Successfully converted HEIC image to PNG format")
-                        except Exception as convert_error:
-                            logger.error(f"Error during HEIC conversion: {str(convert_error)}")
-                            raise HTTPException(
-                                status_code=400,
-                                detail=f"Error converting HEIC image: {str(convert_error)}"
-                            )
-                    
-                    # Perform OCR to extract text
-                    logger.info(f"Performing OCR on image: {file.filename}")
-                    document_content = pytesseract.image_to_string(image)
-                    logger.info(f"OCR completed, extracted {len(document_content)} characters")
-                    
-                    # No need to check for minimum text length per image - we'll combine all
-                except Exception as e:
-                    logger.error(f"Error processing image {file.filename}: {str(e)}")
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Error processing image {file.filename}: {str(e)}"
-                    )
+        # Dispatch each file to extraction the moment its part has been received
+        async for part in iter_multipart_parts(request, max_part_size=MAX_UPLOAD_SIZE):
+            digests.append(_part_digest(part))
+            if part.is_file:
+                if part.name != "files":
+                    continue
+                extraction_tasks.append(asyncio.create_task(run_in_threadpool(
+                    _extract_part,
+                    part.filename or "upload",
+                    part.content_type,
+                    part.data
+                )))
             else:
-                # For other file types, treat as text
-                try:
-                    document_content = content.decode("utf-8", errors="ignore")
-                except UnicodeDecodeError:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Unsupported file format for {file.filename}. Please upload PDF, image, or text documents."
-                    )
-
-            # Add the extracted text to our collection
-            if document_content and document_content.strip():
-                combined_text.append(document_content.strip())
+                fields[part.name] = part.text()
+        if on_body_read is not None:
+            on_body_read(digests)
+
+        if not extraction_tasks:
+            raise HTTPException(
+                status_code=400,
+                detail="No files provided for analysis"
+            )
+
+        try:
+            language = Language(fields.get("language") or Language.ENGLISH.value)
+        except ValueError:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unsupported language: {fields.get('language')}"
+            )
+
+        # Wait for the extractions still running; they keep the upload order
+        extracted_documents = await asyncio.gather(*extraction_tasks)
+
+        # Merge into one document, dropping duplicate photos and overlapping text
+        final_document_content, merge_stats = merge_documents(extracted_documents)
+        logger.info(f"Merged {merge_stats['files']} files, removed {merge_stats['duplicate_photos']} duplicate photos and {merge_stats['duplicate_lines']} repeated lines")
 
         # Ensure we got text from at least one file
-        if not combined_text:
+        if not final_document_content:
             raise HTTPException(
                 status_code=400,
                 detail="Could not extract text from any of the uploaded files. The files might be corrupted, unclear, or in an unsupported format."
             )
 
-        # Join all the text with separators
-        final_document_content = "\n\n--- Next Document ---\n\n".join(combined_text)
+        document_quality = combined_quality(extracted_documents)
+        if document_quality is not None and document_quality < MIN_OCR_QUALITY:
+            raise HTTPException(
+                status_code=400,
+                detail=LOW_QUALITY_DETAIL
+            )
 
         # Create analysis request
-        request = RentalAnalysisRequest(
-            listing_url=listing_url,
-            property_address=property_address,
+        analysis_request = RentalAnalysisRequest(
+            listing_url=fields.get("listing_url") or None,
+            property_address=fields.get("property_address") or None,
             document_content=final_document_content,
             language=language,
-            voice_output=voice_output
+            voice_output=_parse_form_bool(fields.get("voice_output")),
+            document_quality=document_quality
         )
 
         # Process analysis
         try:
-            result = await AnalysisService.analyze_rental(request)
+            result = await AnalysisService.analyze_rental(analysis_request)
             
             # Create a response with explicit CORS headers
             return Response(
-                content=result.json(),
+                content=AnalysisService.result_json(result, selected, include_raw),
                 media_type="application/json",
                 headers={
                     "Access-Control-Allow-Origin": "*",
                     "Access-Control-Allow-Methods": "POST, OPTIONS",
-                    "Access-Control-Allow-Headers": "Content-Type, Authorization, Accept"
+                    "Access-Control-Allow-Headers": "Content-Type, Authorization, Accept, Idempotency-Key"
                 }
             )
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error analyzing documents: {str(e)}")
             raise HTTPException(
@@ -390,10 +425,15 @@ async def upload_multiple_documents(
                 detail=f"Error analyzing documents: {str(e)}"
             )
 
-    except UnicodeDecodeError:
+    except MultipartStreamError as e:
         raise HTTPException(
             status_code=400,
-            detail="Could not decode one or more documents. Please ensure they are valid files."
+            detail=str(e)
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=504,
+            detail=f"{str(e)}. Please try again, or upload fewer or smaller files."
         )
     except HTTPException:
         # Re-raise HTTP exceptions without modification
@@ -413,3 +453,10 @@ async def upload_multiple_documents(
             status_code=500,
             detail=detail
         )
+    finally:
+        # Extractions still waiting for a worker thread never start; ones
+        # already running can't be interrupted and finish in their thread,
+        # with the result discarded
+        for task in extraction_tasks:
+            if not task.done():
+                task.cancel()
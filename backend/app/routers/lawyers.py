@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from bson import ObjectId
+from pymongo import ASCENDING
 from app.models import Lawyer, LawyerCreate, LawyerUpdate, LawyerFilter, Language, Region
 from app.utils.db import get_lawyers_collection
+from app.utils.pagination import after_cursor, next_cursor, NEXT_CURSOR_HEADER
+from app.utils.projection import parse_fields, mongo_projection
 import logging
 
 router = APIRouter(
@@ -13,6 +18,8 @@ router = APIRouter(
 
 logger = logging.getLogger("rent-spiracy")
 
+LAWYER_SORT = [("_id", ASCENDING)]
+
 @router.post("/", response_model=Lawyer)
 async def create_lawyer(lawyer: LawyerCreate):
     """
@@ -30,16 +37,26 @@ async def create_lawyer(lawyer: LawyerCreate):
 
 @router.get("/", response_model=List[Lawyer])
 async def get_lawyers(
+    response: Response,
     language: Optional[Language] = None,
     region: Optional[Region] = None,
     specialization: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     """
     Get lawyers with optional filtering by language, region, and specialization.
+
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    `fields` (comma-separated) returns only those fields, plus the required ones.
     """
     collection = get_lawyers_collection()
+    try:
+        selected = parse_fields(fields, Lawyer)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Build query based on filters
     query = {}
@@ -50,14 +67,29 @@ async def get_lawyers(
     if specialization:
         query["specialization"] = {"$regex": specialization, "$options": "i"}
     
-    # Retrieve lawyers from the database
-    cursor = collection.find(query).skip(skip).limit(limit)
-    lawyers = await cursor.to_list(length=limit)
+    try:
+        query = after_cursor(query, LAWYER_SORT, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Retrieve lawyers from the database, only the fields of the response
+    projection = mongo_projection(selected or Lawyer.model_fields, id_field="id")
+    results = collection.find(query, projection).sort(LAWYER_SORT).skip(skip).limit(limit)
+    lawyers = await results.to_list(length=limit)
+
+    page_cursor = next_cursor(lawyers, LAWYER_SORT, limit)
+    if page_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page_cursor
     
     # Convert ObjectId to string
     for lawyer in lawyers:
         lawyer["id"] = str(lawyer.get("_id"))
         lawyer.pop("_id", None)
+
+    if selected:
+        # Validated, but without the defaults of the fields that weren't selected
+        lean = [Lawyer(**lawyer).model_dump(include=selected) for lawyer in lawyers]
+        return JSONResponse(content=jsonable_encoder(lean), headers={NEXT_CURSOR_HEADER: page_cursor} if page_cursor else None)
     
     return lawyers
 
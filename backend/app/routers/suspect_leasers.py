@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorCollection
 from app.utils.db import get_collection
 from app.models import SuspectLeaser, SuspectLeaserCreate, SuspectLeaserUpdate, Language
 from app.utils.translation import translate_suspect_leaser
+from app.utils.pagination import after_cursor, next_cursor, NEXT_CURSOR_HEADER
+from app.utils.projection import parse_fields, mongo_projection
+from pymongo import ASCENDING
 from pydantic import EmailStr
 import uuid
 from datetime import datetime
@@ -20,24 +25,51 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
+LEASER_SORT = [("_id", ASCENDING)]
+
 # Get suspect leasers collection
 async def get_suspect_leasers_collection() -> AsyncIOMotorCollection:
     return await get_collection("suspect_leasers")
 
 @router.get("/", response_model=List[SuspectLeaser])
 async def get_suspect_leasers(
+    response: Response,
     skip: int = 0, 
     limit: int = 10,
     language: Language = "english",
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     collection: AsyncIOMotorCollection = Depends(get_suspect_leasers_collection)
 ):
-    """Get a list of suspect leasers with pagination"""
-    cursor = collection.find().skip(skip).limit(limit)
-    results = await cursor.to_list(length=limit)
+    """
+    Get a list of suspect leasers with pagination
+
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    `fields` (comma-separated) returns only those fields, plus the required ones.
+    """
+    try:
+        query = after_cursor({}, LEASER_SORT, cursor)
+        selected = parse_fields(fields, SuspectLeaser)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Only the fields of the response, and _id for the next cursor
+    projection = mongo_projection(selected or SuspectLeaser.model_fields)
+    projection["_id"] = 1
+    results = await collection.find(query, projection).sort(LEASER_SORT).skip(skip).limit(limit).to_list(length=limit)
+
+    page_cursor = next_cursor(results, LEASER_SORT, limit)
+    if page_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page_cursor
     
     # Translate the flags if language is not English
     if language != "english":
         results = [translate_suspect_leaser(leaser, language) for leaser in results]
+
+    if selected:
+        # Validated, but without the defaults of the fields that weren't selected
+        lean = [SuspectLeaser(**leaser).model_dump(include=selected) for leaser in results]
+        return JSONResponse(content=jsonable_encoder(lean), headers={NEXT_CURSOR_HEADER: page_cursor} if page_cursor else None)
         
     return results
 
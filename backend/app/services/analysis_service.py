@@ -1,14 +1,76 @@
-from app.models.rental import RentalAnalysisRequest, AnalysisResult, ClauseAnalysis, ScamLikelihood, RiskLevel, TrustworthinessGrade
+from app.models.rental import RentalAnalysisRequest, AnalysisResult, ClauseAnalysis, ScamLikelihood, RiskLevel, TrustworthinessGrade, Language, PrescreenResponse, BatchAnalysisItem, LeaseClusterStats
 from app.utils.db import get_analyses_collection, Database
 from app.utils.pdf_parser import extract_text_from_pdf
 from app.utils.gemini_service import GeminiService
+from app.utils.text_normalizer import normalize_with_stats
+from app.utils.trust_scoring import score_analysis
+from app.utils.projection import mongo_projection
+from app.utils.blob_store import offload_fields, load_fields, BLOB_SUFFIX
+from app.utils.analysis_archive import document_expiry, restore_analysis
+from app.utils.red_flags import prescreen_document, PrescreenResult
+from app.utils.clause_cache import ClauseAnalysisCache
+from app.utils.lease_diff import diff_leases, revision_plan
+from app.utils.db import get_collection
+from app.utils.listing_fetcher import fetch_listing
+from app.utils.listing_search import resolve_listing
+from app.utils.contact_matcher import find_suspect_leasers
+from app.utils.cache import LRUCache
+from app.utils.template_leases import TEMPLATE_LEASES
+from app.utils.template_analyses import TemplateAnalysisCache, TEMPLATE_WARMUP
+from app.utils.lease_clusters import LeaseCluster, LeaseClusterIndex, quote_clauses
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded, request_deadline, REQUEST_TIMEOUT
+from app.utils.write_behind import analysis_write_buffer, write_in_background, WRITE_BEHIND_ENABLED
 from datetime import datetime
+import os
+import time
+import asyncio
+import logging
 import uuid
 import re
 import json
 import random
-import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Awaitable, AsyncIterator, List, Set, Tuple
+
+logger = logging.getLogger("rent-spiracy")
+
+# Clean extracted lease text (headers/footers, wraps, blank lines) before prompting
+NORMALIZE_LEASE_TEXT = os.getenv("NORMALIZE_LEASE_TEXT", "true").lower() != "false"
+
+# Normalized text of analyzed documents, kept for incremental re-analysis
+ANALYSIS_DOCUMENTS_COLLECTION = "analysis_documents"
+
+# Large text fields kept in the blob store rather than inline
+ANALYSIS_BLOB_FIELDS = analysis_write_buffer.blob_fields
+DOCUMENT_BLOB_FIELDS = ("text",)
+
+# Analyses of one batch request running at the same time (Gemini calls are
+# additionally limited across all requests by GEMINI_MAX_CONCURRENCY)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Serialized analyses kept in memory for GET /analysis/{id}
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1000"))
+_analysis_json_cache = LRUCache(ANALYSIS_CACHE_SIZE)
+
+# Answer clear-cut scams from the local pre-screen without calling Gemini
+PRESCREEN_FAST_PATH = os.getenv("PRESCREEN_FAST_PATH", "true").lower() != "false"
+
+# Seconds each concurrent analysis stage may take before the analysis goes on without it
+STAGE_DEADLINES = {
+    "listing": float(os.getenv("STAGE_TIMEOUT_LISTING", "4")),
+    "search": float(os.getenv("STAGE_TIMEOUT_SEARCH", "2")),
+    "contacts": float(os.getenv("STAGE_TIMEOUT_CONTACTS", "1.5")),
+    "lease": float(os.getenv("STAGE_TIMEOUT_LEASE", "3")),
+    "previous_document": float(os.getenv("STAGE_TIMEOUT_PREVIOUS_DOCUMENT", "2")),
+    "store_text": float(os.getenv("STAGE_TIMEOUT_STORE_TEXT", "3")),
+}
+
+
+# Background task computing the template lease analyses, restarted at most
+# every TEMPLATE_WARMUP_RETRY seconds while analyses are missing
+TEMPLATE_WARMUP_RETRY = 300
+_template_warm_up: Optional[asyncio.Task] = None
+_template_warm_up_started: Optional[float] = None
 
 
 class AnalysisService:
@@ -31,50 +93,135 @@ class AnalysisService:
         
         document_content = ""
         property_info = {}
+
+        # Re-analysis of an edited lease is linked to the analysis it revises
+        previous = None
+        if request.previous_analysis_id:
+            previous = await AnalysisService.get_analysis_by_id(request.previous_analysis_id)
+            if previous is None:
+                raise ValueError(f"Previous analysis {request.previous_analysis_id} not found")
         
         try:
             # FLOW PATH 1: User uploaded a lease document
             if request.document_content:
                 document_content = request.document_content
                 print(f"User uploaded a lease document: {len(document_content)} chars")
-                
+                document_content = AnalysisService._normalize_document(document_content)
+                if request.listing_url:
+                    property_info = {"source": "listing_url", "url": request.listing_url}
+
             # FLOW PATH 2: User provided listing URL
             elif request.listing_url:
                 print(f"User provided listing URL: {request.listing_url}")
-                # Scrape webpage for information (simplified)
-                try:
-                    response = requests.get(request.listing_url, timeout=10)
-                    property_info = {"source": "listing_url", "url": request.listing_url}
-                    if response.status_code == 200:
-                        property_info["page_content"] = response.text[:5000]  # Just first 5000 chars for demo << jina ai stuff here
-                except Exception as e:
-                    print(f"Error scraping listing URL: {str(e)}")
-                    property_info["error"] = str(e)
-                
-                # Get random lease from database
-                document_content = await AnalysisService._get_random_lease_document()
-                
+                property_info = {"source": "listing_url", "url": request.listing_url}
+
             # FLOW PATH 3: User provided property address
             elif request.property_address:
                 print(f"User provided property address: {request.property_address}")
                 property_info = {"source": "property_address", "address": request.property_address}
-                
-                # Google search for the address to find listings
-                listing_url = await AnalysisService._search_property_listings(request.property_address)
-                
-                if listing_url:
-                    property_info["found_listing"] = listing_url
-                    try:
-                        response = requests.get(listing_url, timeout=10)
-                        if response.status_code == 200:
-                            property_info["page_content"] = response.text[:500]  # Just first 500 chars for demo
-                    except Exception as e:
-                        print(f"Error scraping found listing: {str(e)}")
-                        property_info["error"] = str(e)
-                
-                # Get random lease from database
-                document_content = await AnalysisService._get_random_lease_document()
-            
+
+            # Independent stages run concurrently, each under its own deadline;
+            # a stage that fails or runs out of time leaves its default behind
+            suspect_leasers = []
+            async with asyncio.TaskGroup() as stages:
+                if property_info:
+                    stages.create_task(AnalysisService._run_stage(
+                        "listing", AnalysisService._listing_stage(property_info, suspect_leasers)
+                    ))
+                if request.document_content:
+                    contacts_task = stages.create_task(AnalysisService._run_stage(
+                        "contacts", find_suspect_leasers(document_content), default=[]
+                    ))
+                else:
+                    lease_task = stages.create_task(AnalysisService._run_stage(
+                        "lease", AnalysisService._get_random_lease_document(), default=""
+                    ))
+                if previous and request.document_content:
+                    previous_task = stages.create_task(AnalysisService._run_stage(
+                        "previous_document", AnalysisService._load_document(previous.id)
+                    ))
+
+            if request.document_content:
+                suspect_leasers = contacts_task.result() + suspect_leasers
+            else:
+                # Sample leases from the database
+                document_content = AnalysisService._normalize_document(lease_task.result())
+            suspect_leasers = list({leaser.get("id"): leaser for leaser in suspect_leasers}.values())
+            if suspect_leasers:
+                print(f"Contacts match {len(suspect_leasers)} reported suspect leasers")
+
+            # Template leases are analyzed ahead of time, answer from memory unless
+            # the listing page or its contacts give Gemini something to weigh
+            if not request.document_content and document_content:
+                template_analysis = TemplateAnalysisCache.get(document_content, request.language)
+                if template_analysis is None:
+                    AnalysisService.start_template_warm_up()
+                elif AnalysisService._has_listing_findings(property_info, suspect_leasers):
+                    print("Listing has red flags or suspect contacts, analyzing with Gemini")
+                else:
+                    print("Serving the precomputed analysis of the template lease")
+                    analysis_result = AnalysisService._template_result(analysis_id, template_analysis)
+                    await AnalysisService._store_analysis_result(analysis_result)
+                    return analysis_result
+
+            # Copies of a lease template already judged high-risk get its verdict
+            # (a revision is the same lease again, it isn't counted as a copy)
+            lease_signature = None
+            if request.document_content and not previous:
+                lease_signature = LeaseClusterIndex.signature(document_content)
+            # The verdict is worded from fixed English text, other languages still go to Gemini
+            if lease_signature is not None and request.language == Language.ENGLISH:
+                known = LeaseClusterIndex.known_scam(lease_signature, request.language)
+                if known is not None:
+                    cluster, verdict = known
+                    print(f"Lease matches high-risk template cluster {cluster.id} ({cluster.size} copies)")
+                    analysis_result = AnalysisService._cluster_result(
+                        analysis_id, cluster, verdict, document_content, suspect_leasers
+                    )
+                    analysis_result.lease_cluster_id = await LeaseClusterIndex.add(
+                        lease_signature, analysis_result, request.language, verdict=False
+                    )
+                    await AnalysisService._store_analysis_result(analysis_result, document_content, request.language)
+                    return analysis_result
+
+            # Millisecond local scan for well-known scam markers
+            prescreen = prescreen_document(document_content) if document_content else None
+            if prescreen:
+                print(f"Pre-screen: {prescreen.scam_likelihood.value} likelihood, {len(prescreen.flags)} flags in {prescreen.elapsed_ms:.1f} ms")
+
+                # The fast path answers in English only, other languages still go to Gemini
+                if (
+                    PRESCREEN_FAST_PATH and prescreen.clear_cut
+                    and request.document_content and request.language == Language.ENGLISH
+                ):
+                    print("Clear-cut scam markers found, skipping Gemini analysis")
+                    analysis_result = AnalysisService._prescreen_result(analysis_id, prescreen)
+                    analysis_result.previous_analysis_id = previous.id if previous else None
+                    analysis_result.suspect_leaser_matches = suspect_leasers or None
+                    analysis_result.lease_cluster_id = await LeaseClusterIndex.add(
+                        lease_signature, analysis_result, request.language
+                    )
+                    await AnalysisService._store_analysis_result(analysis_result, document_content, request.language)
+                    return analysis_result
+
+            # Revised lease: diff against the stored text of the previous analysis
+            revision = None
+            if previous and request.document_content:
+                stored = previous_task.result()
+                if stored and stored.get("language") == request.language.value:
+                    revision = diff_leases(stored["text"], document_content)
+                if revision and not revision.has_changes:
+                    print(f"Lease unchanged since analysis {previous.id}, reusing its result")
+                    analysis_result = previous.copy(update={
+                        "id": analysis_id,
+                        "created_at": datetime.now(),
+                        "previous_analysis_id": previous.id,
+                        "changed_clauses": [],
+                        "suspect_leaser_matches": suspect_leasers or None
+                    })
+                    await AnalysisService._store_analysis_result(analysis_result, document_content, request.language)
+                    return analysis_result
+
             # Make sure we have some document content for analysis
             if not document_content:
                 document_content = "No document content could be retrieved."
@@ -82,13 +229,42 @@ class AnalysisService:
             # Log analysis request
             print(f"Analyzing rental - URL: {request.listing_url}, Address: {request.property_address}, Document length: {len(document_content)} chars")
             
-            # Call Gemini for analysis
-            gemini_response = await GeminiService.analyze_rental_document(
-                document_content=document_content,
-                listing_url=request.listing_url or property_info.get("found_listing"),
-                property_address=request.property_address,
-                language=request.language
-            )
+            # Only clauses that haven't been analyzed before are sent in full
+            if revision:
+                clause_plan = revision_plan(revision, previous, request.language)
+                print(f"Revision of {previous.id}: {len(revision.changed)} changed, {len(revision.removed)} removed clauses")
+            else:
+                clause_plan = await ClauseAnalysisCache.plan(document_content, request.language)
+            prompt_document = clause_plan.prompt_text() if clause_plan else document_content
+            if clause_plan:
+                print(f"Prompt document: {len(document_content)} -> {len(prompt_document)} chars, {len(clause_plan.cached)} cached clauses")
+
+            # Call Gemini for analysis, keeping the document text for later
+            # revisions while the model works
+            timed_out = False
+            try:
+                deadline.check("Gemini analysis")
+                async with asyncio.TaskGroup() as stages:
+                    stages.create_task(AnalysisService._run_stage(
+                        "store_text", AnalysisService._store_document(analysis_id, document_content, request.language)
+                    ))
+                    gemini_task = stages.create_task(GeminiService.analyze_rental_document(
+                        document_content=prompt_document,
+                        listing_url=request.listing_url or property_info.get("found_listing"),
+                        property_address=request.property_address,
+                        language=request.language,
+                        document_quality=request.document_quality,
+                        listing_content=property_info.get("page_content"),
+                        clause_references=bool(clause_plan and clause_plan.cached),
+                        revision_note=revision.summary() if revision else None,
+                        suspect_leasers=suspect_leasers
+                    ))
+            except* DeadlineExceeded:
+                timed_out = True
+            if timed_out:
+                # Out of time: answer with the pre-screen findings, if there are any
+                return await AnalysisService._deadline_result(analysis_id, prescreen, suspect_leasers, previous)
+            gemini_response = gemini_task.result()
             
             # Ensure we get a valid response, not None
             if not gemini_response:
@@ -115,31 +291,13 @@ class AnalysisService:
             # If we have pre-parsed data from Gemini service, use it
             if "concerning_clauses" in gemini_response and isinstance(gemini_response["concerning_clauses"], list):
                 print("Using pre-parsed data from Gemini service")
-                
-                # Just use the pre-parsed data directly without excessive text cleaning
-                parsed_clauses = []
-                for clause_data in gemini_response["concerning_clauses"]:
-                    # Skip if missing required fields
-                    if not clause_data.get("original_text") or not clause_data.get("simplified_text"):
-                        continue
-                    
-                    parsed_clauses.append(ClauseAnalysis(
-                        text=clause_data.get("original_text", ""),
-                        simplified_text=clause_data.get("simplified_text", ""),
-                        is_concerning=clause_data.get("is_concerning", True),
-                        reason=clause_data.get("reason", "")
-                    ))
-                
-                scam_likelihood_str = gemini_response.get("scam_likelihood", "Medium")
-                if scam_likelihood_str.capitalize() in ["Low", "Medium", "High"]:
-                    scam_likelihood = getattr(ScamLikelihood, scam_likelihood_str.upper())
-                else:
-                    scam_likelihood = ScamLikelihood.MEDIUM
-                
-                explanation = gemini_response.get("explanation", "Analysis completed.")
-                questions = gemini_response.get("questions", [])
-                action_items = gemini_response.get("action_items", [])
-                clauses = parsed_clauses
+                scam_likelihood, explanation, clauses, questions, action_items = AnalysisService._structured_fields(gemini_response)
+
+                # Remember verdicts for the clauses Gemini read, add the cached ones
+                if clause_plan:
+                    if "error" not in gemini_response:
+                        await ClauseAnalysisCache.store(clause_plan, clauses)
+                    clauses = clause_plan.merge(clauses)
                 
                 # Print what we parsed
                 print(f"Parsed likelihood: {scam_likelihood}")
@@ -149,14 +307,7 @@ class AnalysisService:
                 # If no concerning clauses were found but we have a likelihood and explanation
                 if not clauses:
                     print("No concerning clauses found, checking for content")
-                    
-                    # Add a placeholder clause
-                    clauses.append(ClauseAnalysis(
-                        text="General Lease Review",
-                        simplified_text="While no specific concerning clauses were identified, always review your lease thoroughly before signing.",
-                        is_concerning=False,
-                        reason="No specific concerning clauses were identified in the analysis."
-                    ))
+                    clauses.append(AnalysisService._general_review_clause())
                 
                 # Calculate trustworthiness metrics based on analysis
                 trustworthiness_score, trustworthiness_grade, risk_level = AnalysisService._calculate_trustworthiness(
@@ -176,30 +327,23 @@ class AnalysisService:
                     suggested_questions=questions,
                     action_items=action_items or [],
                     created_at=datetime.now(),
-                    raw_response=raw_response  # Include the raw response for the frontend to use directly
+                    raw_response=raw_response,  # Include the raw response for the frontend to use directly
+                    preliminary_flags=prescreen.flags if prescreen else None,
+                    previous_analysis_id=previous.id if previous else None,
+                    changed_clauses=[clause.preview(80) for clause in revision.changed] if revision else None,
+                    suspect_leaser_matches=suspect_leasers or None
+                )
+                analysis_result.lease_cluster_id = await LeaseClusterIndex.add(
+                    lease_signature, analysis_result, request.language, verdict="error" not in gemini_response
                 )
                 
-                # Store in database (will implement this properly)
-                try:
-                    analyses = await get_analyses_collection()
-                    result_dict = analysis_result.dict()
-                    
-                    # Convert enum values to strings for MongoDB
-                    result_dict["scam_likelihood"] = scam_likelihood.value
-                    result_dict["risk_level"] = risk_level
-                    result_dict["trustworthiness_grade"] = trustworthiness_grade
-                    
-                    # Convert datetime to ISO format
-                    result_dict["created_at"] = result_dict["created_at"].isoformat()
-                    
-                    # Insert into database
-                    print(f"Storing analysis result with ID: {analysis_id}")
-                    await analyses.insert_one(result_dict)
-                except Exception as e:
-                    print(f"Error storing analysis in database: {str(e)}")
+                # Store in database (the document text was stored alongside the Gemini call)
+                await AnalysisService._store_analysis_result(analysis_result)
                     
                 return analysis_result
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Error during analysis: {str(e)}")
             # Return a basic error response
@@ -214,53 +358,475 @@ class AnalysisService:
             )
 
     @staticmethod
-    def _calculate_trustworthiness(scam_likelihood: str, concerning_clauses_count: int) -> tuple:
-        """Calculate trustworthiness score, grade, and risk level based on analysis."""
-        # Base score based on scam likelihood - MORE GENEROUS STARTING POINTS
-        base_score = {
-            "LOW": 90,    # Increased from 85
-            "MEDIUM": 70, # Increased from 60
-            "HIGH": 40    # Increased from 30
-        }.get(scam_likelihood, 60)  # Default is more generous too (was 50)
-        
-        # Adjust score based on concerning clauses - LESS SEVERE PENALTIES
-        if concerning_clauses_count == 0:
-            adjustment = 10  # Bonus for no concerning clauses
-        elif concerning_clauses_count == 1:
-            adjustment = 0   # Single concern is normal, no penalty
-        elif concerning_clauses_count <= 3:
-            adjustment = -5  # Minor concerns
-        elif concerning_clauses_count <= 6:
-            adjustment = -10 # Moderate concerns (was -15)
-        else:
-            adjustment = -20 # Serious concerns (was -25)
+    async def analyze_batch(requests: List[RentalAnalysisRequest]) -> AsyncIterator[BatchAnalysisItem]:
+        """
+        Analyze several rentals, yielding each result as soon as it is done.
+
+        At most BATCH_CONCURRENCY analyses run at once, each under its own
+        REQUEST_TIMEOUT deadline; identical items are analyzed once and reported
+        for each of their indices. Results come in completion order, with the
+        item's index.
+        """
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def run(request: RentalAnalysisRequest) -> AnalysisResult:
+            async with semaphore:
+                # Each item gets the full request budget from when it starts
+                with request_deadline(REQUEST_TIMEOUT):
+                    return await AnalysisService.analyze_rental(request)
+
+        tasks: Dict[str, asyncio.Task] = {}
+        indices: Dict[asyncio.Task, List[int]] = {}
+        for index, request in enumerate(requests):
+            key = request.json()
+            if key not in tasks:
+                tasks[key] = asyncio.create_task(run(request))
+                indices[tasks[key]] = []
+            indices[tasks[key]].append(index)
+        print(f"Batch analysis of {len(requests)} items ({len(tasks)} distinct)")
+
+        pending = set(indices)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result, error = task.result(), None
+                    except Exception as e:
+                        result, error = None, str(e)
+                    for index in indices[task]:
+                        yield BatchAnalysisItem(index=index, result=result, error=error)
+        finally:
+            # The client went away (or the stream failed), stop the remaining work
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    def _has_listing_findings(property_info: Dict[str, Any], suspect_leasers: list) -> bool:
+        """
+        Whether a listing flow found anything the template analysis can't reflect.
+
+        A listing page with red flags or contacts matching reported suspect
+        leasers has to reach Gemini, the precomputed template verdict would
+        score it as if they weren't there.
+        """
+        if suspect_leasers:
+            return True
+        page_content = property_info.get("page_content")
+        return bool(page_content and prescreen_document(page_content).flags)
+
+    @staticmethod
+    def _template_result(analysis_id: str, template_analysis: Dict[str, Any]) -> AnalysisResult:
+        """
+        Result for a template-lease flow from the precomputed template analysis.
+
+        Only used when the listing added no findings (see _has_listing_findings).
+        """
+        return AnalysisResult(
+            **template_analysis,
+            id=analysis_id,
+            created_at=datetime.now()
+        )
+
+    @staticmethod
+    def _cluster_result(
+        analysis_id: str,
+        cluster: LeaseCluster,
+        verdict: Dict[str, Any],
+        document_content: str,
+        suspect_leasers: list
+    ) -> AnalysisResult:
+        """
+        Result for a copy of a high-risk lease template from its cluster verdict.
+
+        The verdict keeps no text written for another lease: the concerning
+        clauses are quoted from this lease (see quote_clauses), the
+        explanation and reasons are fixed text and the red flags come from
+        the local pre-screen of this lease.
+        """
+        clauses = [
+            ClauseAnalysis(
+                text=clause.text,
+                simplified_text="Other copies of this lease template were flagged for this clause.",
+                is_concerning=True,
+                reason="Found concerning in earlier analyses of copies of this lease template.",
+                legal_reference=legal_reference
+            )
+            for clause, legal_reference in quote_clauses(verdict, document_content)
+        ]
+        if not clauses:
+            clauses.append(AnalysisService._general_review_clause())
+        prescreen = prescreen_document(document_content)
+        scam_likelihood = ScamLikelihood(verdict["scam_likelihood"])
+        trustworthiness_score, trustworthiness_grade, risk_level = AnalysisService._calculate_trustworthiness(
+            scam_likelihood.name,
+            len(clauses)
+        )
+        return AnalysisResult(
+            id=analysis_id,
+            scam_likelihood=scam_likelihood,
+            trustworthiness_score=trustworthiness_score,
+            trustworthiness_grade=trustworthiness_grade,
+            risk_level=risk_level,
+            explanation=(
+                f"This lease is a near-identical copy of a lease template that has been uploaded {cluster.size} times "
+                f"and was found to be a likely scam in {cluster.high_risk_count} separate analyses. "
+                "Scammers send the same fake lease to many renters with only the names, amounts and dates changed. "
+                "Do not send any money until you have verified the landlord's identity and ownership of the property "
+                "and toured the unit in person."
+            ),
+            simplified_clauses=clauses,
+            suggested_questions=[],
+            action_items=[],
+            created_at=datetime.now(),
+            preliminary_flags=prescreen.flags or None,
+            suspect_leaser_matches=suspect_leasers or None
+        )
+
+    @staticmethod
+    def _structured_fields(
+        gemini_response: Dict[str, Any]
+    ) -> Tuple[ScamLikelihood, str, List[ClauseAnalysis], List[str], List[str]]:
+        """
+        Likelihood, explanation, clauses, questions and action items of a
+        pre-parsed Gemini response (one with a concerning_clauses list).
+        """
+        # Just use the pre-parsed data directly without excessive text cleaning
+        parsed_clauses = []
+        for clause_data in gemini_response["concerning_clauses"]:
+            # Skip if missing required fields
+            if not clause_data.get("original_text") or not clause_data.get("simplified_text"):
+                continue
             
-        # Calculate final score (keeping within 0-100 range)
-        score = max(0, min(100, base_score + adjustment))
+            parsed_clauses.append(ClauseAnalysis(
+                text=clause_data.get("original_text", ""),
+                simplified_text=clause_data.get("simplified_text", ""),
+                is_concerning=clause_data.get("is_concerning", True),
+                reason=clause_data.get("reason", "")
+            ))
         
-        # Determine grade based on score - MORE RELAXED GRADING
-        if score >= 85:      # Was 90
-            grade = TrustworthinessGrade.A
-        elif score >= 75:    # Was 80
-            grade = TrustworthinessGrade.B
-        elif score >= 55:    # Was 60
-            grade = TrustworthinessGrade.C
-        elif score >= 35:    # Was 40
-            grade = TrustworthinessGrade.D
+        scam_likelihood_str = gemini_response.get("scam_likelihood", "Medium")
+        if scam_likelihood_str.capitalize() in ["Low", "Medium", "High"]:
+            scam_likelihood = getattr(ScamLikelihood, scam_likelihood_str.upper())
         else:
-            grade = TrustworthinessGrade.F
-            
-        # Determine risk level - MORE RELAXED RISK ASSESSMENT
-        if score >= 75:      # Was 80
-            risk_level = RiskLevel.LOW_RISK
-        elif score >= 55:    # Was 60
-            risk_level = RiskLevel.MEDIUM_RISK
-        elif score >= 25:    # Was 30
-            risk_level = RiskLevel.HIGH_RISK
-        else:
-            risk_level = RiskLevel.VERY_HIGH_RISK
+            scam_likelihood = ScamLikelihood.MEDIUM
+        
+        explanation = gemini_response.get("explanation", "Analysis completed.")
+        questions = gemini_response.get("questions", [])
+        action_items = gemini_response.get("action_items", [])
+        return scam_likelihood, explanation, parsed_clauses, questions, action_items
+
+    @staticmethod
+    def _general_review_clause() -> ClauseAnalysis:
+        """Placeholder clause for an analysis without concerning clauses."""
+        return ClauseAnalysis(
+            text="General Lease Review",
+            simplified_text="While no specific concerning clauses were identified, always review your lease thoroughly before signing.",
+            is_concerning=False,
+            reason="No specific concerning clauses were identified in the analysis."
+        )
+
+    @staticmethod
+    async def _analyze_template(template: str, language: Language) -> Optional[AnalysisResult]:
+        """
+        Analysis of a template lease straight from Gemini.
+
+        Unlike analyze_rental nothing is stored along the way (no analysis,
+        clause verdicts or lease cluster), so real uploads of a template are
+        never matched against a synthetic analysis.
+
+        Returns:
+            The analysis, or None if Gemini failed
+        """
+        gemini_response = await GeminiService.analyze_rental_document(
+            document_content=AnalysisService._normalize_document(template),
+            language=language
+        )
+        if not gemini_response or "error" in gemini_response or not isinstance(gemini_response.get("concerning_clauses"), list):
+            return None
+        scam_likelihood, explanation, clauses, questions, action_items = AnalysisService._structured_fields(gemini_response)
+        if not clauses:
+            clauses.append(AnalysisService._general_review_clause())
+        trustworthiness_score, trustworthiness_grade, risk_level = AnalysisService._calculate_trustworthiness(
+            scam_likelihood.name,
+            len(clauses)
+        )
+        return AnalysisResult(
+            id=str(uuid.uuid4()),
+            scam_likelihood=scam_likelihood,
+            trustworthiness_score=trustworthiness_score,
+            trustworthiness_grade=trustworthiness_grade,
+            risk_level=risk_level,
+            explanation=explanation,
+            simplified_clauses=clauses,
+            suggested_questions=questions,
+            action_items=action_items or [],
+            created_at=datetime.now(),
+            raw_response=gemini_response.get("raw_response", "")
+        )
+
+    @staticmethod
+    async def warm_up_templates() -> int:
+        """
+        Make sure every template lease has an analysis in every language.
+
+        Analyses are loaded from the database when present and computed with
+        Gemini otherwise (see _analyze_template).
+
+        Returns:
+            Number of analyses computed
+        """
+        async def warm_up(template: str, language: Language) -> bool:
+            document_content = AnalysisService._normalize_document(template)
+            if await TemplateAnalysisCache.load(document_content, language) is not None:
+                return False
+            result = await AnalysisService._analyze_template(template, language)
+            # Failed analyses are not kept; they are retried on the next warm-up
+            if result is None:
+                logger.warning(f"Template analysis in {language.value} failed, will retry later")
+                return False
+            await TemplateAnalysisCache.store(document_content, language, result)
+            return True
+
+        # Gemini calls are limited by the shared quota
+        computed = await asyncio.gather(*(
+            warm_up(template, language) for template in TEMPLATE_LEASES for language in Language
+        ))
+        print(f"Template analyses ready, {sum(computed)} computed")
+        return sum(computed)
+
+    @staticmethod
+    def start_template_warm_up() -> None:
+        """Run warm_up_templates in the background unless it is already running."""
+        global _template_warm_up, _template_warm_up_started
+        if not TEMPLATE_WARMUP or (_template_warm_up is not None and not _template_warm_up.done()):
+            return
+        # A failed warm-up (e.g. Gemini unavailable) isn't retried on every request
+        if _template_warm_up_started and time.monotonic() - _template_warm_up_started < TEMPLATE_WARMUP_RETRY:
+            return
+        _template_warm_up_started = time.monotonic()
+        _template_warm_up = asyncio.get_running_loop().create_task(AnalysisService.warm_up_templates())
+
+    @staticmethod
+    async def _run_stage(name: str, stage: Awaitable, default: Any = None) -> Any:
+        """
+        Await one stage of the analysis under its deadline.
+
+        Stages are optional inputs to the analysis; a stage that fails or
+        exceeds its deadline is logged and yields the default instead. The
+        stage deadline is shortened to what the request has left.
+        """
+        started = time.perf_counter()
+        timeout = deadline.cap(STAGE_DEADLINES.get(name))
+        try:
+            async with asyncio.timeout(timeout):
+                result = await stage
+        except TimeoutError:
+            print(f"Stage {name} exceeded its {timeout:.1f}s deadline, continuing without it")
+            return default
+        except Exception as e:
+            print(f"Stage {name} failed: {str(e)}")
+            return default
+        logger.debug(f"Stage {name} finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return result
+
+    @staticmethod
+    async def _listing_stage(property_info: Dict[str, Any], suspect_leasers: list) -> None:
+        """
+        Find and fetch the listing page, and match the contacts on it.
+
+        Results are written into property_info and suspect_leasers as they
+        arrive, so whatever finished before the deadline is kept.
+        """
+        listing_url = property_info.get("url")
+        if not listing_url:
+            # Google search for the address to find listings
+            listing_url = await AnalysisService._run_stage(
+                "search", AnalysisService._search_property_listings(property_info["address"])
+            )
+            if not listing_url:
+                return
+            property_info["found_listing"] = listing_url
+
+        # Fetch the listing page (pooled async client, cached) and keep its main text
+        page = await fetch_listing(listing_url)
+        if page is None:
+            property_info["error"] = "Could not fetch the listing page"
+        elif page.text:
+            property_info["page_content"] = page.text
+            suspect_leasers.extend(await find_suspect_leasers(page.text))
+
+    @staticmethod
+    def _normalize_document(document_content: str) -> str:
+        """Strip extraction noise that only costs prompt tokens."""
+        if not document_content or not NORMALIZE_LEASE_TEXT:
+            return document_content
+        document_content, normalization = normalize_with_stats(document_content)
+        print(f"Normalized document: {normalization['tokens_before']} -> {normalization['tokens_after']} estimated tokens ({normalization['token_reduction_pct']}% saved)")
+        return document_content
+
+    @staticmethod
+    async def _store_analysis_result(
+        analysis_result: AnalysisResult,
+        document_content: Optional[str] = None,
+        language: Optional[Language] = None
+    ) -> None:
+        """
+        Insert an analysis result into the database, logging (not raising) failures.
+
+        The insert is write-behind: the result is buffered and readable by id
+        right away, and written to MongoDB in a background batch, its large
+        text fields going to the blob store with it.
+
+        The analyzed document text is stored alongside, in the background, so
+        a revised lease can later be diffed against it.
+        """
+        if document_content:
+            write_in_background(
+                AnalysisService._store_document(analysis_result.id, document_content, language),
+                "Analysis document write"
+            )
+        try:
+            result_dict = analysis_result.dict()
+            
+            # Convert enum values to strings for MongoDB
+            if isinstance(analysis_result.scam_likelihood, ScamLikelihood):
+                result_dict["scam_likelihood"] = analysis_result.scam_likelihood.value
             
-        return score, grade, risk_level
+            # Convert datetime to ISO format
+            result_dict["created_at"] = result_dict["created_at"].isoformat()
+
+            # Hand over to the write-behind buffer, it is inserted in the next batch
+            print(f"Storing analysis result with ID: {analysis_result.id}")
+            if WRITE_BEHIND_ENABLED:
+                analysis_write_buffer.add(result_dict)
+            else:
+                await offload_fields(result_dict, ANALYSIS_BLOB_FIELDS)
+                analyses = await get_analyses_collection()
+                await analyses.insert_one(result_dict)
+        except Exception as e:
+            print(f"Error storing analysis in database: {str(e)}")
+
+    @staticmethod
+    async def _store_document(analysis_id: str, document_content: str, language: Optional[Language]) -> None:
+        """Keep the normalized text an analysis was made from, and its language, until it expires."""
+        try:
+            document = await offload_fields({
+                "_id": analysis_id,
+                "text": document_content,
+                "language": language.value if language else None,
+                "created_at": datetime.now().isoformat(),
+                "expires_at": document_expiry()
+            }, DOCUMENT_BLOB_FIELDS)
+            collection = await get_collection(ANALYSIS_DOCUMENTS_COLLECTION)
+            await collection.insert_one(document)
+        except Exception as e:
+            print(f"Error storing analysis document: {str(e)}")
+
+    @staticmethod
+    async def _load_document(analysis_id: str) -> Optional[Dict[str, Any]]:
+        """The stored text and language of a previous analysis, if any."""
+        try:
+            collection = await get_collection(ANALYSIS_DOCUMENTS_COLLECTION)
+            return await load_fields(await collection.find_one({"_id": analysis_id}), DOCUMENT_BLOB_FIELDS)
+        except Exception as e:
+            print(f"Error loading analysis document: {str(e)}")
+            return None
+
+    @staticmethod
+    async def prescreen(request: RentalAnalysisRequest) -> PrescreenResponse:
+        """
+        Instant preview: run only the local red-flag pre-screen on a document.
+
+        Raises:
+            ValueError: If no document content was provided
+        """
+        if not request.document_content:
+            raise ValueError("document_content is required for a pre-screen")
+        document_content = request.document_content
+        if NORMALIZE_LEASE_TEXT:
+            document_content = normalize_with_stats(document_content)[0]
+        return PrescreenResponse(**prescreen_document(document_content).to_dict())
+
+    @staticmethod
+    def _prescreen_result(analysis_id: str, prescreen: PrescreenResult) -> AnalysisResult:
+        """Build a full analysis result from a clear-cut pre-screen, without Gemini."""
+        clauses = [
+            ClauseAnalysis(
+                text=flag["text"],
+                simplified_text=flag["description"],
+                is_concerning=True,
+                reason=f"Known rental scam marker: {flag['flag']}."
+            )
+            for flag in prescreen.flags
+        ]
+        markers = "; ".join(flag["flag"] for flag in prescreen.flags if flag["severity"] == "high")
+        explanation = (
+            f"This document contains several well-known rental scam markers ({markers}). "
+            "Scammers use these tactics because payments made this way are hard or impossible to recover, "
+            "and because they avoid ever meeting you or showing the property in person. "
+            "Treat this offer as a likely scam: do not send any money or personal financial information "
+            "until you have verified the landlord's identity and ownership of the property and toured the unit."
+        )
+        trustworthiness_score, trustworthiness_grade, risk_level = AnalysisService._calculate_trustworthiness(
+            prescreen.scam_likelihood.name,
+            len(clauses)
+        )
+        return AnalysisResult(
+            id=analysis_id,
+            scam_likelihood=prescreen.scam_likelihood,
+            trustworthiness_score=trustworthiness_score,
+            trustworthiness_grade=trustworthiness_grade,
+            risk_level=risk_level,
+            explanation=explanation,
+            simplified_clauses=clauses,
+            suggested_questions=[
+                "Can I tour the property in person before paying anything?",
+                "Can you show a government ID and proof that you own or manage this property?",
+                "Why can't the deposit be paid by check or through a traceable payment method?",
+                "Who will hand over the keys, and can we meet at the property to sign the lease?",
+            ],
+            action_items=[
+                "Do not send any money, gift cards or cryptocurrency",
+                "Look up the property owner in the county property records",
+                "Search the listing photos and address online for duplicate listings",
+                "Report the listing to the platform where you found it and to the FTC at reportfraud.ftc.gov",
+            ],
+            created_at=datetime.now(),
+            preliminary_flags=prescreen.flags
+        )
+
+    @staticmethod
+    async def _deadline_result(
+        analysis_id: str,
+        prescreen: Optional[PrescreenResult],
+        suspect_leasers: list,
+        previous: Optional[AnalysisResult]
+    ) -> AnalysisResult:
+        """
+        Partial result for a request whose deadline passed before Gemini answered.
+
+        Raises:
+            DeadlineExceeded: If the pre-screen found nothing to report
+        """
+        if not prescreen or not prescreen.flags:
+            raise DeadlineExceeded("Gemini analysis")
+        print(f"Request deadline reached, returning {len(prescreen.flags)} pre-screen findings")
+        analysis_result = AnalysisService._prescreen_result(analysis_id, prescreen)
+        analysis_result.explanation = (
+            "The full analysis could not be completed in time. These are preliminary findings from an automatic "
+            "scan for well-known rental scam markers; please run the analysis again for a complete review of the lease."
+        )
+        analysis_result.partial = True
+        analysis_result.previous_analysis_id = previous.id if previous else None
+        analysis_result.suspect_leaser_matches = suspect_leasers or None
+        await AnalysisService._store_analysis_result(analysis_result)
+        return analysis_result
+
+    @staticmethod
+    def _calculate_trustworthiness(scam_likelihood: str, concerning_clauses_count: int) -> tuple:
+        """Calculate trustworthiness score, grade, and risk level based on analysis."""
+        return score_analysis(scam_likelihood, concerning_clauses_count)
 
     @staticmethod
     def _clean_explanation(explanation: str, raw_response: str) -> str:
@@ -769,109 +1335,103 @@ class AnalysisService:
         return result.id
 
     @staticmethod
-    async def get_analysis_by_id(analysis_id: str) -> AnalysisResult:
-        """Retrieve an analysis by ID."""
-        analyses = await get_analyses_collection()
-        result = await analyses.find_one({"id": analysis_id})
-        if result is None:
-            return None
-        return AnalysisResult(**result)
-
-    @staticmethod
-    async def _get_random_lease_document() -> str:
+    async def get_analysis_by_id(analysis_id: str, include_raw: bool = True, fields: Optional[Set[str]] = None) -> AnalysisResult:
         """
-        Get a random lease document from the database.
-        For demo, this returns a fake lease document.
-        In production, this would query MongoDB.
-        """
-        sample_leases = [
-            """RESIDENTIAL LEASE AGREEMENT
-
-This Residential Lease Agreement ("Agreement") is made and entered into this ___ day of ________, 20__, by and between _____________ ("Landlord") and _____________ ("Tenant").
-
-1. PROPERTY: Landlord leases to Tenant the residential property located at: _________________________________ ("Property").
-
-2. TERM: This Agreement shall commence on _________, 20__ and continue until _________, 20__ ("Lease Term").
-
-3. RENT: Tenant agrees to pay Landlord the sum of $________ per month as rent, due on the 1st day of each month.
-
-4. SECURITY DEPOSIT: Tenant shall pay a security deposit of $________ upon execution of this Agreement.
-
-5. UTILITIES: Tenant shall be responsible for payment of all utilities and services, except: ________________.
-
-6. OCCUPANCY: The Property shall be occupied only by Tenant and the following persons: _________________.
-
-7. MAINTENANCE: Tenant shall maintain the Property in good, clean condition and shall not make alterations without Landlord's written consent.
-
-8. ENTRY: Landlord may enter the Property at reasonable times with 24 hours' notice to inspect, make repairs, or show to prospective tenants.
-
-9. PETS: No pets shall be kept on the Property without Landlord's written consent.
-
-10. TERMINATION: If Tenant fails to comply with any terms of this Agreement, Landlord may terminate this Agreement.
-
-11. ATTORNEY'S FEES: In any action to enforce this Agreement, the prevailing party shall be entitled to reasonable attorney's fees.
+        Retrieve an analysis by ID.
 
-12. ADDITIONAL TERMS: _________________________________________________
+        Args:
+            analysis_id: Analysis ID
+            include_raw: Whether to load the (large) raw Gemini response
+            fields: Only load these fields (including the required ones)
 
-________________________________
-Tenant                 Date
-
-________________________________
-Landlord              Date""",
-
-            """LEASE AGREEMENT
-
-THIS LEASE is made on [DATE] between [LANDLORD NAME] (hereinafter "Landlord") and [TENANT NAME] (hereinafter "Tenant").
-
-1. PREMISES: Landlord hereby leases to Tenant the premises located at [ADDRESS] ("the Premises").
-
-2. TERM: The term of this lease shall be for [LENGTH], beginning on [START DATE] and ending on [END DATE].
-
-3. RENT: Tenant agrees to pay $[AMOUNT] per month, payable in advance on the first day of each month.
-
-4. LATE CHARGES: If rent is not paid by the 5th day of the month, Tenant shall pay a late fee of $50 plus $10 per day until paid in full.
-
-5. SECURITY DEPOSIT: Upon execution of this lease, Tenant shall deposit with Landlord the sum of $[AMOUNT] as security for the performance of Tenant's obligations under this lease.
-
-6. UTILITIES: Tenant shall pay for all utilities and services except for: [LIST EXCEPTIONS IF ANY].
+        Offloaded fields are read from the blob store only when they are
+        selected; an analysis moved to the cold archive is restored.
+        """
+        # Blob references travel with the fields they stand for
+        blob_fields = {field + BLOB_SUFFIX for field in ANALYSIS_BLOB_FIELDS if field in fields} if fields else set()
+        if fields is None and not include_raw:
+            exclude = ("raw_response", "raw_response" + BLOB_SUFFIX)
+        else:
+            exclude = ()
 
-7. OCCUPANTS: The Premises shall be occupied solely by Tenant and [NAMES OF ADDITIONAL OCCUPANTS, IF ANY].
+        # Results not flushed from the write-behind buffer yet
+        buffered = analysis_write_buffer.get(analysis_id)
+        if buffered is not None:
+            result = {key: value for key, value in buffered.items() if key not in exclude}
+        else:
+            analyses = await get_analyses_collection()
+            projection = mongo_projection(fields | blob_fields if fields else None, exclude=exclude)
+            result = await analyses.find_one({"id": analysis_id}, projection)
+            if result is None:
+                archived = await restore_analysis(analysis_id)
+                if archived is None:
+                    return None
+                result = {key: value for key, value in archived.items() if key not in exclude}
+        return AnalysisResult(**await load_fields(result, ANALYSIS_BLOB_FIELDS))
 
-8. PETS: No pets shall be kept on the Premises without prior written consent of the Landlord.
+    @staticmethod
+    async def get_lease_clusters(limit: int = 20, min_size: int = 2) -> List[LeaseClusterStats]:
+        """Most active clusters of near-identical uploaded leases."""
+        stats = await LeaseClusterIndex.cluster_stats(limit=limit, min_size=min_size)
+        return [LeaseClusterStats(**cluster) for cluster in stats]
 
-9. REPAIRS AND MAINTENANCE: Tenant acknowledges that the Premises are in good order and repair. Tenant shall be responsible for all repairs required due to Tenant's negligence.
+    @staticmethod
+    def result_json(result: AnalysisResult, fields: Optional[Set[str]] = None, include_raw: bool = False) -> str:
+        """
+        JSON of an analysis in the shape the client asked for.
 
-10. RIGHT OF ENTRY: Landlord may enter the Premises at reasonable hours to inspect, make repairs, or show the Premises to prospective tenants or buyers.
+        Args:
+            result: The analysis
+            fields: Only these fields (see projection.parse_fields)
+            include_raw: Keep the multi-KB raw Gemini response (when no fields are given)
+        """
+        if fields:
+            return result.json(include=fields)
+        return result.json(exclude=None if include_raw else {"raw_response"})
 
-11. ASSIGNMENT AND SUBLETTING: Tenant shall not assign this lease or sublet any portion of the Premises without prior written consent of the Landlord.
+    @staticmethod
+    async def get_analysis_json(analysis_id: str, include_raw: bool = False, fields: Optional[Set[str]] = None) -> Optional[str]:
+        """
+        Serialized analysis for the share-link endpoint.
 
-12. TENANT'S HOLD OVER: If Tenant remains in possession after expiration of the term, Tenant shall become a tenant at sufferance and shall pay double rent.
+        Analyses only change when the rescoring job runs (workers are
+        restarted after it), so the JSON is kept in an LRU and popular
+        results are served without touching the database.
 
-13. ATTORNEY'S FEES: In case of any legal action to enforce this Agreement, the prevailing party shall be entitled to attorney's fees.
+        Returns:
+            JSON of the analysis, or None if it doesn't exist
+        """
+        key = (analysis_id, include_raw, tuple(sorted(fields)) if fields else None)
+        cached = _analysis_json_cache.get(key)
+        if cached is not None:
+            return cached
 
-Tenant: ________________________ Date: ________
+        result = await AnalysisService.get_analysis_by_id(analysis_id, include_raw=include_raw, fields=fields)
+        if result is None:
+            return None
+        serialized = AnalysisService.result_json(result, fields, include_raw)
+        _analysis_json_cache.set(key, serialized)
+        return serialized
 
-Landlord: ______________________ Date: ________"""
-        ]
-        
-        return random.choice(sample_leases)
+    @staticmethod
+    async def _get_random_lease_document() -> str:
+        """
+        Get a random lease document from the database.
+        For demo, this returns a fake lease document.
+        In production, this would query MongoDB.
+        """
+        return random.choice(TEMPLATE_LEASES)
 
     @staticmethod
     async def _search_property_listings(address: str) -> Optional[str]:
         """
-        Perform a search for property listings based on the address.
-        This would use Google Search API in production, but for this demo
-        it returns a mock listing URL.
+        Find the rental listing for an address.
+
+        Goes through the configured search provider (LISTING_SEARCH_PROVIDER);
+        answers, including "no listing found", are cached per normalized address.
         """
         print(f"Searching for property listings with address: {address}")
-        # In a real implementation, this would call Google Search API
-        # For demo, return a fake listing URL
-        mock_listings = [
-            f"https://www.zillow.com/homes/for_rent/{address.replace(' ', '-')}",
-            f"https://www.apartments.com/search/{address.replace(' ', '-')}",
-            f"https://www.craigslist.org/search/apa?query={address.replace(' ', '+')}"
-        ]
-        return random.choice(mock_listings)
+        return await resolve_listing(address)
 
     @classmethod
     def _process_gemini_response(cls, raw_response: str) -> Dict[str, Any]:
@@ -972,52 +1532,3 @@ Landlord: ______________________ Date: ________"""
                 "trustworthiness_grade": "C",
                 "risk_level": "Medium Risk"
             }
-            
-    @staticmethod
-    def _calculate_trustworthiness(scam_likelihood: str, concerning_clauses_count: int) -> tuple:
-        """Calculate trustworthiness score, grade, and risk level based on analysis."""
-        # Base score based on scam likelihood - MORE GENEROUS STARTING POINTS
-        base_score = {
-            "LOW": 90,    # Increased from 85
-            "MEDIUM": 70, # Increased from 60
-            "HIGH": 40    # Increased from 30
-        }.get(scam_likelihood, 60)  # Default is more generous too (was 50)
-        
-        # Adjust score based on concerning clauses - LESS SEVERE PENALTIES
-        if concerning_clauses_count == 0:
-            adjustment = 10  # Bonus for no concerning clauses
-        elif concerning_clauses_count == 1:
-            adjustment = 0   # Single concern is normal, no penalty
-        elif concerning_clauses_count <= 3:
-            adjustment = -5  # Minor concerns
-        elif concerning_clauses_count <= 6:
-            adjustment = -10 # Moderate concerns (was -15)
-        else:
-            adjustment = -20 # Serious concerns (was -25)
-            
-        # Calculate final score (keeping within 0-100 range)
-        score = max(0, min(100, base_score + adjustment))
-        
-        # Determine grade based on score - MORE RELAXED GRADING
-        if score >= 85:      # Was 90
-            grade = TrustworthinessGrade.A
-        elif score >= 75:    # Was 80
-            grade = TrustworthinessGrade.B
-        elif score >= 55:    # Was 60
-            grade = TrustworthinessGrade.C
-        elif score >= 35:    # Was 40
-            grade = TrustworthinessGrade.D
-        else:
-            grade = TrustworthinessGrade.F
-            
-        # Determine risk level - MORE RELAXED RISK ASSESSMENT
-        if score >= 75:      # Was 80
-            risk_level = RiskLevel.LOW_RISK
-        elif score >= 55:    # Was 60
-            risk_level = RiskLevel.MEDIUM_RISK
-        elif score >= 25:    # Was 30
-            risk_level = RiskLevel.HIGH_RISK
-        else:
-            risk_level = RiskLevel.VERY_HIGH_RISK
-            
-        return score, grade, risk_level
@@ -0,0 +1,289 @@
+"""
+Retention tiers of stored analyses.
+
+- Hot: analyses younger than RAW_RESPONSE_RETENTION_DAYS are stored whole.
+- Lean: older analyses lose their raw Gemini response, the rest of the
+  result is kept. The lease text an analysis was made from expires after
+  DOCUMENT_RETENTION_DAYS through a TTL index on its expires_at date.
+- Cold: analyses older than ARCHIVE_AFTER_DAYS are moved out of the hot
+  collection into gzip-compressed NDJSON batches in the
+  `analysis_archive_batches` collection, with the text of their blobs, and
+  put back when one is requested by id.
+
+Dropping a raw response, expiring lease text or archiving an analysis only
+removes the reference to a blob. Blobs referenced by no analysis or lease
+text and not stored again for BLOB_SWEEP_GRACE_DAYS are deleted last.
+
+Run daily (a tier set to 0 days is off):
+
+    python -m app.utils.analysis_archive [--dry-run]
+
+Archives live in the database rather than on local disk, which the web
+service and a job run don't share and a redeploy wipes. Every batch of
+ARCHIVE_BATCH_SIZE analyses is one compressed document (split further to
+stay under ARCHIVE_MAX_BATCH_BYTES) and the `analysis_archive` collection
+records the batch of each analysis, so a restore decompresses one batch.
+Analyses are deleted from the hot collection only after their batch is
+written and indexed.
+"""
+
+import os
+import sys
+import uuid
+import gzip
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import Binary, json_util
+from pymongo import UpdateOne
+
+from app.utils.db import Database, get_collection
+from app.utils.blob_store import BLOB_SUFFIX, BLOBS_COLLECTION, get_blobs
+
+logger = logging.getLogger("rent-spiracy")
+
+# Days before an analysis' raw Gemini response is dropped
+RAW_RESPONSE_RETENTION_DAYS = int(os.getenv("RAW_RESPONSE_RETENTION_DAYS", "30"))
+
+# Days the lease text of an analysis is kept (for diffing revised leases)
+DOCUMENT_RETENTION_DAYS = int(os.getenv("DOCUMENT_RETENTION_DAYS", "90"))
+
+# Days before an analysis is moved to the cold archive
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+# Compressed batches above this are split, MongoDB documents are capped at 16 MB
+ARCHIVE_MAX_BATCH_BYTES = int(os.getenv("ARCHIVE_MAX_BATCH_BYTES", str(12 * 1024 * 1024)))
+
+# Analysis id -> archive batch
+ARCHIVE_COLLECTION = "analysis_archive"
+
+# Compressed NDJSON batches of archived analyses
+ARCHIVE_BATCHES_COLLECTION = "analysis_archive_batches"
+
+# Days an unreferenced blob is kept after it was last stored; covers the
+# analyses still waiting in the write-behind buffer
+BLOB_SWEEP_GRACE_DAYS = int(os.getenv("BLOB_SWEEP_GRACE_DAYS", "1"))
+
+# Collection -> text fields whose `<field>_blob` references a blob
+BLOB_REFERENCES = {
+    "analyses": ("raw_response",),
+    "analysis_documents": ("text",),
+}
+
+
+def document_expiry() -> Optional[datetime]:
+    """expires_at of lease text stored now, or None to keep it."""
+    if DOCUMENT_RETENTION_DAYS <= 0:
+        return None
+    # TTL indexes compare against UTC dates
+    return datetime.now(timezone.utc) + timedelta(days=DOCUMENT_RETENTION_DAYS)
+
+
+def _cutoff(days: int) -> str:
+    """created_at before which an analysis is older than `days` (stored as ISO strings)."""
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+
+async def expire_raw_responses(dry_run: bool = False) -> int:
+    """
+    Drop the raw Gemini response of analyses past RAW_RESPONSE_RETENTION_DAYS.
+
+    Returns:
+        Number of analyses trimmed
+    """
+    if RAW_RESPONSE_RETENTION_DAYS <= 0:
+        return 0
+    raw_fields = ("raw_response", "raw_response" + BLOB_SUFFIX)
+    query = {
+        "created_at": {"$lt": _cutoff(RAW_RESPONSE_RETENTION_DAYS)},
+        "$or": [{field: {"$ne": None}} for field in raw_fields],
+    }
+    analyses = await get_collection("analyses")
+    if dry_run:
+        return await analyses.count_documents(query)
+    result = await analyses.update_many(query, {"$unset": {field: "" for field in raw_fields}})
+    return result.modified_count
+
+
+def _compress_batch(documents: List[Dict[str, Any]]) -> bytes:
+    """Gzip-compressed NDJSON of a batch."""
+    return gzip.compress(b"".join(json_util.dumps(document).encode("utf-8") + b"\n" for document in documents))
+
+
+def _read_analysis(data: bytes, analysis_id: str) -> Optional[Dict[str, Any]]:
+    """Find an analysis in a compressed batch."""
+    for line in gzip.decompress(data).splitlines():
+        document = json_util.loads(line)
+        if document.get("id") == analysis_id:
+            return document
+    return None
+
+
+async def _inline_blobs(batch: List[Dict[str, Any]]) -> None:
+    """Put the blob text back into analyses, so archive files don't depend on the blob store."""
+    refs = [value for document in batch for key, value in document.items() if key.endswith(BLOB_SUFFIX) and value]
+    texts = await get_blobs(refs)
+    for document in batch:
+        for key in [key for key in document if key.endswith(BLOB_SUFFIX)]:
+            ref = document.pop(key)
+            document[key[:-len(BLOB_SUFFIX)]] = texts.get(ref) if ref else None
+
+
+async def archive_analyses(batch_size: int = ARCHIVE_BATCH_SIZE, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Move analyses past ARCHIVE_AFTER_DAYS to archive batches.
+
+    Returns:
+        Numbers of batches written and of analyses archived
+    """
+    counts: Dict[str, Any] = {"batches": 0, "archived": 0}
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return counts
+    query = {"created_at": {"$lt": _cutoff(ARCHIVE_AFTER_DAYS)}}
+    analyses = await get_collection("analyses")
+    if dry_run:
+        counts["archived"] = await analyses.count_documents(query)
+        return counts
+
+    archive_index = await get_collection(ARCHIVE_COLLECTION)
+    archive_batches = await get_collection(ARCHIVE_BATCHES_COLLECTION)
+
+    async def write(batch: List[Dict[str, Any]]) -> None:
+        data = await asyncio.to_thread(_compress_batch, batch)
+        if len(data) > ARCHIVE_MAX_BATCH_BYTES and len(batch) > 1:
+            middle = len(batch) // 2
+            await write(batch[:middle])
+            await write(batch[middle:])
+            return
+        batch_id = str(uuid.uuid4())
+        archived_at = datetime.now().isoformat()
+        await archive_batches.insert_one({
+            "_id": batch_id, "data": Binary(data), "count": len(batch), "archived_at": archived_at
+        })
+        await archive_index.bulk_write([
+            UpdateOne(
+                {"_id": document["id"]},
+                {"$set": {"batch": batch_id, "archived_at": archived_at}},
+                upsert=True
+            )
+            for document in batch
+        ], ordered=False)
+        counts["batches"] += 1
+
+    async def move(batch: List[Dict[str, Any]]) -> None:
+        await _inline_blobs(batch)
+        await write(batch)
+        await analyses.delete_many({"_id": {"$in": [document["_id"] for document in batch]}})
+        counts["archived"] += len(batch)
+        logger.info(f"Archived {counts['archived']} analyses")
+
+    batch: List[Dict[str, Any]] = []
+    async for document in analyses.find(query, batch_size=batch_size).sort("created_at", 1):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await move(batch)
+            batch = []
+    if batch:
+        await move(batch)
+    return counts
+
+
+async def sweep_blobs(batch_size: int = ARCHIVE_BATCH_SIZE, dry_run: bool = False) -> int:
+    """
+    Delete the blobs no analysis or lease text references any more.
+
+    Only blobs not stored again within BLOB_SWEEP_GRACE_DAYS are candidates,
+    and the delete checks that again, so a blob that a new analysis
+    references in the meantime is kept.
+
+    Returns:
+        Number of blobs deleted
+    """
+    if BLOB_SWEEP_GRACE_DAYS <= 0:
+        return 0
+    cutoff = _cutoff(BLOB_SWEEP_GRACE_DAYS)
+    stale = {"$or": [
+        {"referenced_at": {"$lt": cutoff}},
+        # Blobs stored before referenced_at was recorded
+        {"referenced_at": {"$exists": False}, "created_at": {"$lt": cutoff}},
+    ]}
+    blobs = await get_collection(BLOBS_COLLECTION)
+
+    async def sweep(refs: List[str]) -> int:
+        referenced = set()
+        for collection_name, fields in BLOB_REFERENCES.items():
+            collection = await get_collection(collection_name)
+            for field in fields:
+                key = field + BLOB_SUFFIX
+                async for document in collection.find({key: {"$in": refs}}, {key: 1}):
+                    referenced.add(document[key])
+        unreferenced = [ref for ref in refs if ref not in referenced]
+        if dry_run or not unreferenced:
+            return len(unreferenced)
+        result = await blobs.delete_many({"_id": {"$in": unreferenced}, **stale})
+        return result.deleted_count
+
+    swept = 0
+    batch: List[str] = []
+    async for blob in blobs.find(stale, {"_id": 1}, batch_size=batch_size):
+        batch.append(blob["_id"])
+        if len(batch) >= batch_size:
+            swept += await sweep(batch)
+            batch = []
+    if batch:
+        swept += await sweep(batch)
+    return swept
+
+
+async def restore_analysis(analysis_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Bring an archived analysis back into the hot collection.
+
+    The analysis comes back with its large text fields inline, as archived.
+
+    Returns:
+        The analysis document, or None if it was never archived or its batch is gone
+    """
+    try:
+        archive_index = await get_collection(ARCHIVE_COLLECTION)
+        entry = await archive_index.find_one({"_id": analysis_id})
+        if entry is None:
+            return None
+        archive_batches = await get_collection(ARCHIVE_BATCHES_COLLECTION)
+        archived = await archive_batches.find_one({"_id": entry["batch"]})
+        document = await asyncio.to_thread(_read_analysis, bytes(archived["data"]), analysis_id) if archived else None
+        if document is None:
+            logger.error(f"Archived analysis {analysis_id} not found in batch {entry['batch']}")
+            return None
+        analyses = await get_collection("analyses")
+        await analyses.replace_one({"id": analysis_id}, document, upsert=True)
+        logger.info(f"Restored analysis {analysis_id} from batch {entry['batch']}")
+        return document
+    except Exception as e:
+        logger.error(f"Error restoring archived analysis {analysis_id}: {str(e)}")
+        return None
+
+
+async def apply_retention(dry_run: bool = False) -> None:
+    """Trim and archive the analyses past their retention, then sweep unreferenced blobs"""
+    print("Connecting to database...")
+    await Database.connect_db()
+    try:
+        trimmed = await expire_raw_responses(dry_run=dry_run)
+        print(f"Raw responses older than {RAW_RESPONSE_RETENTION_DAYS} days: {trimmed} {'would be dropped' if dry_run else 'dropped'}")
+        counts = await archive_analyses(dry_run=dry_run)
+        print(
+            f"Analyses older than {ARCHIVE_AFTER_DAYS} days: {counts['archived']} "
+            f"{'would be archived' if dry_run else 'archived'}{' in ' + str(counts['batches']) + ' batches' if counts['batches'] else ''}"
+        )
+        swept = await sweep_blobs(dry_run=dry_run)
+        print(f"Unreferenced blobs: {swept} {'would be deleted' if dry_run else 'deleted'}")
+    finally:
+        await Database.close_db()
+
+if __name__ == "__main__":
+    asyncio.run(apply_retention(dry_run="--dry-run" in sys.argv[1:]))
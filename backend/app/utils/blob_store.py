@@ -0,0 +1,176 @@
+"""
+Compressed, content-addressed storage for large text fields.
+
+Raw Gemini responses and extracted lease text are several KB each and are
+rarely read, but kept inline they make every analysis document large. Text
+above BLOB_MIN_SIZE is compressed (zstd, or zlib if the zstandard package is
+missing; zlib blobs stay readable either way) and stored once in the
+`blobs` collection under its SHA-256; the document keeps only that
+reference and the text is loaded when it is actually requested. The same lease or response stored twice
+takes the space of one.
+
+Blobs aren't deleted with the documents referencing them; the retention
+job sweeps the ones no document references any more (see
+app.utils.analysis_archive.sweep_blobs), going by when each was last stored.
+"""
+
+import os
+import zlib
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from bson import Binary
+
+from app.utils.db import get_collection
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger("rent-spiracy")
+
+# Move large text fields out of the documents (true/false)
+BLOB_STORE_ENABLED = os.getenv("BLOB_STORE_ENABLED", "true").lower() != "false"
+
+# Text shorter than this (in bytes) stays inline
+BLOB_MIN_SIZE = int(os.getenv("BLOB_MIN_SIZE", "1024"))
+
+# zstd level (1-22); zlib is capped at 9
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+
+BLOBS_COLLECTION = "blobs"
+
+# Field holding the blob reference of an offloaded text field
+BLOB_SUFFIX = "_blob"
+
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """
+    Compress with the best available codec.
+
+    Returns:
+        (codec name, compressed bytes)
+    """
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=BLOB_COMPRESSION_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, min(BLOB_COMPRESSION_LEVEL, 9))
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """
+    Reverse compress().
+
+    Raises:
+        ValueError: For an unknown codec, or zstd data without the zstandard package
+    """
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Blob is zstd-compressed but the zstandard package isn't installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown blob codec: {codec}")
+
+
+async def put_blob(text: str) -> str:
+    """
+    Store a text once, compressed.
+
+    Returns:
+        Its reference, to be kept in place of the text
+    """
+    data = text.encode("utf-8")
+    ref = hashlib.sha256(data).hexdigest()
+    codec, compressed = compress(data)
+    collection = await get_collection(BLOBS_COLLECTION)
+    # Content-addressed: an existing blob with this hash already holds the text
+    now = datetime.now().isoformat()
+    await collection.update_one(
+        {"_id": ref},
+        {
+            "$setOnInsert": {
+                "codec": codec,
+                "size": len(data),
+                "data": Binary(compressed),
+                "created_at": now
+            },
+            # Keeps a blob stored again from being swept before its new reference is written
+            "$set": {"referenced_at": now}
+        },
+        upsert=True
+    )
+    return ref
+
+
+async def get_blobs(refs: Iterable[str]) -> Dict[str, str]:
+    """
+    Texts of stored blobs.
+
+    Returns:
+        reference -> text, for the references found
+    """
+    refs = list(set(refs))
+    if not refs:
+        return {}
+    collection = await get_collection(BLOBS_COLLECTION)
+    texts = {}
+    async for blob in collection.find({"_id": {"$in": refs}}):
+        try:
+            texts[blob["_id"]] = decompress(blob["codec"], bytes(blob["data"])).decode("utf-8")
+        except (ValueError, zlib.error, UnicodeDecodeError) as e:
+            logger.error(f"Unreadable blob {blob['_id']}: {str(e)}")
+    return texts
+
+
+async def get_blob(ref: str) -> Optional[str]:
+    """Text of a stored blob, or None if it doesn't exist."""
+    return (await get_blobs([ref])).get(ref)
+
+
+async def offload_fields(document: Dict, fields: Iterable[str]) -> Dict:
+    """
+    Move large text fields of a document into blobs.
+
+    Each field above BLOB_MIN_SIZE is replaced by `<field>_blob` holding the
+    blob reference. The document is changed in place; a field whose blob
+    can't be written stays inline.
+
+    Returns:
+        The document
+    """
+    if not BLOB_STORE_ENABLED:
+        return document
+    for field in fields:
+        text = document.get(field)
+        if not isinstance(text, str) or len(text.encode("utf-8")) < BLOB_MIN_SIZE:
+            continue
+        try:
+            document[field + BLOB_SUFFIX] = await put_blob(text)
+            del document[field]
+        except Exception as e:
+            logger.warning(f"Blob write for {field} failed, keeping it inline: {str(e)}")
+    return document
+
+
+async def load_fields(document: Optional[Dict], fields: Iterable[str]) -> Optional[Dict]:
+    """
+    Put the text of offloaded fields back into a document.
+
+    Only fields whose `<field>_blob` reference was read are loaded, so a
+    projection leaving out the reference also skips the blob lookup. The
+    document is changed in place.
+
+    Returns:
+        The document
+    """
+    if not document:
+        return document
+    refs = {field: document.pop(field + BLOB_SUFFIX) for field in fields if document.get(field + BLOB_SUFFIX)}
+    if refs:
+        texts = await get_blobs(refs.values())
+        for field, ref in refs.items():
+            document[field] = texts.get(ref)
+    return document
@@ -0,0 +1,81 @@
+"""
+Small in-process caches.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """Least-recently-used cache with a fixed number of entries."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, V]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        """Return the cached value and mark it as recently used."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: V) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        return self._entries.pop(key, default)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Size and hit/miss counters, for logging."""
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+class TTLCache(LRUCache[V]):
+    """LRU cache whose entries also expire after a time-to-live."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        super().__init__(max_size)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        """Return the cached value unless it has expired."""
+        entry = super().get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            # Expired entries count as misses
+            self.pop(key)
+            self.hits -= 1
+            self.misses += 1
+            return default
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        """Store a value for ttl seconds (the cache default if not given)."""
+        super().set(key, (value, time.monotonic() + (self.ttl if ttl is None else ttl)))
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
@@ -0,0 +1,311 @@
+"""
+Per-clause cache of Gemini verdicts.
+
+A document is split into clauses and every clause is looked up by its
+wording hash and the analysis language. Clauses seen before are replaced in
+the prompt by a one-line reference carrying the cached verdict, so Gemini
+only reads the novel clauses in full; the cached concerning clauses are
+merged back into the result afterwards. Verdicts live in an in-process LRU
+backed by the `clause_analyses` collection.
+
+Clauses without an exact match are looked up in a similarity index of the
+analyzed clauses, so boilerplate that differs only by names is known to be
+clean when its closest match with the same figures was. A concerning
+verdict is only reused for the exact clause: its text describes the lease
+it was written for, a similar clause is sent to Gemini in full.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.models.rental import ClauseAnalysis, Language
+from app.utils.cache import LRUCache
+from app.utils.clause_index import ClauseSimilarityIndex
+from app.utils.clause_segmenter import Clause, segment_clauses, find_clause
+from app.utils.db import get_collection
+from app.utils.write_behind import write_in_background
+from app.utils.gemini_service import MAX_DOCUMENT_CHARS
+
+logger = logging.getLogger("rent-spiracy")
+
+# Turn the clause cache off entirely (true/false)
+CLAUSE_CACHE_ENABLED = os.getenv("CLAUSE_CACHE_ENABLED", "true").lower() != "false"
+
+# Number of clause verdicts kept in memory
+CLAUSE_CACHE_SIZE = int(os.getenv("CLAUSE_CACHE_SIZE", "5000"))
+
+# Reuse the verdict of a near-identical clause (cosine similarity of hashed
+# n-gram vectors at least CLAUSE_SIMILARITY_THRESHOLD)
+CLAUSE_SIMILARITY_ENABLED = os.getenv("CLAUSE_SIMILARITY_ENABLED", "true").lower() != "false"
+CLAUSE_SIMILARITY_THRESHOLD = float(os.getenv("CLAUSE_SIMILARITY_THRESHOLD", "0.9"))
+
+# Analyzed clauses kept in the similarity index of each language (2 KB each)
+CLAUSE_INDEX_SIZE = int(os.getenv("CLAUSE_INDEX_SIZE", "5000"))
+
+CLAUSE_CACHE_COLLECTION = "clause_analyses"
+
+# Stored clauses vectorized at a time while the similarity index is loaded
+INDEX_LOAD_BATCH = 500
+
+# Documents with fewer clauses than this aren't structured enough to split
+MIN_CLAUSES = 3
+
+# Short clauses ("2. TERM: 12 months") cost less than their reference line
+MIN_CACHED_CLAUSE_CHARS = 120
+
+# Start of a cached clause kept in the prompt, so key terms (amounts, dates)
+# stay visible to the model
+REFERENCE_PREVIEW_CHARS = 100
+
+SEPARATOR = "\n\n"
+
+
+def _language_value(language) -> str:
+    return getattr(language, "value", language) or "english"
+
+
+class ClausePlan:
+    """The clauses of one document, split into cached and novel ones."""
+
+    def __init__(self, language: str, clauses: List[Clause], cached: Dict[int, List[dict]]):
+        self.language = language
+        self.clauses = clauses
+        # clause index -> cached concerning ClauseAnalysis dicts (empty if clean)
+        self.cached = cached
+
+    @property
+    def novel_clauses(self) -> List[Clause]:
+        return [clause for clause in self.clauses if clause.index not in self.cached]
+
+    def _reference(self, clause: Clause) -> str:
+        verdicts = self.cached[clause.index]
+        if verdicts:
+            reasons = "; ".join((verdict.get("reason") or "").split(". ")[0] for verdict in verdicts)
+            status = f"already reviewed, flagged as concerning ({reasons})"
+        else:
+            status = "already reviewed, no concerns"
+        return f"{clause.preview(REFERENCE_PREVIEW_CHARS)} [{status}]"
+
+    def prompt_text(self) -> str:
+        """Document text with cached clauses replaced by one-line references."""
+        return SEPARATOR.join(
+            self._reference(clause) if clause.index in self.cached else clause.text
+            for clause in self.clauses
+        )
+
+    def reviewed_clauses(self) -> List[Clause]:
+        """Novel clauses that fit in the prompt, i.e. the ones Gemini actually read."""
+        reviewed = []
+        offset = 0
+        for clause in self.clauses:
+            text = self._reference(clause) if clause.index in self.cached else clause.text
+            offset += len(text) + len(SEPARATOR)
+            if offset > MAX_DOCUMENT_CHARS:
+                break
+            if clause.index not in self.cached:
+                reviewed.append(clause)
+        return reviewed
+
+    def merge(self, clauses: List[ClauseAnalysis]) -> List[ClauseAnalysis]:
+        """Add cached concerning clauses the fresh analysis didn't report again."""
+        merged = list(clauses)
+        reported = {
+            matched.index for matched in (find_clause(clause.text, self.clauses) for clause in clauses)
+            if matched is not None
+        }
+        for index, verdicts in sorted(self.cached.items()):
+            if index in reported:
+                continue
+            merged.extend(ClauseAnalysis(**verdict) for verdict in verdicts)
+        return merged
+
+
+class ClauseAnalysisCache:
+    """Clause verdict cache keyed by clause hash and language."""
+
+    _memory: LRUCache = LRUCache(CLAUSE_CACHE_SIZE)
+    # language -> similarity index of the analyzed clauses
+    _similar: Dict[str, ClauseSimilarityIndex] = {}
+    _similar_loading: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(clause: Clause, language: str) -> str:
+        return f"{language}:{clause.key}"
+
+    @classmethod
+    async def plan(cls, document_content: str, language) -> Optional[ClausePlan]:
+        """
+        Segment a document and look up every clause.
+
+        Args:
+            document_content: Normalized lease text
+            language: Analysis language; cached verdicts are written in it
+
+        Returns:
+            ClausePlan, or None if caching is off or the document has no clause structure
+        """
+        if not CLAUSE_CACHE_ENABLED or not document_content:
+            return None
+        clauses = segment_clauses(document_content)
+        if len(clauses) < MIN_CLAUSES:
+            return None
+
+        language = _language_value(language)
+        candidates = {
+            cls._key(clause, language): clause
+            for clause in clauses if len(clause.text) >= MIN_CACHED_CLAUSE_CHARS
+        }
+        cached: Dict[int, List[dict]] = {}
+        missing = []
+        for key, clause in candidates.items():
+            verdicts = cls._memory.get(key)
+            if verdicts is None:
+                missing.append(key)
+            else:
+                cached[clause.index] = verdicts
+
+        if missing:
+            try:
+                collection = await get_collection(CLAUSE_CACHE_COLLECTION)
+                async for document in collection.find({"_id": {"$in": missing}}, {"verdicts": 1}):
+                    cls._memory.set(document["_id"], document["verdicts"])
+                    cached[candidates[document["_id"]].index] = document["verdicts"]
+            except Exception as e:
+                logger.warning(f"Clause cache lookup failed: {str(e)}")
+
+        similar = 0
+        unmatched = [clause for clause in candidates.values() if clause.index not in cached]
+        index = cls._similarity_index(language)
+        if unmatched and index is not None:
+            matches = index.search([clause.text for clause in unmatched], CLAUSE_SIMILARITY_THRESHOLD)
+            for clause, match in zip(unmatched, matches):
+                # Reasons written for another lease would quote its names and figures
+                if match is None or match[2]:
+                    continue
+                cached[clause.index] = []
+                similar += 1
+
+        logger.info(f"Clause cache: {len(cached)} of {len(clauses)} clauses already analyzed ({similar} by similarity)")
+        return ClausePlan(language, clauses, cached)
+
+    @classmethod
+    def _similarity_index(cls, language: str) -> Optional[ClauseSimilarityIndex]:
+        """
+        The similarity index of a language, or None while it's off or still loading.
+
+        The first call starts loading the stored clauses in the background.
+        """
+        if not CLAUSE_SIMILARITY_ENABLED:
+            return None
+        if cls._similar_loading is None:
+            cls._similar_loading = asyncio.get_running_loop().create_task(cls._load_similarity_index())
+        if not cls._similar_loading.done():
+            return None
+        return cls._similar.get(language)
+
+    @classmethod
+    def _index(cls, language: str) -> ClauseSimilarityIndex:
+        if language not in cls._similar:
+            cls._similar[language] = ClauseSimilarityIndex(CLAUSE_INDEX_SIZE)
+        return cls._similar[language]
+
+    @classmethod
+    async def _load_similarity_index(cls) -> None:
+        """Index the most recently analyzed clauses of every language."""
+        batch: List[tuple] = []
+
+        def add_batch():
+            by_language: Dict[str, list] = {}
+            for language, key, text, verdicts, updated_at in batch:
+                # Clauses stored since loading started have the newer verdict
+                if key not in cls._index(language):
+                    by_language.setdefault(language, []).append(((key, text, verdicts), updated_at))
+            for language, clauses in by_language.items():
+                # A full index keeps the most recently analyzed clauses
+                cls._index(language).add_many(
+                    [clause for clause, _ in clauses], [updated_at for _, updated_at in clauses]
+                )
+
+        try:
+            collection = await get_collection(CLAUSE_CACHE_COLLECTION)
+            cursor = collection.find(
+                {"text": {"$exists": True}},
+                {"text": 1, "verdicts": 1, "language": 1, "updated_at": 1}
+            ).sort("updated_at", -1).limit(CLAUSE_INDEX_SIZE * len(Language))
+            async for document in cursor:
+                language = document.get("language") or "english"
+                updated_at = datetime.fromisoformat(document["updated_at"]).timestamp() if document.get("updated_at") else 0.0
+                batch.append((language, document["_id"], document["text"], document.get("verdicts") or [], updated_at))
+                if len(batch) >= INDEX_LOAD_BATCH:
+                    add_batch()
+                    batch = []
+            add_batch()
+        except Exception as e:
+            logger.warning(f"Clause similarity index load failed: {str(e)}")
+        logger.info(f"Clause similarity index: {sum(len(index) for index in cls._similar.values())} clauses")
+
+    @classmethod
+    async def store(cls, plan: ClausePlan, clauses: List[ClauseAnalysis]) -> int:
+        """
+        Record the verdict of every clause Gemini reviewed in full.
+
+        A reviewed clause with no matching concerning clause in the analysis
+        is stored as clean, unless some concerning clause couldn't be matched
+        to the document; then only the matched verdicts are stored.
+
+        Returns:
+            Number of clause verdicts stored
+        """
+        reviewed = [clause for clause in plan.reviewed_clauses() if len(clause.text) >= MIN_CACHED_CLAUSE_CHARS]
+        if not reviewed:
+            return 0
+
+        verdicts: Dict[int, List[dict]] = {clause.index: [] for clause in reviewed}
+        unmatched = 0
+        for analysis in clauses:
+            if not analysis.is_concerning:
+                continue
+            matched = find_clause(analysis.text, plan.clauses)
+            if matched is None:
+                unmatched += 1
+            elif matched.index in verdicts:
+                verdicts[matched.index].append(analysis.dict())
+        if unmatched:
+            # The unmatched quote may belong to any clause, don't cache one as clean
+            reviewed = [clause for clause in reviewed if verdicts[clause.index]]
+
+        if not reviewed:
+            return 0
+
+        now = datetime.now().isoformat()
+        operations = []
+        for clause in reviewed:
+            key = cls._key(clause, plan.language)
+            cls._memory.set(key, verdicts[clause.index])
+            operations.append(UpdateOne(
+                {"_id": key},
+                {"$set": {
+                    "verdicts": verdicts[clause.index],
+                    "text": clause.text,
+                    "language": plan.language,
+                    "updated_at": now
+                }},
+                upsert=True
+            ))
+        if CLAUSE_SIMILARITY_ENABLED:
+            cls._index(plan.language).add_many([
+                (cls._key(clause, plan.language), clause.text, verdicts[clause.index]) for clause in reviewed
+            ])
+
+        # The verdicts are served from memory already, persist off the request path
+        async def write() -> None:
+            collection = await get_collection(CLAUSE_CACHE_COLLECTION)
+            await collection.bulk_write(operations, ordered=False)
+
+        write_in_background(write(), "Clause cache write")
+        return len(operations)
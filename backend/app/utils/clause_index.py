@@ -0,0 +1,185 @@
+"""
+Similarity index over analyzed clauses.
+
+Exact clause keys miss boilerplate that differs only by names. Every
+analyzed clause is turned into a hashed word n-gram vector (numbers, amounts
+and dates all count as the same token) and kept in a NumPy matrix with the
+figures of the clause; a new clause whose cosine similarity to a stored one
+reaches the threshold, and whose figures are exactly the same, reuses that
+clause's verdict. "$50 late fee after 72 hours" never matches "$500 late fee
+after 1 hour".
+"""
+
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.clause_segmenter import NUMBERING_PATTERN
+
+# "$1,500.00", "15th", "5%", "03/01/2024" all become the number token
+TOKEN_PATTERN = re.compile(r"\$?[0-9][0-9,\./\-]*(?:%|st|nd|rd|th)?|[a-z]+")
+NUMBER_TOKEN = "#"
+
+# Month names are part of dates, so they count as figures too ("may" is
+# left out, it is mostly the verb)
+MONTHS = {
+    "january", "february", "march", "april", "june", "july",
+    "august", "september", "october", "november", "december",
+}
+
+# Vector width; collisions only add noise to the similarity, which stays
+# far below the match threshold for unrelated clauses at this width
+DEFAULT_DIMENSIONS = 512
+
+
+def clause_tokens(text: str) -> List[str]:
+    """Words of a clause without its numbering, with every figure replaced by one token."""
+    text = NUMBERING_PATTERN.sub("", (text or "").strip(), count=1).lower()
+    return [
+        NUMBER_TOKEN if token[0] in "$0123456789" or token in MONTHS else token
+        for token in TOKEN_PATTERN.findall(text)
+    ]
+
+
+def clause_figures(text: str) -> Tuple[str, ...]:
+    """Amounts, numbers and dates of a clause in order, as written."""
+    text = NUMBERING_PATTERN.sub("", (text or "").strip(), count=1).lower()
+    return tuple(
+        token.rstrip(".,-/")
+        for token in TOKEN_PATTERN.findall(text)
+        if token[0] in "$0123456789" or token in MONTHS
+    )
+
+
+def clause_vectors(texts: Sequence[str], dimensions: int = DEFAULT_DIMENSIONS) -> np.ndarray:
+    """
+    Unit-length hashed n-gram vectors of clauses.
+
+    Words and word pairs are hashed into `dimensions` buckets with a hashed
+    sign, weighted by 1 + log(count).
+
+    Returns:
+        float32 array of shape (len(texts), dimensions); empty clauses give zero rows
+    """
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = clause_tokens(text)
+        features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+        if not features:
+            continue
+        hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint32, count=len(features))
+        buckets = (hashes % dimensions).astype(np.int64)
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        counts = np.zeros(dimensions, dtype=np.float32)
+        np.add.at(counts, buckets, signs)
+        nonzero = counts != 0
+        vectors[row, nonzero] = np.sign(counts[nonzero]) * (1 + np.log(np.abs(counts[nonzero])))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class ClauseSimilarityIndex:
+    """
+    Clause vectors with their verdicts, searched by cosine similarity.
+
+    Holds at most max_size clauses in a matrix allocated up front; beyond
+    that the clause added (or analyzed, for loaded ones) longest ago is
+    replaced.
+    """
+
+    def __init__(self, max_size: int, dimensions: int = DEFAULT_DIMENSIONS):
+        self.max_size = max_size
+        self.dimensions = dimensions
+        # Untouched rows cost no memory until they are written
+        self._vectors = np.zeros((max_size, dimensions), dtype=np.float32)
+        self._ages = np.zeros(max_size, dtype=np.float64)
+        self._keys: List[Optional[str]] = [None] * max_size
+        self._figures: List[Tuple[str, ...]] = [()] * max_size
+        self._verdicts: List[List[dict]] = [[] for _ in range(max_size)]
+        # clause key -> row
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def add(self, key: str, text: str, verdicts: List[dict]) -> None:
+        """Add a clause, or replace the verdict of one already indexed."""
+        self.add_many([(key, text, verdicts)])
+
+    def add_many(
+        self,
+        clauses: Sequence[Tuple[str, str, List[dict]]],
+        added_at: Optional[Sequence[float]] = None
+    ) -> None:
+        """
+        Add (key, text, verdicts) clauses, vectorizing them together.
+
+        Args:
+            clauses: Clauses to add
+            added_at: Timestamp of each clause's verdict (now if not given);
+                a full index only takes clauses newer than its oldest one
+        """
+        now = time.time()
+        ages = list(added_at) if added_at is not None else [now] * len(clauses)
+        new = []
+        for (key, text, verdicts), age in zip(clauses, ages):
+            if key in self._rows:
+                row = self._rows[key]
+                self._verdicts[row] = verdicts
+                self._ages[row] = max(self._ages[row], age)
+            else:
+                new.append((key, text, verdicts, age))
+        if not new or not self.max_size:
+            return
+        vectors = clause_vectors([text for _, text, _, _ in new], self.dimensions)
+
+        for (key, text, verdicts, age), vector in zip(new, vectors):
+            if len(self._rows) < self.max_size:
+                # Rows are filled in order until the index is full
+                row = len(self._rows)
+            else:
+                row = int(self._ages.argmin())
+                if self._ages[row] >= age:
+                    continue
+                del self._rows[self._keys[row]]
+            self._vectors[row] = vector
+            self._ages[row] = age
+            self._keys[row] = key
+            self._figures[row] = clause_figures(text)
+            self._verdicts[row] = verdicts
+            self._rows[key] = row
+    def search(self, texts: Sequence[str], threshold: float) -> List[Optional[Tuple[str, float, List[dict]]]]:
+        """
+        Most similar indexed clause of each text with the same figures, all
+        texts in one matrix product.
+
+        Args:
+            texts: Clause texts to look up
+            threshold: Lowest cosine similarity that counts as a match
+
+        Returns:
+            (key, similarity, verdicts) per text, or None where no clause with
+            the same figures reaches the threshold
+        """
+        if not texts or not self._rows:
+            return [None] * len(texts)
+        indexed = len(self._rows)
+        similarities = clause_vectors(texts, self.dimensions) @ self._vectors[:indexed].T
+        matches: List[Optional[Tuple[str, float, List[dict]]]] = []
+        for text, scores in zip(texts, similarities):
+            figures = clause_figures(text)
+            rows = np.flatnonzero(scores >= threshold)
+            match = None
+            for row in rows[np.argsort(-scores[rows])].tolist():
+                if self._figures[row] == figures:
+                    match = (self._keys[row], float(scores[row]), self._verdicts[row])
+                    break
+            matches.append(match)
+        return matches
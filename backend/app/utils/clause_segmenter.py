@@ -0,0 +1,129 @@
+"""
+Split lease text into numbered or headed clauses.
+
+Most leases are built from shared boilerplate, so the same clause shows up
+in many documents with a different number or spacing. Each clause gets a
+key that ignores numbering, case, punctuation and whitespace; identical
+wording gives an identical key wherever it appears.
+"""
+
+import re
+import hashlib
+from typing import List, Optional
+
+# "12. RENT", "12) Rent", "Section 4", "§ 7"
+NUMBERED_HEADING_PATTERN = re.compile(
+    r"^\s*(?:(?:section|article|clause|§)\s*(?P<prefixed>[0-9]{1,2})[\.\):]?|(?P<number>[0-9]{1,2})[\.\)])(?![0-9])(?:\s+|$)",
+    re.IGNORECASE
+)
+
+# "ARTICLE IV", "Section II"
+ROMAN_HEADING_PATTERN = re.compile(r"^\s*(?:section|article)\s+[IVXLC]{1,6}\b", re.IGNORECASE)
+
+# A numbered heading may skip one number (a heading lost to OCR) but not more
+MAX_NUMBER_STEP = 2
+
+# A short all-caps line on its own, e.g. "SECURITY DEPOSIT"
+CAPS_HEADING_PATTERN = re.compile(r"^\s*[A-Z][A-Z0-9 ,'&/\-]{3,60}:?\s*$")
+
+# Leading numbering removed before a clause is keyed
+NUMBERING_PATTERN = re.compile(
+    r"^\s*(?:(?:section|article|clause|§)\s*(?:[0-9]{1,2}|[IVXLC]{1,6})[\.\):]?|[0-9]{1,2}[\.\)])\s+",
+    re.IGNORECASE
+)
+
+
+class Clause:
+    """One clause of a lease."""
+
+    def __init__(self, index: int, heading: str, text: str):
+        self.index = index
+        self.heading = heading
+        self.text = text
+        self.key = clause_key(text)
+
+    def preview(self, length: int = 160) -> str:
+        """The start of the clause on one line, cut at a word boundary."""
+        text = re.sub(r"\s+", " ", self.text).strip()
+        if len(text) <= length:
+            return text
+        return text[:length].rsplit(" ", 1)[0] + "..."
+
+
+def clause_key(text: str) -> str:
+    """Hash of a clause's wording, independent of numbering and formatting."""
+    normalized = NUMBERING_PATTERN.sub("", text.strip(), count=1)
+    normalized = re.sub(r"[^a-z0-9$%]+", " ", normalized.lower()).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _heading_number(line: str) -> Optional[int]:
+    match = NUMBERED_HEADING_PATTERN.match(line)
+    if not match:
+        return None
+    return int(match.group("prefixed") or match.group("number"))
+
+
+def _is_heading(line: str, previous_number: Optional[int]) -> bool:
+    number = _heading_number(line)
+    if number is not None:
+        # Numbers inside a clause ("1. ..." sub-lists) restart; a clause number
+        # only counts when it continues the top-level sequence
+        return previous_number is None or previous_number < number <= previous_number + MAX_NUMBER_STEP
+    return bool(ROMAN_HEADING_PATTERN.match(line) or CAPS_HEADING_PATTERN.match(line))
+
+
+def segment_clauses(text: str) -> List[Clause]:
+    """
+    Split a lease into clauses.
+
+    Text before the first heading (title, parties, recitals) becomes the
+    first clause. Clause numbers must keep increasing in small steps, so
+    numbered lists inside a clause stay part of it.
+
+    Args:
+        text: Lease text, ideally normalized
+
+    Returns:
+        Clauses in document order
+    """
+    clauses: List[Clause] = []
+    current: List[str] = []
+    heading = ""
+    previous_number: Optional[int] = None
+
+    def flush():
+        body = "\n".join(current).strip()
+        if body:
+            clauses.append(Clause(len(clauses), heading, body))
+
+    for line in (text or "").split("\n"):
+        if line.strip() and _is_heading(line, previous_number):
+            flush()
+            current = []
+            heading = line.strip()
+            number = _heading_number(line)
+            if number is not None:
+                previous_number = number
+        current.append(line)
+    flush()
+    return clauses
+
+
+def find_clause(excerpt: str, clauses: List[Clause]) -> Optional[Clause]:
+    """
+    Find the clause an excerpt was quoted from.
+
+    The LLM quotes clauses with small changes (trimmed, re-spaced, partial),
+    so the match is done on the same normalization used for keys.
+    """
+    needle = re.sub(r"[^a-z0-9$%]+", " ", (excerpt or "").lower()).strip()
+    if len(needle) < 12:
+        return None
+    # Long quotes may be cut off or paraphrased at the end; the start is reliable
+    probe = needle[:120]
+    for clause in clauses:
+        haystack = re.sub(r"[^a-z0-9$%]+", " ", clause.text.lower())
+        if probe in haystack:
+            return clause
+    return None
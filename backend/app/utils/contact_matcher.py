@@ -0,0 +1,78 @@
+"""
+Match contact details found in a lease or listing against reported suspect leasers.
+"""
+
+import re
+import logging
+from typing import Any, Dict, List
+
+from app.utils.db import get_collection
+from app.utils.seed_data import suspect_leaser_lookup
+
+logger = logging.getLogger("rent-spiracy")
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}")
+
+# US numbers: (555) 123-4567, 555.123.4567, +1 555 123 4567
+PHONE_PATTERN = re.compile(r"(?<!\d)(?:\+?1[\s.\-]?)?\(?(\d{3})\)?[\s.\-]?(\d{3})[\s.\-]?(\d{4})(?!\d)")
+
+# Contacts checked per document, a lease rarely has more than a handful
+MAX_CONTACTS = 20
+
+
+def extract_contacts(text: str) -> Dict[str, List[str]]:
+    """
+    Pull email addresses and phone numbers out of free text.
+
+    Phones are returned in the 555-123-4567 form used for suspect leasers.
+    """
+    emails = list(dict.fromkeys(email.lower() for email in EMAIL_PATTERN.findall(text or "")))
+    phones = list(dict.fromkeys("-".join(groups) for groups in PHONE_PATTERN.findall(text or "")))
+    return {"emails": emails[:MAX_CONTACTS], "phones": phones[:MAX_CONTACTS]}
+
+
+def _summary(leaser: Dict[str, Any], matched_on: List[str]) -> Dict[str, Any]:
+    return {
+        "id": leaser.get("id") or str(leaser.get("_id")),
+        "name": leaser.get("name"),
+        "flags": leaser.get("flags", []),
+        "reported_count": leaser.get("reported_count", 0),
+        "matched_on": matched_on,
+    }
+
+
+async def find_suspect_leasers(text: str) -> List[Dict[str, Any]]:
+    """
+    Suspect leasers whose email or phone number appears in the text.
+
+    Looks the contacts up in the suspect_leasers collection, falling back to
+    the in-memory seed lookup when the database is unavailable.
+
+    Returns:
+        Summaries of the matching leasers with the contacts that matched
+    """
+    contacts = extract_contacts(text)
+    if not contacts["emails"] and not contacts["phones"]:
+        return []
+
+    try:
+        collection = await get_collection("suspect_leasers")
+        leasers = await collection.find({"$or": [
+            {"email": {"$in": contacts["emails"]}},
+            {"phone": {"$in": contacts["phones"]}},
+        ]}).to_list(length=MAX_CONTACTS)
+    except Exception as e:
+        logger.warning(f"Suspect leaser lookup failed, using seed data: {str(e)}")
+        leasers = [
+            leaser for leaser in suspect_leaser_lookup.all_leasers
+            if (leaser.get("email") or "").lower() in contacts["emails"] or leaser.get("phone") in contacts["phones"]
+        ]
+
+    matches = []
+    for leaser in leasers:
+        matched_on = [
+            value for value in ((leaser.get("email") or "").lower(), leaser.get("phone"))
+            if value and (value in contacts["emails"] or value in contacts["phones"])
+        ]
+        matches.append(_summary(leaser, matched_on))
+    return matches
@@ -1,8 +1,10 @@
 import os
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 from dotenv import load_dotenv
 import logging
 from app.utils.seed_data import SUSPECT_LEASERS, suspect_leaser_lookup
+from app.utils.indexes import bootstrap_indexes, INDEX_BOOTSTRAP
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +19,7 @@ logger = logging.getLogger(__name__)
 # Create a singleton database client
 class Database:
     client: AsyncIOMotorClient = None
+    index_task: asyncio.Task = None
 
     @classmethod
     async def connect_db(cls):
@@ -24,6 +27,11 @@ class Database:
         if cls.client is None:
             cls.client = AsyncIOMotorClient(MONGO_URI)
             logger.info("MongoDB connection established")
+
+            # Create missing indexes and log which ones each collection has,
+            # in the background: building one on a large collection takes minutes
+            if INDEX_BOOTSTRAP:
+                cls.index_task = asyncio.get_running_loop().create_task(bootstrap_indexes(cls.get_db()))
             
             # Initialize suspect leasers collection with seed data
             if os.getenv("ENVIRONMENT", "development") == "development":
@@ -32,6 +40,9 @@ class Database:
     @classmethod
     async def close_db(cls):
         """Close MongoDB connection."""
+        if cls.index_task is not None:
+            cls.index_task.cancel()
+            cls.index_task = None
         if cls.client is not None:
             cls.client.close()
             cls.client = None
@@ -0,0 +1,81 @@
+"""
+Request-scoped deadlines.
+
+Every request gets a deadline (X-Request-Timeout header, else REQUEST_TIMEOUT
+seconds) held in a context variable, so OCR threads, listing fetches and the
+Gemini call can all see how much time the request has left. Work that
+can't finish in time raises DeadlineExceeded instead of holding the worker.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Default and maximum time budget of a request, in seconds
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "90"))
+MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT", "300"))
+
+# Header a client can use to ask for a shorter (or longer, up to the max) budget
+DEADLINE_HEADER = "X-Request-Timeout"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time before a stage could finish."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded during {stage}")
+        self.stage = stage
+
+
+def timeout_from_header(value: Optional[str]) -> float:
+    """Request budget from the header value, clamped to (0, MAX_REQUEST_TIMEOUT]."""
+    try:
+        seconds = float(value) if value else REQUEST_TIMEOUT
+    except ValueError:
+        seconds = REQUEST_TIMEOUT
+    if seconds <= 0:
+        seconds = REQUEST_TIMEOUT
+    return min(seconds, MAX_REQUEST_TIMEOUT)
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """Run the enclosed code (and the tasks and threads it starts) under a deadline."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline (never negative), or None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def cap(timeout: Optional[float]) -> Optional[float]:
+    """A stage timeout shortened to the time the request has left."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if timeout is None:
+        return left
+    return min(timeout, left)
+
+
+def check(stage: str) -> None:
+    """
+    Raise if the deadline has passed.
+
+    Raises:
+        DeadlineExceeded: If the request is out of time
+    """
+    if remaining() == 0.0:
+        raise DeadlineExceeded(stage)
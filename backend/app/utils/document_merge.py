@@ -0,0 +1,171 @@
+"""
+Merge the text of several uploaded files into one deduplicated document.
+
+Tenants often photograph a lease page by page with generous overlap, and
+sometimes take the same shot twice. Concatenating the OCR output as-is sends
+whole paragraphs to Gemini more than once. The merge stage here:
+
+1. drops photos whose perceptual hash is (nearly) identical to one already
+   kept and whose text confirms it is the same page, and
+2. removes runs of lines that already appeared in an earlier file, using
+   hashed windows of consecutive lines plus a suffix/prefix check at the
+   seam between neighbouring files.
+"""
+
+import re
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger("rent-spiracy")
+
+# Side length of the dHash grid; 16 gives a 256-bit hash, which separates
+# different pages of the same (visually similar) lease much better than 8
+HASH_SIZE = 16
+
+# Maximum Hamming distance between the dHashes of two shots of the same page
+DUPLICATE_PHOTO_DISTANCE = 40
+
+# Share of text lines two photos must have in common to count as duplicates;
+# pages of one lease look alike to a perceptual hash, the text decides
+DUPLICATE_PHOTO_TEXT_OVERLAP = 0.6
+
+# Number of consecutive lines hashed together when looking for repeated runs
+WINDOW_LINES = 3
+
+# Lines shorter than this (after normalisation) don't take part in matching
+MIN_LINE_CHARS = 4
+
+# A seam overlap shorter than this many characters is not trusted
+MIN_SEAM_CHARS = 40
+
+DOCUMENT_SEPARATOR = "\n\n--- Next Document ---\n\n"
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash (dHash) of an image, hash_size * hash_size bits.
+
+    Robust to re-encoding, resizing and small exposure changes, so two shots
+    of the same page differ by only a few bits.
+    """
+    width = hash_size + 1
+    small = image.convert("L").resize((width, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * width + col]
+            right = pixels[row * width + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+def _line_key(line: str) -> str:
+    """Normalise a line so OCR spacing/punctuation differences still match."""
+    return re.sub(r"[^a-z0-9]+", "", line.lower())
+
+
+def _window_hash(keys: Sequence[str]) -> bytes:
+    return hashlib.blake2b("\n".join(keys).encode("utf-8"), digest_size=8).digest()
+
+
+def _content_lines(lines: List[str]) -> List[Tuple[int, str]]:
+    """(index, key) of the lines that are long enough to compare."""
+    result = []
+    for index, line in enumerate(lines):
+        key = _line_key(line)
+        if len(key) >= MIN_LINE_CHARS:
+            result.append((index, key))
+    return result
+
+
+def _seam_overlap(previous: List[str], current: List[Tuple[int, str]]) -> int:
+    """
+    Length of the longest run of lines at the end of the previous file that
+    is repeated at the start of the current one.
+    """
+    longest = 0
+    for size in range(1, min(len(previous), len(current)) + 1):
+        if previous[-size:] == [key for _, key in current[:size]]:
+            if sum(len(key) for key in previous[-size:]) >= MIN_SEAM_CHARS:
+                longest = size
+    return longest
+
+
+def _is_duplicate_photo(image_hash: int, keys: Set[str], kept: Tuple[int, Set[str]]) -> bool:
+    """Whether a photo is another shot of an already kept page."""
+    kept_hash, kept_keys = kept
+    if hamming_distance(image_hash, kept_hash) > DUPLICATE_PHOTO_DISTANCE:
+        return False
+    if not keys or not kept_keys:
+        return True
+    return len(keys & kept_keys) / min(len(keys), len(kept_keys)) >= DUPLICATE_PHOTO_TEXT_OVERLAP
+
+
+def merge_documents(documents: Sequence, separator: str = DOCUMENT_SEPARATOR) -> Tuple[str, Dict[str, int]]:
+    """
+    Merge extracted documents, dropping duplicate photos and repeated text.
+
+    Args:
+        documents: Objects with `text` and optional `image_hash` attributes
+                   (ExtractedDocument), in upload order
+        separator: Text placed between the files that remain
+
+    Returns:
+        The merged text and counters describing what was removed
+    """
+    stats = {"files": len(documents), "duplicate_photos": 0, "duplicate_lines": 0}
+    kept_photos: List[Tuple[int, Set[str]]] = []
+    seen_windows: Set[bytes] = set()
+    previous_keys: List[str] = []
+    parts: List[str] = []
+
+    for document in documents:
+        text = (document.text or "").strip()
+        if not text:
+            continue
+
+        lines = text.split("\n")
+        content = _content_lines(lines)
+
+        image_hash: Optional[int] = getattr(document, "image_hash", None)
+        if image_hash is not None:
+            keys = {key for _, key in content}
+            if any(_is_duplicate_photo(image_hash, keys, kept) for kept in kept_photos):
+                stats["duplicate_photos"] += 1
+                logger.info(f"Skipping near-duplicate photo {getattr(document, 'filename', '')}")
+                continue
+            kept_photos.append((image_hash, keys))
+
+        drop: Set[int] = set()
+
+        # Overlap at the seam with the previous file (may be 1-2 lines only)
+        seam = _seam_overlap(previous_keys, content)
+        drop.update(index for index, _ in content[:seam])
+
+        # Any run of WINDOW_LINES lines that already appeared earlier
+        for start in range(len(content) - WINDOW_LINES + 1):
+            window = content[start:start + WINDOW_LINES]
+            if _window_hash([key for _, key in window]) in seen_windows:
+                drop.update(index for index, _ in window)
+
+        # Register this file's windows before its duplicates are removed, so
+        # a run repeated in the next photo is still recognised
+        for start in range(len(content) - WINDOW_LINES + 1):
+            seen_windows.add(_window_hash([key for _, key in content[start:start + WINDOW_LINES]]))
+
+        stats["duplicate_lines"] += len(drop)
+        previous_keys = [key for _, key in content]
+        remaining = "\n".join(line for index, line in enumerate(lines) if index not in drop).strip()
+        if remaining:
+            parts.append(remaining)
+
+    return separator.join(parts), stats
@@ -0,0 +1,269 @@
+"""
+Document text extractors.
+
+Uploaded files are routed by sniffing their leading magic bytes rather than
+trusting the client's filename or content type. Each document kind has a
+detector and an extractor registered on the module-level `registry`; new
+formats can be added with `registry.register(...)`.
+"""
+
+import io
+import zipfile
+import logging
+from typing import Callable, List, Optional, Tuple, Union
+from xml.etree import ElementTree
+
+import pillow_heif
+from PIL import Image
+
+from app.utils.pdf_parser import extract_text_from_pdf
+from app.utils.document_merge import perceptual_hash
+from app.utils.ocr import recognize_image
+
+logger = logging.getLogger("rent-spiracy")
+
+# Register HEIF/HEIC file format with Pillow
+pillow_heif.register_heif_opener()
+
+# Number of leading bytes inspected by the detectors
+SNIFF_LENGTH = 8192
+
+# ISO-BMFF brands used by HEIC/HEIF images
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class ExtractedDocument:
+    """Text extracted from one uploaded file."""
+
+    def __init__(
+        self,
+        text: str,
+        kind: Optional[str] = None,
+        filename: Optional[str] = None,
+        image_hash: Optional[int] = None,
+        quality_score: Optional[float] = None
+    ):
+        self.text = text
+        self.kind = kind
+        self.filename = filename
+        # Perceptual hash of the source photo, used to drop duplicate shots
+        self.image_hash = image_hash
+        # OCR confidence in [0, 1], None for formats with a text layer
+        self.quality_score = quality_score
+
+
+Detector = Callable[[bytes, bytes], bool]
+Extractor = Callable[[bytes], Union[str, ExtractedDocument]]
+
+
+class ExtractorRegistry:
+    """Maps sniffed document kinds to text extractors."""
+
+    def __init__(self):
+        self._entries: List[Tuple[str, Detector, Extractor]] = []
+
+    def register(self, kind: str, detector: Detector):
+        """
+        Decorator registering an extractor for a document kind.
+
+        Detectors receive the first SNIFF_LENGTH bytes and the full content and
+        are tried in registration order, so more specific formats (e.g. DOCX,
+        which is a ZIP file) must be registered before generic ones (text).
+        Extractors return the text, or an ExtractedDocument when they have
+        extra metadata to attach.
+        """
+        def decorator(extractor: Extractor) -> Extractor:
+            self._entries.append((kind, detector, extractor))
+            return extractor
+        return decorator
+
+    @property
+    def kinds(self) -> List[str]:
+        """Registered document kinds in detection order."""
+        return [kind for kind, _, _ in self._entries]
+
+    def detect(self, content: bytes) -> Optional[str]:
+        """Return the kind of document the content is, or None if unknown."""
+        head = content[:SNIFF_LENGTH]
+        for kind, detector, _ in self._entries:
+            try:
+                if detector(head, content):
+                    return kind
+            except Exception as e:
+                logger.warning(f"Detector for {kind} failed: {str(e)}")
+        return None
+
+    def extract(
+        self,
+        content: bytes,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None
+    ) -> ExtractedDocument:
+        """
+        Detect the document kind from its content and extract its text.
+
+        Args:
+            content: Raw file bytes
+            filename: Client-supplied filename, only used for logging
+            content_type: Client-supplied content type, only used for logging
+
+        Returns:
+            ExtractedDocument with the text and detected kind
+
+        Raises:
+            ValueError: If the format is unsupported or extraction fails
+        """
+        kind = self.detect(content)
+        logger.info(f"Processing file: {filename}, type: {content_type}, detected: {kind}")
+        if kind is None:
+            raise ValueError("Unsupported file format. Please upload a PDF, image, Word (.docx), or text document.")
+
+        extractor = next(entry[2] for entry in self._entries if entry[0] == kind)
+        extracted = extractor(content)
+        if not isinstance(extracted, ExtractedDocument):
+            extracted = ExtractedDocument(text=extracted)
+        extracted.kind = kind
+        extracted.filename = filename
+        return extracted
+
+
+registry = ExtractorRegistry()
+
+
+def _is_pdf(head: bytes, content: bytes) -> bool:
+    # The spec allows junk before the header, readers look in the first 1KB
+    return b"%PDF-" in head[:1024]
+
+
+def _is_heif(head: bytes, content: bytes) -> bool:
+    return head[4:8] == b"ftyp" and head[8:12] in HEIF_BRANDS
+
+
+def _is_image(head: bytes, content: bytes) -> bool:
+    return (
+        head.startswith(b"\x89PNG\r\n\x1a\n")
+        or head.startswith(b"\xff\xd8\xff")
+        or head.startswith((b"GIF87a", b"GIF89a"))
+        or head.startswith((b"II*\x00", b"MM\x00*"))
+        or (head.startswith(b"BM") and head[6:10] == b"\x00\x00\x00\x00")
+        or (head.startswith(b"RIFF") and head[8:12] == b"WEBP")
+    )
+
+
+def _is_docx(head: bytes, content: bytes) -> bool:
+    if not head.startswith(b"PK\x03\x04"):
+        return False
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        return "word/document.xml" in archive.namelist()
+
+
+def _is_text(head: bytes, content: bytes) -> bool:
+    if head.startswith((b"\xef\xbb\xbf", b"\xff\xfe", b"\xfe\xff")):
+        return True
+    # Binary formats almost always contain NUL bytes early on
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+        return True
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sniffed window is fine
+        if e.start >= len(head) - 3:
+            return True
+    # Accept legacy 8-bit encodings as long as the content is mostly printable
+    printable = sum(1 for byte in head if byte >= 0x20 or byte in (0x09, 0x0a, 0x0d))
+    return printable / max(len(head), 1) > 0.95
+
+
+def ocr_document(image: Image.Image) -> ExtractedDocument:
+    """OCR a photo into an ExtractedDocument with its quality and perceptual hash."""
+    result = recognize_image(image)
+    return ExtractedDocument(
+        text=result.text,
+        image_hash=perceptual_hash(image),
+        quality_score=result.quality
+    )
+
+
+@registry.register("pdf", _is_pdf)
+def extract_pdf(content: bytes) -> str:
+    """Extract text from a PDF with the configured backend."""
+    # Form feeds between pages let the normalizer spot running headers/footers
+    return extract_text_from_pdf(content, page_separator="\n\f\n")
+
+
+@registry.register("heic", _is_heif)
+def extract_heic(content: bytes) -> ExtractedDocument:
+    """OCR a HEIC/HEIF photo (the default format of iPhone cameras)."""
+    try:
+        image = Image.open(io.BytesIO(content))
+        # HEIF images decode to RGB/RGBA, normalise so Tesseract gets 3 channels
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+    except Exception as e:
+        logger.error(f"Error decoding HEIC image: {str(e)}")
+        raise ValueError(f"Error converting HEIC image: {str(e)}")
+    return ocr_document(image)
+
+
+@registry.register("image", _is_image)
+def extract_image(content: bytes) -> ExtractedDocument:
+    """OCR a raster image."""
+    try:
+        image = Image.open(io.BytesIO(content))
+    except Exception as e:
+        raise ValueError(f"Error processing image: {str(e)}")
+    return ocr_document(image)
+
+
+@registry.register("docx", _is_docx)
+def extract_docx(content: bytes) -> str:
+    """Extract paragraph text from a Word .docx document."""
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            root = ElementTree.fromstring(archive.read("word/document.xml"))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        logger.error(f"Error reading DOCX: {str(e)}")
+        raise ValueError("Could not read the Word document. The file might be corrupted or in an unsupported format.")
+
+    paragraphs = []
+    for paragraph in root.iter(f"{WORD_NAMESPACE}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{WORD_NAMESPACE}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{WORD_NAMESPACE}tab":
+                parts.append("\t")
+            elif node.tag in (f"{WORD_NAMESPACE}br", f"{WORD_NAMESPACE}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+@registry.register("text", _is_text)
+def extract_plain_text(content: bytes) -> str:
+    """Decode a plain text document."""
+    if content.startswith(b"\xef\xbb\xbf"):
+        return content[3:].decode("utf-8", errors="replace")
+    if content.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return content.decode("utf-16", errors="replace")
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return content.decode("cp1252", errors="replace")
+
+
+def extract_document(
+    content: bytes,
+    filename: Optional[str] = None,
+    content_type: Optional[str] = None
+) -> ExtractedDocument:
+    """
+    Convenience function to extract text from an uploaded file.
+
+    Raises:
+        ValueError: If the format is unsupported or extraction fails
+    """
+    return registry.extract(content, filename=filename, content_type=content_type)
@@ -8,8 +8,13 @@ from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 import json
 import re
+import asyncio
 import logging
+from app.utils.quota import QuotaGovernor
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
 from app.models.rental import ScamLikelihood, TrustworthinessGrade, RiskLevel
+from app.utils.trust_scoring import score_analysis
 
 # Configure logging
 logger = logging.getLogger("rent-spiracy.gemini")
@@ -24,6 +29,22 @@ if not GEMINI_API_KEY:
 
 genai.configure(api_key=GEMINI_API_KEY)
 
+# Documents longer than this are truncated in the prompt
+MAX_DOCUMENT_CHARS = 15000
+
+# OCR'd documents below this quality score get a reliability note in the prompt
+OCR_QUALITY_WARNING = 0.85
+
+# Gemini calls in flight at once and per minute (0 = no per-minute limit), shared by
+# all requests so a batch can't exhaust the API quota
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+
+gemini_quota = QuotaGovernor(GEMINI_MAX_CONCURRENCY, GEMINI_REQUESTS_PER_MINUTE)
+
+# Seconds one Gemini call may take (shortened to what the request has left)
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+
 
 class GeminiService:
     """Service for interacting with Google's Gemini API."""
@@ -41,7 +62,12 @@ class GeminiService:
         document_content: str,
         listing_url: Optional[str] = None,
         property_address: Optional[str] = None,
-        language: Optional[str] = "english"
+        language: Optional[str] = "english",
+        document_quality: Optional[float] = None,
+        listing_content: Optional[str] = None,
+        clause_references: bool = False,
+        revision_note: Optional[str] = None,
+        suspect_leasers: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Analyze a rental listing or document using Gemini.
@@ -50,16 +76,29 @@ class GeminiService:
             document_content: The text content of the lease document
             listing_url: Optional URL of the listing
             property_address: Optional property address
+            document_quality: OCR confidence of the document in [0, 1], if it was OCR'd
+            listing_content: Main text of the rental listing page, if one was fetched
+            clause_references: Whether some clauses are one-line references to earlier verdicts
+            revision_note: Summary of what changed since a previous analysis of this lease
+            suspect_leasers: Reported suspect leasers whose contact details appear in the lease or listing
             
         Returns:
             Dictionary with analysis results
+
+        Raises:
+            DeadlineExceeded: If the request deadline passes before Gemini answers
         """
         # Generate prompt for Gemini
         prompt = cls._generate_rental_analysis_prompt(
             document_content=document_content,
             listing_url=listing_url,
             property_address=property_address,
-            language=language
+            language=language,
+            document_quality=document_quality,
+            listing_content=listing_content,
+            clause_references=clause_references,
+            revision_note=revision_note,
+            suspect_leasers=suspect_leasers
         )
         
         # Debug logging to see what language was used in the prompt
@@ -80,12 +119,15 @@ class GeminiService:
             logger.info(f"Document length: {len(document_content)} characters")
             logger.info(f"First 200 chars of document: {document_content[:200]}...")
             
-            # Call Gemini API with structured output
-            response = model.generate_content(
-                prompt,
-                generation_config=cls._get_generation_config(),
-                safety_settings=cls._get_safety_settings()
-            )
+            # Call Gemini API with structured output, within the shared quota and
+            # the time the request has left (waiting for a quota slot included)
+            async with asyncio.timeout(deadline.cap(GEMINI_TIMEOUT)):
+                async with gemini_quota:
+                    response = await model.generate_content_async(
+                        prompt,
+                        generation_config=cls._get_generation_config(),
+                        safety_settings=cls._get_safety_settings()
+                    )
             
             raw_response = ""
             if hasattr(response, 'candidates') and response.candidates:
@@ -104,6 +146,19 @@ class GeminiService:
             # Process the response
             return cls._process_gemini_response(raw_response)
             
+        except TimeoutError:
+            if deadline.remaining() == 0.0:
+                raise DeadlineExceeded("Gemini analysis")
+            logger.error(f"Gemini API call timed out after {GEMINI_TIMEOUT}s")
+            return {
+                "error": "timeout",
+                "raw_response": "Error: Gemini API call timed out",
+                "scam_likelihood": "Medium",
+                "explanation": "The analysis service took too long to respond. Please try again.",
+                "concerning_clauses": [],
+                "questions": [],
+                "action_items": []
+            }
         except Exception as e:
             logger.error(f"Error calling Gemini API: {str(e)}")
             return {
@@ -111,8 +166,9 @@ class GeminiService:
                 "raw_response": f"Error: {str(e)}",
                 "scam_likelihood": "Medium",  # Default fallback
                 "explanation": f"Error analyzing document: {str(e)}",
-                "clauses": [],
-                "questions": []
+                "concerning_clauses": [],
+                "questions": [],
+                "action_items": []
             }
     
     @classmethod
@@ -608,7 +664,12 @@ class GeminiService:
         document_content: str,
         listing_url: Optional[str] = None,
         property_address: Optional[str] = None,
-        language: Optional[str] = "english"
+        language: Optional[str] = "english",
+        document_quality: Optional[float] = None,
+        listing_content: Optional[str] = None,
+        clause_references: bool = False,
+        revision_note: Optional[str] = None,
+        suspect_leasers: Optional[List[Dict[str, Any]]] = None
     ) -> str:
         """Generate the prompt for Gemini API."""
         # Force language to be a string value, not an Enum object
@@ -670,15 +731,48 @@ class GeminiService:
             prompt_parts.append(f"\n\nListing URL: {listing_url}")
         if property_address:
             prompt_parts.append(f"\nProperty Address: {property_address}")
+        if listing_content:
+            prompt_parts.append(
+                "\n\nListing Page Content (check it against the lease for mismatched rent, address "
+                f"or landlord details and for scam markers):\n{listing_content}"
+            )
+        if suspect_leasers:
+            reports = "\n".join(
+                f"- {leaser.get('name')} ({', '.join(leaser.get('matched_on', []))}): reported {leaser.get('reported_count', 0)} times "
+                f"for {', '.join(leaser.get('flags', [])) or 'unspecified issues'}"
+                for leaser in suspect_leasers
+            )
+            prompt_parts.append(
+                "\n\nContact details in this lease or listing match landlords reported to us by other tenants. "
+                f"Take these reports into account in the scam likelihood and mention them in the assessment:\n{reports}"
+            )
         
         # Add the document content
         if document_content:
             # Limit document size if it's very large
             doc_to_analyze = document_content
-            if len(document_content) > 15000:
-                doc_to_analyze = document_content[:15000] + "\n...[document truncated due to length]..."
+            if len(document_content) > MAX_DOCUMENT_CHARS:
+                doc_to_analyze = document_content[:MAX_DOCUMENT_CHARS] + "\n...[document truncated due to length]..."
                 
             prompt_parts.append(f"\n\nLease Document:\n{doc_to_analyze}")
+
+            # Clauses analyzed before are one-line references carrying the earlier verdict
+            if clause_references:
+                prompt_parts.append(
+                    "\n\nNote: Clauses marked [already reviewed ...] were analyzed before and are shown only as "
+                    "one-line references with the earlier verdict. List concerning clauses only from the clauses "
+                    "shown in full, but base the scam likelihood and overall assessment on the lease as a whole."
+                )
+            if revision_note:
+                prompt_parts.append(f"\nThis is a revised version of a lease that was analyzed before.\n{revision_note}")
+
+            # Warn the model about OCR errors so misread words aren't reported as red flags
+            if document_quality is not None and document_quality < OCR_QUALITY_WARNING:
+                prompt_parts.append(
+                    f"\n\nNote: This lease was read from photos by OCR with an estimated text accuracy of {round(document_quality * 100)}%. "
+                    f"Some words, amounts or dates may be misread. Do not treat garbled or nonsensical text as a concerning clause on its own; "
+                    f"where an important term (rent, deposit, fees, dates) is unclear, say so and advise the tenant to verify it against the original document."
+                )
         else:
             prompt_parts.append("\n\nNote: No lease document was provided.")
         
@@ -871,48 +965,4 @@ ABSOLUTELY CRITICAL: Your analysis MUST be based on the laws of the specific sta
     @staticmethod
     def _calculate_trustworthiness(scam_likelihood: str, concerning_clauses_count: int) -> tuple:
         """Calculate trustworthiness score, grade, and risk level based on analysis."""
-        # Base score based on scam likelihood - MORE GENEROUS STARTING POINTS
-        base_score = {
-            "Low": 90,    # Increased from 85
-            "Medium": 70, # Increased from 60
-            "High": 40    # Increased from 30
-        }.get(scam_likelihood, 60)  # Default is more generous too (was 50)
-        
-        # Adjust score based on concerning clauses - LESS SEVERE PENALTIES
-        if concerning_clauses_count == 0:
-            adjustment = 10  # Bonus for no concerning clauses
-        elif concerning_clauses_count == 1:
-            adjustment = 0   # Single concern is normal, no penalty
-        elif concerning_clauses_count <= 3:
-            adjustment = -5  # Minor concerns
-        elif concerning_clauses_count <= 6:
-            adjustment = -10 # Moderate concerns (was -15)
-        else:
-            adjustment = -20 # Serious concerns (was -25)
-            
-        # Calculate final score (keeping within 0-100 range)
-        score = max(0, min(100, base_score + adjustment))
-        
-        # Determine grade based on score - MORE RELAXED GRADING
-        if score >= 85:      # Was 90
-            grade = TrustworthinessGrade.A
-        elif score >= 75:    # Was 80
-            grade = TrustworthinessGrade.B
-        elif score >= 55:    # Was 60
-            grade = TrustworthinessGrade.C
-        elif score >= 35:    # Was 40
-            grade = TrustworthinessGrade.D
-        else:
-            grade = TrustworthinessGrade.F
-            
-        # Determine risk level - MORE RELAXED RISK ASSESSMENT
-        if score >= 75:      # Was 80
-            risk_level = RiskLevel.LOW_RISK
-        elif score >= 55:    # Was 60
-            risk_level = RiskLevel.MEDIUM_RISK
-        elif score >= 25:    # Was 30
-            risk_level = RiskLevel.HIGH_RISK
-        else:
-            risk_level = RiskLevel.VERY_HIGH_RISK
-            
-        return score, grade, risk_level 
\ No newline at end of file
+        return score_analysis(scam_likelihood, concerning_clauses_count)
\ No newline at end of file
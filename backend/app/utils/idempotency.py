@@ -0,0 +1,180 @@
+"""
+Idempotency-Key support for endpoints that run an analysis.
+
+Clients (mostly mobile) retry uploads after network hiccups. A request that
+carries an Idempotency-Key header runs once; a repeat with the same key
+waits for the in-flight request or replays its stored response, instead of
+running OCR and Gemini again. Responses are kept for IDEMPOTENCY_TTL
+seconds. Failed requests aren't stored, so a retry after an error runs
+again. A key reused for a different request is rejected; for a streamed
+upload the request content is only known once its body has been read, so
+the retry's body is read and compared before anything is replayed.
+
+Keys live in the memory of one process: behind several workers or
+instances, a retry reaching another one runs the request again. In-flight
+requests are held outside the LRU, so they can't be evicted while running.
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException, Response
+
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger("rent-spiracy")
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "2000"))
+
+MAX_KEY_LENGTH = 255
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class _StoredResponse:
+    def __init__(self, response: Response):
+        self.status_code = response.status_code
+        self.body = response.body
+        self.media_type = response.media_type
+        self.headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in ("content-length", "content-type")
+        }
+
+    def replay(self) -> Response:
+        response = Response(content=self.body, status_code=self.status_code, media_type=self.media_type, headers=self.headers)
+        response.headers[REPLAYED_HEADER] = "true"
+        return response
+
+
+class _Entry:
+    def __init__(self, fingerprint: Optional[str], streamed: bool = False):
+        loop = asyncio.get_running_loop()
+        # Set later for a streamed request, once its body has been read
+        self.fingerprint: "asyncio.Future[Optional[str]]" = loop.create_future()
+        if not streamed:
+            self.fingerprint.set_result(fingerprint)
+        self.result: "asyncio.Future[_StoredResponse]" = loop.create_future()
+
+    def set_fingerprint(self, fingerprint: Optional[str]) -> None:
+        if not self.fingerprint.done():
+            self.fingerprint.set_result(fingerprint)
+
+
+def request_fingerprint(*parts) -> str:
+    """Hash of the request content, to catch a key reused for a different request."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """In-flight and completed responses by endpoint and Idempotency-Key."""
+
+    def __init__(self, max_size: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_TTL):
+        # Completed requests; running ones are in _in_flight until they finish
+        self._entries: TTLCache = TTLCache(max_size, ttl)
+        self._in_flight: Dict[str, _Entry] = {}
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: Optional[str],
+        compute: Callable[..., Awaitable[Response]],
+        read_fingerprint: Optional[Callable[[], Awaitable[str]]] = None
+    ) -> Response:
+        """
+        Run compute once per key and return its response to every request with that key.
+
+        Args:
+            scope: Endpoint name; keys are only unique per endpoint
+            key: Idempotency-Key header value
+            fingerprint: Request content hash, or None when it isn't known up front
+            compute: Produces the response for the first request. With
+                read_fingerprint it is called with a setter it must pass the
+                request fingerprint to as soon as the body has been read
+            read_fingerprint: For a streamed request, reads the body of a
+                repeated request and returns its fingerprint
+
+        Raises:
+            HTTPException: 400 for an invalid key, 422 when the key was used for a
+                different request; errors from compute are raised to every waiter
+        """
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+
+        cache_key = f"{scope}:{key}"
+        entry: Optional[_Entry] = self._in_flight.get(cache_key) or self._entries.get(cache_key)
+        if entry is not None:
+            if fingerprint is None and read_fingerprint is not None:
+                fingerprint = await read_fingerprint()
+            if fingerprint:
+                # Shielded like the result below; a streamed original sets it once its body is read
+                original = await asyncio.shield(entry.fingerprint)
+                if original and fingerprint != original:
+                    raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            logger.info(f"Idempotency-Key {key} seen before on {scope}, {'replaying' if entry.result.done() else 'waiting for'} the original request")
+            try:
+                # Shielded so a disconnecting retry doesn't cancel the original request
+                stored = await asyncio.shield(entry.result)
+            except asyncio.CancelledError:
+                if not entry.result.cancelled():
+                    raise
+                # The original request was cancelled, run it in its place (its
+                # body was read for the fingerprint, so compute can't run on it)
+                if read_fingerprint is not None:
+                    raise HTTPException(status_code=409, detail="The original request with this Idempotency-Key was cancelled, please retry")
+                return await self.run(scope, key, fingerprint, compute)
+            return stored.replay()
+
+        entry = _Entry(fingerprint, streamed=read_fingerprint is not None)
+        self._in_flight[cache_key] = entry
+        try:
+            response = await (compute(entry.set_fingerprint) if read_fingerprint is not None else compute())
+        except asyncio.CancelledError:
+            self._in_flight.pop(cache_key, None)
+            entry.set_fingerprint(None)
+            entry.result.cancel()
+            raise
+        except Exception as e:
+            # Not stored: the next retry runs the request again
+            self._in_flight.pop(cache_key, None)
+            entry.set_fingerprint(None)
+            entry.result.set_exception(e)
+            # Waiters re-raise it; don't warn about it going unretrieved
+            entry.result.exception()
+            raise
+
+        self._in_flight.pop(cache_key, None)
+        entry.set_fingerprint(None)
+        if response.status_code < 500:
+            self._entries.set(cache_key, entry)
+        entry.result.set_result(_StoredResponse(response))
+        return response
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def idempotent(
+    scope: str,
+    key: Optional[str],
+    fingerprint: Optional[str],
+    compute: Callable[..., Awaitable[Response]],
+    read_fingerprint: Optional[Callable[[], Awaitable[str]]] = None
+) -> Response:
+    """
+    Convenience function: run compute under the Idempotency-Key, if one was sent.
+
+    See IdempotencyStore.run for streamed requests (read_fingerprint).
+    """
+    if key is None:
+        return await (compute(lambda fingerprint: None) if read_fingerprint is not None else compute())
+    return await idempotency_store.run(scope, key, fingerprint, compute, read_fingerprint)
@@ -0,0 +1,146 @@
+"""
+Indexes of the collections the app queries.
+
+Every lookup, filter and sort the routers and services run on a collection
+has its index declared here. ensure_indexes creates the missing ones in
+the background at startup (an index that already exists is left alone, so
+it is safe to run on every start) and logs a report of what each
+collection has. Requests are served meanwhile, without the new indexes
+until they are built.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger("rent-spiracy")
+
+# Create the declared indexes when connecting to the database (true/false)
+INDEX_BOOTSTRAP = os.getenv("INDEX_BOOTSTRAP", "true").lower() != "false"
+
+REQUIRED_INDEXES: Dict[str, List[IndexModel]] = {
+    # get_analysis_by_id, retention by age, blob references for the blob sweep
+    "analyses": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", ASCENDING)]),
+        IndexModel([("raw_response_blob", ASCENDING)], sparse=True),
+    ],
+    # Lease text of analyses, deleted once expires_at has passed
+    "analysis_documents": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("text_blob", ASCENDING)], sparse=True),
+    ],
+    # Blobs past the sweep grace period
+    "blobs": [
+        IndexModel([("referenced_at", ASCENDING)]),
+    ],
+    # Leaser endpoints by id, contact matching by email/phone
+    "suspect_leasers": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)]),
+        IndexModel([("phone", ASCENDING)]),
+    ],
+    # Lawyer filters; specialization is a regex, scanned on the index keys
+    "lawyers": [
+        IndexModel([("languages", ASCENDING), ("region", ASCENDING)]),
+        IndexModel([("region", ASCENDING)]),
+        IndexModel([("specialization", ASCENDING)]),
+    ],
+    # Document listing (newest first, keyset on created_at and _id, by type
+    # or scam score), lookup and search of titles and content
+    "fake_documents": [
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("type", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("scam_score", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("title", TEXT), ("content", TEXT)], weights={"title": 5, "content": 1}, name="title_content_text"),
+    ],
+    # Newest clause verdicts loaded into the similarity index
+    "clause_analyses": [
+        IndexModel([("updated_at", DESCENDING)]),
+    ],
+    # Largest lease clusters for the statistics, most recently seen ones loaded at startup
+    "lease_clusters": [
+        IndexModel([("size", DESCENDING)]),
+        IndexModel([("last_seen", DESCENDING)]),
+    ],
+}
+
+# Indexes created by earlier versions, dropped before the declared ones are
+# created (a collection can have only one text index)
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    # Wildcard text index over every string field of a document
+    "fake_documents": ["text_search"],
+}
+
+
+async def _ensure_collection_indexes(db, collection_name: str, indexes: List[IndexModel]) -> Dict[str, str]:
+    collection = db[collection_name]
+    existing = await collection.index_information()
+    report = {}
+    for name in RETIRED_INDEXES.get(collection_name, []):
+        if name in existing:
+            await collection.drop_index(name)
+            report[name] = "dropped"
+    for index in indexes:
+        name = index.document["name"]
+        if name in existing:
+            report[name] = "exists"
+            continue
+        try:
+            await collection.create_indexes([index])
+            report[name] = "created"
+        except OperationFailure as e:
+            # E.g. an index on the same keys with other options, or a second text index
+            report[name] = f"failed: {e.details.get('errmsg', str(e)) if e.details else str(e)}"
+
+    # Verify against what the server has now
+    present = await collection.index_information()
+    for name, status in report.items():
+        if name not in present and status != "dropped" and not status.startswith("failed"):
+            report[name] = "missing"
+    return report
+
+
+async def ensure_indexes(db) -> Dict[str, Dict[str, str]]:
+    """
+    Create the declared indexes that don't exist yet and log a report.
+
+    Args:
+        db: Motor database
+
+    Returns:
+        collection -> index name -> "exists", "created", "dropped", "missing" or "failed: reason"
+    """
+    names = list(REQUIRED_INDEXES)
+    results = await asyncio.gather(
+        *(_ensure_collection_indexes(db, name, REQUIRED_INDEXES[name]) for name in names),
+        return_exceptions=True
+    )
+    report = {}
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            report[name] = {index.document["name"]: f"failed: {str(result)}" for index in REQUIRED_INDEXES[name]}
+        else:
+            report[name] = result
+
+    for name, indexes in report.items():
+        problems = {index: status for index, status in indexes.items() if status not in ("exists", "created", "dropped")}
+        summary = ", ".join(f"{index} {status}" for index, status in indexes.items())
+        if problems:
+            logger.warning(f"Indexes on {name}: {summary}")
+        else:
+            logger.info(f"Indexes on {name}: {summary}")
+    return report
+
+
+async def bootstrap_indexes(db) -> None:
+    """ensure_indexes for a background task: errors are logged, not raised."""
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}")
@@ -0,0 +1,395 @@
+"""
+Clusters of near-identical uploaded leases.
+
+Scammers send the same fake lease to many victims with small edits (names,
+amounts, dates). Every analyzed upload gets a MinHash signature of its word
+5-gram shingles and is filed, through an LSH index, into the cluster of the
+lease it nearly duplicates. A new upload matching a cluster that has been
+judged high-risk by enough independent analyses is answered with that
+cluster's verdict; cluster sizes and recent activity show which templates
+are spreading. Clusters are kept in the `lease_clusters` collection and
+the LEASE_CLUSTER_INDEX_SIZE most recently seen ones in memory.
+
+A verdict holds no text written for the lease it came from, since
+explanations and reasons name landlords, addresses and payment handles:
+only the likelihood, the risk level and, for each concerning clause, its
+legal reference and a hashed fingerprint of the clause that is matched
+against the new upload's own clauses to quote them.
+"""
+
+import os
+import uuid
+import zlib
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.rental import AnalysisResult, ScamLikelihood
+from app.utils.clause_index import clause_tokens
+from app.utils.clause_segmenter import Clause, segment_clauses
+from app.utils.db import get_collection
+from app.utils.write_behind import write_in_background
+
+logger = logging.getLogger("rent-spiracy")
+
+# Answer uploads of known high-risk lease templates with the cluster's verdict (true/false)
+LEASE_CLUSTERS_ENABLED = os.getenv("LEASE_CLUSTERS_ENABLED", "true").lower() != "false"
+
+# Estimated Jaccard similarity of shingles for a lease to join a cluster
+LEASE_CLUSTER_SIMILARITY = float(os.getenv("LEASE_CLUSTER_SIMILARITY", "0.8"))
+
+# Independent analyses (not answered from the cluster) that must have found a
+# template high-risk, and their least share of its analyses, before the
+# verdict is reused; a standard form one scammer also used stays below it
+LEASE_CLUSTER_MIN_HIGH_RISK = int(os.getenv("LEASE_CLUSTER_MIN_HIGH_RISK", "3"))
+LEASE_CLUSTER_MIN_HIGH_RISK_RATIO = float(os.getenv("LEASE_CLUSTER_MIN_HIGH_RISK_RATIO", "0.6"))
+
+# Clusters held in memory; beyond this the one seen longest ago is dropped
+# (it stays in the collection)
+LEASE_CLUSTER_INDEX_SIZE = int(os.getenv("LEASE_CLUSTER_INDEX_SIZE", "20000"))
+
+LEASE_CLUSTERS_COLLECTION = "lease_clusters"
+
+SHINGLE_SIZE = 5
+
+# Leases with fewer shingles are too short to cluster meaningfully
+MIN_SHINGLES = 50
+
+# 16 bands of 8 rows: leases above ~0.7 similarity almost always share a band
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+# Days of activity reported by the cluster statistics
+ACTIVITY_DAYS = 7
+
+# Word n-grams of a clause fingerprint, and the least Jaccard similarity for
+# a clause of a new upload to be quoted for a stored concerning clause
+CLAUSE_SHINGLE_SIZE = 3
+CLAUSE_MATCH_SIMILARITY = 0.3
+
+# Multiply-shift hash functions h(x) = (a * x + b) >> 32 with odd a, seeded
+# so signatures stay comparable across workers and restarts
+_random = np.random.default_rng(20240301)
+_A = _random.integers(1, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_B = _random.integers(0, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def lease_signature(document_content: str) -> Optional[np.ndarray]:
+    """
+    MinHash signature of a lease's word shingles.
+
+    Figures count as one token (see clause_tokens), so leases differing
+    only by amounts and dates get the same shingles.
+
+    Returns:
+        uint32 array of NUM_PERMUTATIONS values, or None for a lease too short to cluster
+    """
+    tokens = clause_tokens(document_content)
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    # crc32 rather than hash(), which is salted per process
+    hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    with np.errstate(over="ignore"):
+        values = (_A[:, None] * hashes[None, :] + _B[:, None]) >> np.uint64(32)
+    return values.min(axis=1).astype(np.uint32)
+
+
+def _clause_fingerprint(text: str) -> List[int]:
+    """Hashed word n-grams of a clause; the text can't be read back from them."""
+    tokens = clause_tokens(text)
+    size = min(CLAUSE_SHINGLE_SIZE, len(tokens))
+    return sorted({zlib.crc32(" ".join(tokens[i:i + size]).encode("utf-8")) for i in range(len(tokens) - size + 1)})
+
+
+def verdict_summary(result: AnalysisResult) -> Dict[str, Any]:
+    """What a cluster keeps of an analysis: structured fields only, no free text."""
+    return {
+        "scam_likelihood": getattr(result.scam_likelihood, "value", result.scam_likelihood),
+        "risk_level": result.risk_level,
+        "clauses": [
+            {
+                "legal_reference": clause.legal_reference,
+                "fingerprint": _clause_fingerprint(clause.text),
+            }
+            for clause in result.simplified_clauses if clause.is_concerning
+        ],
+    }
+
+
+def quote_clauses(verdict: Dict[str, Any], document_content: str) -> List[Clause]:
+    """
+    Clauses of the lease being analyzed that a verdict found concerning.
+
+    Each stored clause is matched to the clause of the lease whose
+    fingerprint is most similar; stored clauses without a similar enough
+    clause are left out.
+
+    Returns:
+        (clause of this lease, legal reference) for each match
+    """
+    clauses = [(clause, set(_clause_fingerprint(clause.text))) for clause in segment_clauses(document_content)]
+    quoted = []
+    for concern in verdict.get("clauses") or []:
+        fingerprint = set(concern.get("fingerprint") or [])
+        best, best_similarity = None, CLAUSE_MATCH_SIMILARITY
+        for clause, shingles in clauses:
+            if not fingerprint or not shingles:
+                continue
+            similarity = len(fingerprint & shingles) / len(fingerprint | shingles)
+            if similarity >= best_similarity:
+                best, best_similarity = clause, similarity
+        if best is not None:
+            quoted.append((best, concern.get("legal_reference")))
+    return quoted
+
+
+class LeaseCluster:
+    """Leases sharing one template, with the verdict reused for new copies."""
+
+    def __init__(
+        self,
+        id: str,
+        signature: np.ndarray,
+        size: int = 0,
+        high_risk_count: int = 0,
+        analyzed_count: int = 0,
+        first_seen: Optional[str] = None,
+        last_seen: Optional[str] = None,
+        daily_counts: Optional[Dict[str, int]] = None,
+        verdicts: Optional[Dict[str, Dict[str, Any]]] = None,
+        verdict_analysis_id: Optional[str] = None
+    ):
+        self.id = id
+        self.signature = signature
+        self.size = size
+        # Of the analyses made by Gemini, not answered from the cluster
+        self.high_risk_count = high_risk_count
+        self.analyzed_count = analyzed_count
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        # "YYYY-MM-DD" -> leases seen that day
+        self.daily_counts = daily_counts or {}
+        # language -> verdict_summary() of the verdict in that language
+        self.verdicts = verdicts or {}
+        self.verdict_analysis_id = verdict_analysis_id
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "LeaseCluster":
+        return cls(
+            id=document["_id"],
+            signature=np.array(document.get("signature") or [], dtype=np.uint32),
+            size=document.get("size", 0),
+            high_risk_count=document.get("high_risk_count", 0),
+            analyzed_count=document.get("analyzed_count", 0),
+            first_seen=document.get("first_seen"),
+            last_seen=document.get("last_seen"),
+            daily_counts=document.get("daily_counts"),
+            verdicts=document.get("verdicts"),
+            verdict_analysis_id=document.get("verdict_analysis_id")
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Cluster statistics for the LeaseClusterStats model."""
+        # The scam likelihood and risk level are the same in every language
+        verdict = next(iter(self.verdicts.values()), {})
+        since = (datetime.now() - timedelta(days=ACTIVITY_DAYS - 1)).date().isoformat()
+        return {
+            "id": self.id,
+            "size": self.size,
+            "high_risk_count": self.high_risk_count,
+            "analyzed_count": self.analyzed_count,
+            "recent_count": sum(count for day, count in self.daily_counts.items() if day >= since),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "scam_likelihood": verdict.get("scam_likelihood"),
+            "risk_level": verdict.get("risk_level"),
+            "verdict_analysis_id": self.verdict_analysis_id,
+        }
+
+
+class LeaseClusterIndex:
+    """LSH index of lease clusters by MinHash signature."""
+
+    _clusters: Dict[str, LeaseCluster] = {}
+    # (band, band values) -> ids of the clusters with that band
+    _buckets: Dict[Tuple[int, bytes], List[str]] = {}
+    _loading: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def signature(document_content: str) -> Optional[np.ndarray]:
+        """Signature of an uploaded lease, or None if clustering is off or it's too short."""
+        if not LEASE_CLUSTERS_ENABLED or not document_content:
+            return None
+        return lease_signature(document_content)
+
+    @staticmethod
+    def _bands(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()) for band in range(LSH_BANDS)]
+
+    @classmethod
+    def _index(cls, cluster: LeaseCluster) -> None:
+        if len(cls._clusters) >= LEASE_CLUSTER_INDEX_SIZE:
+            oldest = min(cls._clusters.values(), key=lambda indexed: indexed.last_seen or "")
+            if LEASE_CLUSTER_INDEX_SIZE <= 0 or (oldest.last_seen or "") > (cluster.last_seen or ""):
+                return
+            cls._drop(oldest)
+        cls._clusters[cluster.id] = cluster
+        for band in cls._bands(cluster.signature):
+            cls._buckets.setdefault(band, []).append(cluster.id)
+
+    @classmethod
+    def _drop(cls, cluster: LeaseCluster) -> None:
+        del cls._clusters[cluster.id]
+        for band in cls._bands(cluster.signature):
+            bucket = cls._buckets.get(band, [])
+            if cluster.id in bucket:
+                bucket.remove(cluster.id)
+            if not bucket:
+                cls._buckets.pop(band, None)
+
+    @classmethod
+    def match(cls, signature: Optional[np.ndarray]) -> Optional[LeaseCluster]:
+        """
+        The cluster of the most similar known lease template.
+
+        Only clusters sharing an LSH band are compared, so a lookup costs a
+        few dictionary reads however many clusters there are.
+        """
+        if signature is None:
+            return None
+        if cls._loading is None:
+            cls._loading = asyncio.get_running_loop().create_task(cls._load())
+        candidates = {cluster_id for band in cls._bands(signature) for cluster_id in cls._buckets.get(band, ())}
+        best, best_similarity = None, LEASE_CLUSTER_SIMILARITY
+        for cluster_id in candidates:
+            cluster = cls._clusters[cluster_id]
+            # Share of equal MinHash values estimates the Jaccard similarity
+            similarity = float(np.mean(cluster.signature == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = cluster, similarity
+        return best
+
+    @classmethod
+    def known_scam(cls, signature: Optional[np.ndarray], language) -> Optional[Tuple[LeaseCluster, Dict[str, Any]]]:
+        """
+        The high-risk template a lease copies, with its verdict in the language.
+
+        Returns:
+            (cluster, verdict_summary), or None if the lease isn't a copy of a
+            template that independent analyses found high-risk often enough
+        """
+        cluster = cls.match(signature)
+        if cluster is None or cluster.high_risk_count < LEASE_CLUSTER_MIN_HIGH_RISK:
+            return None
+        if cluster.high_risk_count < LEASE_CLUSTER_MIN_HIGH_RISK_RATIO * cluster.analyzed_count:
+            return None
+        verdict = cluster.verdicts.get(getattr(language, "value", language))
+        # Verdicts stored in earlier forms hold text written for another user's lease
+        if not verdict or "clauses" not in verdict or verdict.get("scam_likelihood") != ScamLikelihood.HIGH.value:
+            return None
+        return cluster, verdict
+
+    @classmethod
+    async def add(cls, signature: Optional[np.ndarray], result: AnalysisResult, language, verdict: bool = True) -> Optional[str]:
+        """
+        File an analyzed lease into its cluster, creating one for a new template.
+
+        Args:
+            signature: Signature of the lease (None leaves it unclustered)
+            result: Its analysis
+            language: Analysis language
+            verdict: Whether the analysis may become the cluster's verdict (False
+                for results answered from the cluster or failed analyses)
+
+        Returns:
+            Cluster id
+        """
+        if signature is None:
+            return None
+        language = getattr(language, "value", language)
+        now = datetime.now()
+        cluster = cls.match(signature)
+        if cluster is None:
+            cluster = LeaseCluster(str(uuid.uuid4()), signature, first_seen=now.isoformat(), last_seen=now.isoformat())
+            cls._index(cluster)
+
+        # Only analyses made by Gemini count towards the verdict, copies answered
+        # from the cluster would otherwise confirm it themselves
+        high_risk = verdict and result.scam_likelihood == ScamLikelihood.HIGH
+        day = now.date().isoformat()
+        cluster.size += 1
+        cluster.analyzed_count += int(verdict)
+        cluster.high_risk_count += int(high_risk)
+        cluster.last_seen = now.isoformat()
+        cluster.daily_counts[day] = cluster.daily_counts.get(day, 0) + 1
+        update: Dict[str, Any] = {
+            "$setOnInsert": {"signature": signature.tolist(), "first_seen": cluster.first_seen},
+            "$inc": {
+                "size": 1, "analyzed_count": int(verdict), "high_risk_count": int(high_risk),
+                f"daily_counts.{day}": 1
+            },
+            "$set": {"last_seen": cluster.last_seen},
+        }
+
+        # A high-risk verdict replaces a milder one, so copies of a scam get the
+        # warning once enough analyses agree (see known_scam)
+        current = cluster.verdicts.get(language)
+        if verdict and (
+            current is None or "clauses" not in current
+            or (high_risk and current.get("scam_likelihood") != ScamLikelihood.HIGH.value)
+        ):
+            summary = verdict_summary(result)
+            cluster.verdicts[language] = summary
+            cluster.verdict_analysis_id = result.id
+            update["$set"].update({f"verdicts.{language}": summary, "verdict_analysis_id": result.id})
+
+        # The cluster is up to date in memory, persist off the request path
+        async def write() -> None:
+            collection = await get_collection(LEASE_CLUSTERS_COLLECTION)
+            await collection.update_one({"_id": cluster.id}, update, upsert=True)
+
+        write_in_background(write(), "Lease cluster write")
+        return cluster.id
+
+    @classmethod
+    async def _load(cls) -> None:
+        """Index the most recently seen stored clusters (added to the ones created since startup)."""
+        try:
+            collection = await get_collection(LEASE_CLUSTERS_COLLECTION)
+            cursor = collection.find({}).sort("last_seen", -1).limit(LEASE_CLUSTER_INDEX_SIZE)
+            async for document in cursor:
+                if document["_id"] not in cls._clusters and document.get("signature"):
+                    cls._index(LeaseCluster.from_document(document))
+        except Exception as e:
+            logger.warning(f"Lease cluster load failed: {str(e)}")
+        logger.info(f"Lease clusters: {len(cls._clusters)} loaded")
+
+    @classmethod
+    async def cluster_stats(cls, limit: int = 20, min_size: int = 2) -> List[Dict[str, Any]]:
+        """
+        Statistics of the largest clusters, most active first.
+
+        Read from the database (all workers' leases), or from memory if it's
+        unreachable.
+        """
+        clusters: List[LeaseCluster] = []
+        try:
+            collection = await get_collection(LEASE_CLUSTERS_COLLECTION)
+            cursor = collection.find(
+                {"size": {"$gte": min_size}},
+                {"signature": 0}
+            ).sort("size", -1).limit(max(limit * 10, 100))
+            async for document in cursor:
+                clusters.append(LeaseCluster.from_document(document))
+        except Exception as e:
+            logger.warning(f"Lease cluster stats lookup failed: {str(e)}")
+            clusters = [cluster for cluster in cls._clusters.values() if cluster.size >= min_size]
+
+        stats = [cluster.stats() for cluster in clusters]
+        stats.sort(key=lambda cluster: (cluster["recent_count"], cluster["size"]), reverse=True)
+        return stats[:limit]
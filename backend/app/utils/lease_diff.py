@@ -0,0 +1,99 @@
+"""
+Clause-level diff between two versions of a lease.
+
+Used for incremental re-analysis: when a tenant re-uploads a negotiated
+lease, only the clauses that were added or reworded need a fresh look; the
+verdicts for unchanged clauses carry over from the previous analysis.
+"""
+
+import difflib
+from typing import Dict, List, Optional
+
+from app.models.rental import AnalysisResult
+from app.utils.clause_segmenter import Clause, segment_clauses, find_clause
+from app.utils.clause_cache import ClausePlan, MIN_CLAUSES
+
+
+class ClauseDiff:
+    """Which clauses of the new version are new, changed, unchanged or gone."""
+
+    def __init__(self, old_clauses: List[Clause], new_clauses: List[Clause]):
+        self.old_clauses = old_clauses
+        self.new_clauses = new_clauses
+        # new clause index -> the identical clause in the old version
+        self.unchanged: Dict[int, Clause] = {}
+        self.changed: List[Clause] = []
+        self.removed: List[Clause] = []
+
+        matcher = difflib.SequenceMatcher(
+            a=[clause.key for clause in old_clauses],
+            b=[clause.key for clause in new_clauses],
+            autojunk=False
+        )
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+            if tag == "equal":
+                for offset in range(new_end - new_start):
+                    self.unchanged[new_start + offset] = old_clauses[old_start + offset]
+                continue
+            # "replace" is a reworded clause, only "delete" removes one
+            self.changed.extend(new_clauses[new_start:new_end])
+            if tag == "delete":
+                self.removed.extend(old_clauses[old_start:old_end])
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.changed or self.removed)
+
+    def summary(self) -> str:
+        """Short description of the revision for the prompt."""
+        parts = []
+        if self.changed:
+            parts.append("New or changed clauses: " + "; ".join(clause.preview(60) for clause in self.changed))
+        if self.removed:
+            parts.append("Clauses removed since the previous version: " + "; ".join(clause.preview(60) for clause in self.removed))
+        return "\n".join(parts)
+
+
+def diff_leases(old_text: str, new_text: str) -> Optional[ClauseDiff]:
+    """
+    Diff two lease versions clause by clause.
+
+    Returns:
+        ClauseDiff, or None if either version has no usable clause structure
+    """
+    old_clauses = segment_clauses(old_text)
+    new_clauses = segment_clauses(new_text)
+    if len(old_clauses) < MIN_CLAUSES or len(new_clauses) < MIN_CLAUSES:
+        return None
+    return ClauseDiff(old_clauses, new_clauses)
+
+
+def revision_plan(diff: ClauseDiff, previous: AnalysisResult, language) -> ClausePlan:
+    """
+    Clause plan that carries the previous verdicts over to unchanged clauses.
+
+    Unchanged clauses are shown to the model as one-line references and the
+    concerning clauses previously found in them are merged back afterwards;
+    only the changed clauses are sent in full.
+
+    If a previous concern can't be located in the old version, no unchanged
+    clause is known to be clean (the concern may be in any of them), so
+    only the ones with located concerns are carried over and the rest are
+    sent in full too.
+    """
+    verdicts: Dict[int, List[dict]] = {old.index: [] for old in diff.old_clauses}
+    unmatched = 0
+    for clause in previous.simplified_clauses:
+        if not clause.is_concerning:
+            continue
+        matched = find_clause(clause.text, diff.old_clauses)
+        if matched is None:
+            unmatched += 1
+        else:
+            verdicts[matched.index].append(clause.dict())
+
+    cached = {
+        index: verdicts[old.index] for index, old in diff.unchanged.items()
+        if verdicts[old.index] or not unmatched
+    }
+    return ClausePlan(getattr(language, "value", language), diff.new_clauses, cached)
@@ -0,0 +1,306 @@
+"""
+Async fetching of rental listing pages.
+
+All listing requests share one pooled httpx.AsyncClient, so connections to
+the same site are reused, and a per-host semaphore keeps us from opening
+more than LISTING_MAX_PER_HOST concurrent requests to any one site.
+Responses are cached in memory; fresh entries are served without a request
+and stale ones are revalidated with If-None-Match / If-Modified-Since.
+Pages are reduced to their main text within a token budget before they
+reach the prompt.
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+from html.parser import HTMLParser
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.utils.cache import LRUCache
+from app.utils.text_normalizer import CHARS_PER_TOKEN
+
+logger = logging.getLogger("rent-spiracy")
+
+LISTING_FETCH_TIMEOUT = float(os.getenv("LISTING_FETCH_TIMEOUT", "10"))
+
+# Connection pool limits for the shared client
+LISTING_MAX_CONNECTIONS = int(os.getenv("LISTING_MAX_CONNECTIONS", "50"))
+LISTING_MAX_PER_HOST = int(os.getenv("LISTING_MAX_PER_HOST", "4"))
+# Hosts whose semaphores are kept; the least recently fetched are dropped
+LISTING_HOST_LIMIT_SIZE = int(os.getenv("LISTING_HOST_LIMIT_SIZE", "1024"))
+
+# Prompt tokens the listing text may take up
+LISTING_TOKEN_BUDGET = int(os.getenv("LISTING_TOKEN_BUDGET", "1500"))
+
+# Cached pages without Cache-Control max-age are revalidated after this many seconds
+LISTING_CACHE_DEFAULT_TTL = int(os.getenv("LISTING_CACHE_DEFAULT_TTL", "300"))
+LISTING_CACHE_SIZE = int(os.getenv("LISTING_CACHE_SIZE", "512"))
+
+# Pages larger than this are cut off; the rest of the body is never downloaded
+MAX_HTML_BYTES = 2 * 1024 * 1024
+
+USER_AGENT = "Mozilla/5.0 (compatible; RentSpiracy/1.0; +https://rentspiracy.tech)"
+
+# Elements whose text is never listing content
+SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "iframe", "nav", "footer", "header", "form", "button", "select", "aside"}
+
+# Elements that end a line of text
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "tr", "table", "br", "hr",
+    "h1", "h2", "h3", "h4", "h5", "h6", "dt", "dd", "dl", "blockquote", "pre", "address", "figcaption",
+}
+
+# Elements that hold the main content when a page marks it up
+MAIN_TAGS = {"main", "article"}
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class _MainTextParser(HTMLParser):
+    """Collects title, description and visible text, separately for <main>/<article>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.description = ""
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._in_title = False
+        self._all: List[str] = []
+        self._main: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in MAIN_TAGS:
+            self._main_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            attributes = dict(attrs)
+            name = (attributes.get("name") or attributes.get("property") or "").lower()
+            if name in ("description", "og:description") and not self.description:
+                self.description = (attributes.get("content") or "").strip()
+        if tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/>, <meta .../>: no matching end tag will follow
+        self.handle_starttag(tag, attrs)
+        if tag in SKIP_TAGS:
+            self._skip_depth -= 1
+        elif tag in MAIN_TAGS:
+            self._main_depth -= 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in MAIN_TAGS and self._main_depth:
+            self._main_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        if tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_depth:
+            return
+        self._all.append(data)
+        if self._main_depth:
+            self._main.append(data)
+
+    def _newline(self):
+        self._all.append("\n")
+        if self._main_depth:
+            self._main.append("\n")
+
+    @staticmethod
+    def _clean(parts: List[str]) -> str:
+        lines = (re.sub(r"\s+", " ", line).strip() for line in "".join(parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    def main_text(self) -> str:
+        """Text of <main>/<article> when it has substance, else the whole page."""
+        main = self._clean(self._main)
+        return main if len(main) >= 200 else self._clean(self._all)
+
+
+def html_to_text(html: str, token_budget: int = LISTING_TOKEN_BUDGET) -> str:
+    """
+    Reduce a listing page to its title, description and main text.
+
+    Args:
+        html: Page source
+        token_budget: Maximum estimated prompt tokens of the result
+
+    Returns:
+        Plain text, cut at a line or word boundary to fit the budget
+    """
+    parser = _MainTextParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        # HTMLParser is lenient, but keep whatever was collected on odd markup
+        logger.warning(f"Error parsing listing HTML: {str(e)}")
+
+    parts = []
+    title = re.sub(r"\s+", " ", parser.title).strip()
+    if title:
+        parts.append(f"Title: {title}")
+    if parser.description:
+        parts.append(f"Description: {parser.description}")
+    parts.append(parser.main_text())
+    text = "\n".join(part for part in parts if part)
+
+    limit = token_budget * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return (cut[:boundary] if boundary > limit // 2 else cut).rstrip() + "\n...[listing truncated]..."
+
+
+class ListingPage:
+    """Main text of a fetched listing page."""
+
+    def __init__(self, url: str, status_code: int, text: str, from_cache: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.from_cache = from_cache
+
+
+class _CachedResponse:
+    def __init__(self, text: str, etag: Optional[str], last_modified: Optional[str], expires_at: float):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+
+def _max_age(headers: httpx.Headers) -> Optional[int]:
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return int(match.group(1)) if match else LISTING_CACHE_DEFAULT_TTL
+
+
+class ListingFetcher:
+    """Shared async client, per-host limits and the listing response cache."""
+
+    _client: Optional[httpx.AsyncClient] = None
+    # A host only falls out once LISTING_HOST_LIMIT_SIZE other hosts were
+    # fetched after it, so a semaphore still in use is in practice never dropped
+    _host_semaphores: LRUCache = LRUCache(LISTING_HOST_LIMIT_SIZE)
+    _cache: LRUCache = LRUCache(LISTING_CACHE_SIZE)
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """The pooled client, created on first use."""
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                timeout=LISTING_FETCH_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=LISTING_MAX_CONNECTIONS,
+                    max_keepalive_connections=LISTING_MAX_CONNECTIONS // 2
+                ),
+                headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+            )
+        return cls._client
+
+    @classmethod
+    def _semaphore(cls, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        semaphore = cls._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(LISTING_MAX_PER_HOST)
+            cls._host_semaphores.set(host, semaphore)
+        return semaphore
+
+    @staticmethod
+    async def _read_capped(response: httpx.Response) -> str:
+        """Read at most MAX_HTML_BYTES of the body and decode it."""
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= MAX_HTML_BYTES:
+                break
+        content = b"".join(chunks)[:MAX_HTML_BYTES]
+        return content.decode(response.encoding or "utf-8", errors="replace")
+
+    @classmethod
+    async def fetch(cls, url: str) -> Optional[ListingPage]:
+        """
+        Fetch a listing page and extract its main text.
+
+        Returns:
+            ListingPage, or None if the page could not be retrieved
+        """
+        cached: Optional[_CachedResponse] = cls._cache.get(url)
+        if cached is not None and cached.expires_at > time.monotonic():
+            return ListingPage(url, 200, cached.text, from_cache=True)
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            async with cls._semaphore(url):
+                async with cls.get_client().stream("GET", url, headers=headers) as response:
+                    # Only a 200 body is read; closing the stream early drops the rest
+                    html = await cls._read_capped(response) if response.status_code == 200 else ""
+        except httpx.HTTPError as e:
+            logger.warning(f"Error fetching listing {url}: {str(e)}")
+            return None
+
+        max_age = _max_age(response.headers)
+        if response.status_code == 304 and cached is not None:
+            cached.expires_at = time.monotonic() + (max_age or 0)
+            return ListingPage(url, 200, cached.text, from_cache=True)
+        if response.status_code != 200:
+            logger.warning(f"Listing {url} returned HTTP {response.status_code}")
+            return ListingPage(url, response.status_code, "")
+
+        # Parsing is CPU work, keep it off the event loop for large pages
+        text = await asyncio.to_thread(html_to_text, html) if len(html) > 200_000 else html_to_text(html)
+
+        if max_age is not None:
+            cls._cache.set(url, _CachedResponse(
+                text,
+                response.headers.get("etag"),
+                response.headers.get("last-modified"),
+                time.monotonic() + max_age
+            ))
+        return ListingPage(url, 200, text)
+
+    @classmethod
+    async def close(cls):
+        """Close the pooled client (application shutdown)."""
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
+
+async def fetch_listing(url: str) -> Optional[ListingPage]:
+    """
+    Convenience function to fetch the main text of a listing page.
+    """
+    return await ListingFetcher.fetch(url)
@@ -0,0 +1,201 @@
+"""
+Resolve a property address to a rental listing URL.
+
+The lookup goes through a pluggable ListingSearchProvider. Results are
+cached by normalized address for LISTING_SEARCH_TTL seconds, and "no
+listing found" answers for LISTING_SEARCH_NEGATIVE_TTL, so a popular
+address costs one search per day instead of one per analysis.
+"""
+
+import os
+import re
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+from urllib.parse import quote_plus
+
+import httpx
+
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger("rent-spiracy")
+
+# Search backend: "local" (deterministic stand-in) or "google" (Custom Search JSON API)
+LISTING_SEARCH_PROVIDER = os.getenv("LISTING_SEARCH_PROVIDER", "local").lower()
+GOOGLE_SEARCH_API_KEY = os.getenv("GOOGLE_SEARCH_API_KEY")
+GOOGLE_SEARCH_ENGINE_ID = os.getenv("GOOGLE_SEARCH_ENGINE_ID")
+
+# Seconds a found listing / a "no listing found" answer is cached
+LISTING_SEARCH_TTL = int(os.getenv("LISTING_SEARCH_TTL", "86400"))
+LISTING_SEARCH_NEGATIVE_TTL = int(os.getenv("LISTING_SEARCH_NEGATIVE_TTL", "3600"))
+LISTING_SEARCH_CACHE_SIZE = int(os.getenv("LISTING_SEARCH_CACHE_SIZE", "4096"))
+
+GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+
+# Rental sites whose result pages count as listings
+LISTING_SITES = ("zillow.com", "apartments.com", "craigslist.org", "trulia.com", "hotpads.com", "rent.com", "realtor.com")
+
+# Spelling variants folded together so "123 North Main Street, Apt. 4"
+# and "123 n main st #4" share a cache entry
+ADDRESS_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "av": "ave", "boulevard": "blvd", "road": "rd", "drive": "dr",
+    "lane": "ln", "court": "ct", "place": "pl", "terrace": "ter", "parkway": "pkwy", "highway": "hwy",
+    "circle": "cir", "square": "sq", "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+    "apartment": "apt", "unit": "apt", "suite": "ste",
+}
+
+# Cached value meaning "searched, no listing"; None means "not cached"
+_NO_LISTING = ""
+
+
+def normalize_address(address: str) -> str:
+    """
+    Canonical form of an address for cache keys.
+
+    Lowercases, drops punctuation and folds common street, direction and
+    unit spellings to their abbreviations.
+    """
+    text = (address or "").lower().replace("#", " apt ")
+    words = re.sub(r"[^a-z0-9 ]+", " ", text).split()
+    return " ".join(ADDRESS_ABBREVIATIONS.get(word, word) for word in words)
+
+
+class ListingSearchProvider(ABC):
+    """Backend that looks up the listing for an address."""
+
+    name = "base"
+
+    @abstractmethod
+    async def search(self, address: str) -> Optional[str]:
+        """
+        Find a rental listing for an address.
+
+        Returns:
+            Listing URL, or None if there is no listing
+
+        Raises:
+            Exception: Lookup failures; they are not cached
+        """
+
+
+class LocalListingSearchProvider(ListingSearchProvider):
+    """
+    Offline stand-in for a search API.
+
+    With a listings map, answers only from it (keys are normalized
+    addresses). Without one, returns a search URL on one of the listing
+    sites, chosen from the address so repeated lookups agree.
+    """
+
+    name = "local"
+
+    def __init__(self, listings: Optional[Dict[str, Optional[str]]] = None):
+        self.listings = {normalize_address(address): url for address, url in (listings or {}).items()}
+        self.calls = 0
+
+    async def search(self, address: str) -> Optional[str]:
+        self.calls += 1
+        key = normalize_address(address)
+        if self.listings:
+            return self.listings.get(key)
+        if not key:
+            return None
+        mock_listings = [
+            f"https://www.zillow.com/homes/for_rent/{key.replace(' ', '-')}",
+            f"https://www.apartments.com/search/{key.replace(' ', '-')}",
+            f"https://www.craigslist.org/search/apa?query={quote_plus(key)}"
+        ]
+        return mock_listings[int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16) % len(mock_listings)]
+
+
+class GoogleListingSearchProvider(ListingSearchProvider):
+    """Google Custom Search JSON API, restricted to known rental sites."""
+
+    name = "google"
+
+    def __init__(self, api_key: str, engine_id: str, timeout: float = 5.0):
+        self.api_key = api_key
+        self.engine_id = engine_id
+        self.timeout = timeout
+
+    async def search(self, address: str) -> Optional[str]:
+        sites = " OR ".join(f"site:{site}" for site in LISTING_SITES)
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(GOOGLE_SEARCH_URL, params={
+                "key": self.api_key,
+                "cx": self.engine_id,
+                "q": f'"{address}" for rent ({sites})',
+                "num": 5
+            })
+            response.raise_for_status()
+        for item in response.json().get("items", []):
+            link = item.get("link", "")
+            if any(site in link for site in LISTING_SITES):
+                return link
+        return None
+
+
+def _default_provider() -> ListingSearchProvider:
+    if LISTING_SEARCH_PROVIDER == "google":
+        if GOOGLE_SEARCH_API_KEY and GOOGLE_SEARCH_ENGINE_ID:
+            return GoogleListingSearchProvider(GOOGLE_SEARCH_API_KEY, GOOGLE_SEARCH_ENGINE_ID)
+        logger.warning("LISTING_SEARCH_PROVIDER=google but GOOGLE_SEARCH_API_KEY/GOOGLE_SEARCH_ENGINE_ID are not set, using local search")
+    return LocalListingSearchProvider()
+
+
+class ListingResolver:
+    """Address -> listing URL lookups through the provider, with a TTL cache."""
+
+    _provider: Optional[ListingSearchProvider] = None
+    _cache: TTLCache = TTLCache(LISTING_SEARCH_CACHE_SIZE, LISTING_SEARCH_TTL)
+
+    @classmethod
+    def get_provider(cls) -> ListingSearchProvider:
+        if cls._provider is None:
+            cls._provider = _default_provider()
+        return cls._provider
+
+    @classmethod
+    def set_provider(cls, provider: ListingSearchProvider) -> None:
+        """Swap the search backend (and drop answers cached from the old one)."""
+        cls._provider = provider
+        cls._cache.clear()
+
+    @classmethod
+    async def resolve(cls, address: str) -> Optional[str]:
+        """
+        Listing URL for an address, from the cache when possible.
+
+        Returns:
+            Listing URL, or None if no listing was found or the search failed
+        """
+        key = normalize_address(address)
+        if not key:
+            return None
+
+        cached = cls._cache.get(key)
+        if cached is not None:
+            return cached or None
+
+        provider = cls.get_provider()
+        try:
+            listing_url = await provider.search(address)
+        except Exception as e:
+            # Failures aren't answers, the next request tries again
+            logger.warning(f"Listing search ({provider.name}) failed for {address}: {str(e)}")
+            return None
+
+        if listing_url:
+            cls._cache.set(key, listing_url)
+        else:
+            cls._cache.set(key, _NO_LISTING, ttl=LISTING_SEARCH_NEGATIVE_TTL)
+        return listing_url
+
+
+async def resolve_listing(address: str) -> Optional[str]:
+    """
+    Convenience function to find the listing URL for an address.
+    """
+    return await ListingResolver.resolve(address)
@@ -0,0 +1,166 @@
+"""
+Streaming multipart/form-data parser.
+
+Yields each part of a multipart request body as soon as its closing boundary
+has been received, so callers can start processing a file while the rest of
+the request is still being uploaded.
+"""
+
+from typing import AsyncIterator, Dict, List, Optional
+import logging
+
+from starlette.requests import Request
+from multipart.multipart import MultipartParser, MultipartState, parse_options_header
+from multipart.exceptions import ParseError
+
+logger = logging.getLogger("rent-spiracy")
+
+
+class MultipartStreamError(ValueError):
+    """Raised when the multipart body is malformed or violates a limit."""
+
+
+class StreamedPart:
+    """A single fully received part of a multipart body."""
+
+    def __init__(self, name: str, filename: Optional[str], content_type: str, data: bytes):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.data = data
+
+    @property
+    def is_file(self) -> bool:
+        """Whether this part was sent as a file upload."""
+        return self.filename is not None
+
+    def text(self, charset: str = "utf-8") -> str:
+        """Decode a plain form field value."""
+        try:
+            return self.data.decode(charset)
+        except (UnicodeDecodeError, LookupError):
+            return self.data.decode("latin-1")
+
+
+class _PartCollector:
+    """Callback target for the python-multipart parser."""
+
+    def __init__(self, max_part_size: int, max_parts: int):
+        self.max_part_size = max_part_size
+        self.max_parts = max_parts
+        self.completed: List[StreamedPart] = []
+        self._part_count = 0
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._data = bytearray()
+        self._name = ""
+        self._filename: Optional[str] = None
+        self._content_type = ""
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._data = bytearray()
+        self._name = ""
+        self._filename = None
+        self._content_type = ""
+        self._part_count += 1
+        if self._part_count > self.max_parts:
+            raise MultipartStreamError(f"Too many parts. Maximum number of parts is {self.max_parts}.")
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise MultipartStreamError('The Content-Disposition header field "name" must be provided.')
+        self._name = options[b"name"].decode("utf-8", errors="replace")
+        if b"filename" in options:
+            self._filename = options[b"filename"].decode("utf-8", errors="replace")
+        self._content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self._data += data[start:end]
+        if len(self._data) > self.max_part_size:
+            label = self._filename or self._name
+            raise MultipartStreamError(
+                f"File {label} exceeds the {self.max_part_size // (1024 * 1024)}MB limit"
+            )
+
+    def on_part_end(self):
+        self.completed.append(StreamedPart(
+            name=self._name,
+            filename=self._filename,
+            content_type=self._content_type,
+            data=bytes(self._data)
+        ))
+        self._data = bytearray()
+
+
+async def iter_multipart_parts(
+    request: Request,
+    max_part_size: int = 10 * 1024 * 1024,
+    max_parts: int = 100
+) -> AsyncIterator[StreamedPart]:
+    """
+    Parse a multipart request body incrementally.
+
+    Args:
+        request: The incoming Starlette/FastAPI request
+        max_part_size: Maximum size in bytes of a single part
+        max_parts: Maximum number of parts accepted in one body
+
+    Yields:
+        Each StreamedPart as soon as it has been fully received
+
+    Raises:
+        MultipartStreamError: If the body is not valid multipart or exceeds a limit
+    """
+    content_type = request.headers.get("content-type", "")
+    mime_type, params = parse_options_header(content_type)
+    if mime_type != b"multipart/form-data":
+        raise MultipartStreamError("Expected a multipart/form-data request body.")
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise MultipartStreamError("Missing boundary in multipart.")
+
+    collector = _PartCollector(max_part_size=max_part_size, max_parts=max_parts)
+    parser = MultipartParser(boundary, {
+        "on_part_begin": collector.on_part_begin,
+        "on_part_data": collector.on_part_data,
+        "on_part_end": collector.on_part_end,
+        "on_header_field": collector.on_header_field,
+        "on_header_value": collector.on_header_value,
+        "on_header_end": collector.on_header_end,
+        "on_headers_finished": collector.on_headers_finished,
+    })
+
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        try:
+            parser.write(chunk)
+        except ParseError as e:
+            raise MultipartStreamError(f"Malformed multipart body: {str(e)}")
+        # Hand over every part that finished inside this chunk before reading more
+        while collector.completed:
+            yield collector.completed.pop(0)
+
+    try:
+        parser.finalize()
+    except ParseError as e:
+        raise MultipartStreamError(f"Malformed multipart body: {str(e)}")
+    # finalize() doesn't check that the closing boundary arrived
+    if parser.state != MultipartState.END:
+        raise MultipartStreamError("Incomplete multipart body: the closing boundary is missing.")
+    while collector.completed:
+        yield collector.completed.pop(0)
@@ -0,0 +1,104 @@
+"""
+Measure what lease text normalization saves on the sample leases.
+
+Usage (from the backend directory):
+    python -m app.utils.normalization_benchmark [--gemini]
+
+For every sample_lease/*.txt file this reports characters and estimated
+prompt tokens before and after normalize_lease_text, plus the time the
+normalization itself takes. A "paged" variant of each lease, with a running
+header and "Page n of m" footer every 40 lines as produced by multi-page PDF
+extraction, is measured as well.
+
+With --gemini (and GEMINI_API_KEY set) the token counts come from the Gemini
+tokenizer and each prompt is sent to the model once raw and once normalized
+to compare end-to-end latency.
+"""
+
+import asyncio
+import glob
+import os
+import statistics
+import sys
+import time
+
+from app.utils.text_normalizer import normalize_lease_text, estimate_tokens
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "sample_lease")
+
+
+def paginate(text: str, title: str, lines_per_page: int = 40) -> str:
+    """Simulate multi-page extraction with a running header and footer."""
+    lines = text.split("\n")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    paged = []
+    for number, page in enumerate(pages, start=1):
+        paged.append(f"{title} - CONFIDENTIAL")
+        paged.extend(page)
+        paged.append(f"Tenant Initials: ______    Landlord Initials: ______")
+        paged.append(f"Page {number} of {len(pages)}")
+        paged.append("\f")
+    return "\n".join(paged)
+
+
+def time_normalization(text: str, rounds: int = 50) -> float:
+    """Median normalization time in milliseconds."""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        normalize_lease_text(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def gemini_measurements(raw: str, normalized: str):
+    """Real token counts and latency for raw vs normalized prompts."""
+    from app.utils.gemini_service import GeminiService
+
+    model = GeminiService.get_model()
+    results = {}
+    for label, text in (("raw", raw), ("normalized", normalized)):
+        prompt = GeminiService._generate_rental_analysis_prompt(document_content=text)
+        tokens = model.count_tokens(prompt).total_tokens
+        start = time.perf_counter()
+        model.generate_content(prompt, generation_config=GeminiService._get_generation_config())
+        results[label] = (tokens, time.perf_counter() - start)
+    return results
+
+
+def benchmark(use_gemini: bool = False):
+    """Print the reduction table for every sample lease."""
+    paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, "*.txt")))
+    if not paths:
+        print(f"No sample leases found in {os.path.abspath(SAMPLE_DIR)}")
+        return
+
+    print(f"{'file':<22}{'chars':>14}{'est. tokens':>16}{'saved':>8}{'normalize':>12}")
+    totals = [0, 0]
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        name = os.path.basename(path)
+        variants = [(name, text), (f"{name} (paged)", paginate(text, text.split("\n", 1)[0].strip()))]
+        for label, raw in variants:
+            normalized = normalize_lease_text(raw)
+            before, after = estimate_tokens(raw), estimate_tokens(normalized)
+            totals[0] += before
+            totals[1] += after
+            print(
+                f"{label:<22}{len(raw):>6} -> {len(normalized):<6}{before:>7} -> {after:<6}"
+                f"{100 * (1 - after / before):>7.1f}%{time_normalization(raw):>9.2f} ms"
+            )
+            if use_gemini:
+                results = asyncio.run(gemini_measurements(raw, normalized))
+                (raw_tokens, raw_latency), (norm_tokens, norm_latency) = results["raw"], results["normalized"]
+                print(
+                    f"{'':<22}gemini prompt tokens {raw_tokens} -> {norm_tokens}, "
+                    f"latency {raw_latency:.2f}s -> {norm_latency:.2f}s"
+                )
+
+    print(f"\nTotal estimated tokens: {totals[0]} -> {totals[1]} ({100 * (1 - totals[1] / totals[0]):.1f}% saved)")
+
+
+if __name__ == "__main__":
+    benchmark(use_gemini="--gemini" in sys.argv)
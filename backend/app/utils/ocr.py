@@ -0,0 +1,289 @@
+"""
+Tesseract OCR with confidence-driven re-recognition of weak lines.
+
+A photo is recognised once with word-level confidences. Only lines holding
+a word whose confidence falls below OCR_RECHECK_CONFIDENCE are cropped and run
+again with alternative preprocessing and page-segmentation modes; the best
+reading of each line is kept. The word confidences also give a document
+quality score in [0, 1] that the analysis step can take into account.
+"""
+
+import os
+import time
+import platform
+import logging
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pytesseract
+from PIL import Image, ImageFilter, ImageOps
+
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+
+logger = logging.getLogger("rent-spiracy")
+
+# Set the Tesseract executable path based on operating system
+if platform.system() == 'Darwin':  # macOS
+    pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'
+elif platform.system() == 'Windows':
+    # Default Windows path, adjust if necessary
+    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Linux will use the default path which is usually correct if installed via package manager
+
+# Lines with a word confidence (0-100) below this are recognised again; a
+# single misread amount matters even when the rest of the line is clean
+OCR_RECHECK_CONFIDENCE = float(os.getenv("OCR_RECHECK_CONFIDENCE", "60"))
+
+# Upper bound on re-recognised lines per image, each costs a Tesseract run per variant
+OCR_MAX_RECHECK_LINES = int(os.getenv("OCR_MAX_RECHECK_LINES", "40"))
+
+# Upper bounds on the extra Tesseract runs and seconds spent re-checking one
+# image; the weakest lines are re-checked first, the rest keep their first reading
+OCR_MAX_RECHECK_CALLS = int(os.getenv("OCR_MAX_RECHECK_CALLS", "24"))
+OCR_RECHECK_TIME_BUDGET = float(os.getenv("OCR_RECHECK_TIME_BUDGET", "8"))
+
+# Seconds one Tesseract run may take (shortened to what the request has left)
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "30"))
+
+# Page segmentation modes tried on a cropped line: single line, then uniform
+# block only if single line didn't improve it
+RECHECK_PSM_MODES = (7, 6)
+
+# Pixels of context kept around a line when cropping it
+CROP_PADDING = 6
+
+
+class OCRLine:
+    """One recognised text line with its words and their confidences."""
+
+    def __init__(self, key: Tuple[int, int, int], words: List[str], confidences: List[float], box: List[int]):
+        self.key = key
+        self.words = words
+        self.confidences = confidences
+        # left, top, right, bottom
+        self.box = box
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.words)
+
+    @property
+    def confidence(self) -> float:
+        """Mean word confidence, weighted by word length."""
+        return _weighted_confidence(self.words, self.confidences)
+
+    @property
+    def is_weak(self) -> bool:
+        return min(self.confidences) < OCR_RECHECK_CONFIDENCE
+
+
+class OCRResult:
+    """Text recognised from an image and how much Tesseract trusts it."""
+
+    def __init__(self, text: str, quality: float, rechecked_lines: int = 0, improved_lines: int = 0):
+        self.text = text
+        # Length-weighted mean word confidence scaled to [0, 1]
+        self.quality = quality
+        self.rechecked_lines = rechecked_lines
+        self.improved_lines = improved_lines
+
+
+class _RecheckBudget:
+    """Tesseract runs and time left for re-checking the lines of one image."""
+
+    def __init__(self, calls: int = OCR_MAX_RECHECK_CALLS, seconds: float = OCR_RECHECK_TIME_BUDGET):
+        self.calls = calls
+        self.ends_at = time.monotonic() + seconds
+
+    @property
+    def exhausted(self) -> bool:
+        return self.calls <= 0 or time.monotonic() >= self.ends_at
+
+    def take(self) -> bool:
+        """Use up one run; False once the calls or the time have run out."""
+        if self.exhausted:
+            return False
+        self.calls -= 1
+        return True
+
+
+def _weighted_confidence(words: Sequence[str], confidences: Sequence[float]) -> float:
+    weights = [len(word) for word in words]
+    total = sum(weights)
+    if not total:
+        return 0.0
+    return sum(weight * conf for weight, conf in zip(weights, confidences)) / total
+
+
+def _read_lines(data: Dict[str, list]) -> List[OCRLine]:
+    """Group the word rows of pytesseract.image_to_data into lines."""
+    lines: Dict[Tuple[int, int, int], OCRLine] = {}
+    for index, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        conf = float(data["conf"][index])
+        # Rows for pages, blocks and lines carry a confidence of -1
+        if not word or conf < 0:
+            continue
+        key = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+        left, top = data["left"][index], data["top"][index]
+        right, bottom = left + data["width"][index], top + data["height"][index]
+        line = lines.get(key)
+        if line is None:
+            lines[key] = OCRLine(key, [word], [conf], [left, top, right, bottom])
+        else:
+            line.words.append(word)
+            line.confidences.append(conf)
+            line.box = [min(line.box[0], left), min(line.box[1], top), max(line.box[2], right), max(line.box[3], bottom)]
+    return list(lines.values())
+
+
+def _recognize(image: Image.Image, config: str = "") -> List[OCRLine]:
+    deadline.check("OCR")
+    try:
+        data = pytesseract.image_to_data(
+            image, config=config, output_type=pytesseract.Output.DICT, timeout=deadline.cap(OCR_TIMEOUT)
+        )
+    except RuntimeError as e:
+        # pytesseract kills Tesseract at the timeout and raises RuntimeError
+        if deadline.remaining() == 0.0:
+            raise DeadlineExceeded("OCR")
+        raise
+    return _read_lines(data)
+
+
+def _preprocess_variants(crop: Image.Image) -> Iterator[Image.Image]:
+    """Alternative renderings of a line crop, cheapest first."""
+    gray = ImageOps.autocontrast(crop.convert("L"))
+    # Tesseract works best with x-heights around 20-30px, phone photos of a
+    # full page often give less than that per line
+    upscaled = gray.resize((gray.width * 2, gray.height * 2), Image.LANCZOS)
+    yield upscaled
+    sharpened = upscaled.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
+    # Global threshold at the mean brightness of the crop
+    histogram = sharpened.histogram()
+    pixels = sum(histogram) or 1
+    threshold = sum(value * count for value, count in enumerate(histogram)) / pixels
+    yield sharpened.point(lambda value: 255 if value > threshold else 0)
+
+
+def _recheck_line(image: Image.Image, line: OCRLine, budget: _RecheckBudget) -> Optional[OCRLine]:
+    """Recognise one weak line again; returns the best reading if it beats the original."""
+    left, top, right, bottom = line.box
+    crop = image.crop((
+        max(left - CROP_PADDING, 0),
+        max(top - CROP_PADDING, 0),
+        min(right + CROP_PADDING, image.width),
+        min(bottom + CROP_PADDING, image.height),
+    ))
+    best = None
+    best_confidence = line.confidence
+    for variant in _preprocess_variants(crop):
+        for psm in RECHECK_PSM_MODES:
+            if not budget.take():
+                return best
+            candidates = _recognize(variant, config=f"--psm {psm}")
+            words = [word for candidate in candidates for word in candidate.words]
+            confidences = [conf for candidate in candidates for conf in candidate.confidences]
+            confidence = _weighted_confidence(words, confidences)
+            if words and confidence > best_confidence:
+                best = OCRLine(line.key, words, confidences, line.box)
+                best_confidence = confidence
+                # The next mode is only a fallback for a mode that didn't help
+                break
+        # Every word reads confidently now, skip the more aggressive preprocessing
+        if best is not None and not best.is_weak:
+            break
+    return best
+
+
+def _layout_text(lines: List[OCRLine]) -> str:
+    """Join lines, with a blank line between Tesseract paragraphs/blocks."""
+    parts = []
+    previous = None
+    for line in lines:
+        if previous is not None and line.key[:2] != previous.key[:2]:
+            parts.append("")
+        parts.append(line.text)
+        previous = line
+    return "\n".join(parts)
+
+
+def recognize_image(image: Image.Image) -> OCRResult:
+    """
+    OCR an image, re-recognising only its low-confidence lines.
+
+    Args:
+        image: The photo or scan to read
+
+    Returns:
+        OCRResult with the text and a quality score in [0, 1]
+
+    Raises:
+        ValueError: If Tesseract fails
+        DeadlineExceeded: If the request runs out of time before the first pass
+    """
+    logger.info("Performing OCR on image")
+    try:
+        lines = _recognize(image)
+        weak = sorted(
+            (line for line in lines if line.is_weak),
+            key=lambda line: line.confidence
+        )[:OCR_MAX_RECHECK_LINES]
+        improved = 0
+        budget = _RecheckBudget()
+        for checked, line in enumerate(weak):
+            if budget.exhausted:
+                # Keep the first reading of the remaining lines
+                logger.info(f"OCR re-check budget used up, skipped {len(weak) - checked} lines")
+                weak = weak[:checked]
+                break
+            try:
+                better = _recheck_line(image, line, budget)
+            except DeadlineExceeded:
+                # Keep the first reading of the remaining lines
+                logger.warning(f"Request deadline reached, skipped re-checking {len(weak) - checked} OCR lines")
+                weak = weak[:checked]
+                break
+            if better is not None:
+                line.words, line.confidences = better.words, better.confidences
+                improved += 1
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"OCR failed: {str(e)}")
+        raise ValueError(f"Error processing image: {str(e)}")
+
+    words = [word for line in lines for word in line.words]
+    confidences = [conf for line in lines for conf in line.confidences]
+    result = OCRResult(
+        text=_layout_text(lines),
+        quality=round(_weighted_confidence(words, confidences) / 100, 3),
+        rechecked_lines=len(weak),
+        improved_lines=improved
+    )
+    logger.info(
+        f"OCR completed, extracted {len(result.text)} characters, quality {result.quality:.2f}, "
+        f"re-checked {result.rechecked_lines} lines ({result.improved_lines} improved)"
+    )
+    return result
+
+
+def ocr_image(image: Image.Image) -> str:
+    """Run Tesseract OCR on a PIL image."""
+    return recognize_image(image).text
+
+
+def combined_quality(documents: Sequence) -> Optional[float]:
+    """
+    Quality of several extracted documents, weighted by their text length.
+
+    Documents without a quality score (text layers, Word files) are ignored;
+    returns None when none of them was OCR'd.
+    """
+    scored = [(len(doc.text or ""), doc.quality_score) for doc in documents if getattr(doc, "quality_score", None) is not None]
+    total = sum(length for length, _ in scored)
+    if not scored:
+        return None
+    if not total:
+        return min(quality for _, quality in scored)
+    return round(sum(length * quality for length, quality in scored) / total, 3)
@@ -0,0 +1,149 @@
+"""
+Move the large text fields of stored analyses into the blob store.
+
+New analyses are stored with their raw Gemini response and lease text in
+the blob store already; this moves the ones stored inline before:
+
+    python -m app.utils.offload_blobs [--dry-run]
+
+Documents are read in batches of OFFLOAD_BATCH_SIZE, only the ones with an
+inline field large enough to offload. The size of each collection and the
+latency of reading analyses by id are reported before and after. The data
+size drops at once; MongoDB reuses the freed storage for new documents but
+only returns it to the disk after a `compact`.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+from app.utils.db import Database, get_collection
+from app.utils.blob_store import BLOB_MIN_SIZE, BLOB_SUFFIX, BLOBS_COLLECTION, offload_fields
+from app.services.analysis_service import ANALYSIS_DOCUMENTS_COLLECTION, ANALYSIS_BLOB_FIELDS, DOCUMENT_BLOB_FIELDS
+
+logger = logging.getLogger("rent-spiracy")
+
+OFFLOAD_BATCH_SIZE = int(os.getenv("OFFLOAD_BATCH_SIZE", "500"))
+
+# Collection -> its text fields kept in the blob store
+OFFLOAD_COLLECTIONS = {
+    "analyses": ANALYSIS_BLOB_FIELDS,
+    ANALYSIS_DOCUMENTS_COLLECTION: DOCUMENT_BLOB_FIELDS,
+}
+
+# Analyses read by id for the latency report
+LATENCY_SAMPLE_SIZE = 200
+
+
+async def collection_size(collection_name: str) -> Dict[str, int]:
+    """Document count, data size and storage size of a collection, in bytes."""
+    try:
+        stats = await Database.get_db().command("collStats", collection_name)
+    except OperationFailure:
+        # Not created yet
+        return {"count": 0, "size": 0, "storage_size": 0}
+    return {"count": stats.get("count", 0), "size": stats.get("size", 0), "storage_size": stats.get("storageSize", 0)}
+
+
+async def read_latency(ids: List[str]) -> float:
+    """Median milliseconds to read a whole analysis by id."""
+    analyses = await get_collection("analyses")
+    timings = []
+    for analysis_id in ids:
+        started = time.perf_counter()
+        await analyses.find_one({"id": analysis_id})
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2] if timings else 0.0
+
+
+def _offload_query(fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """Documents with an inline text field at least BLOB_MIN_SIZE long (as counted by the server)."""
+    return {"$or": [
+        {"$expr": {"$gte": [{"$strLenBytes": {"$ifNull": [f"${field}", ""]}}, BLOB_MIN_SIZE]}}
+        for field in fields
+    ]}
+
+
+async def offload_collection(
+    collection_name: str,
+    fields: Tuple[str, ...],
+    batch_size: int = OFFLOAD_BATCH_SIZE,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Move the inline text fields of a collection into blobs.
+
+    Returns:
+        Counts of documents moved and of bytes of text moved out of them
+    """
+    collection = await get_collection(collection_name)
+    cursor = collection.find(_offload_query(fields), {field: 1 for field in fields}, batch_size=batch_size)
+    counts = {"documents": 0, "bytes": 0}
+    batch: List[UpdateOne] = []
+    async for document in cursor:
+        inline = {field: document[field] for field in fields if isinstance(document.get(field), str)}
+        counts["documents"] += 1
+        counts["bytes"] += sum(len(text.encode("utf-8")) for text in inline.values())
+        if dry_run:
+            continue
+        moved = await offload_fields(dict(inline), fields)
+        refs = {key: value for key, value in moved.items() if key.endswith(BLOB_SUFFIX)}
+        if refs:
+            batch.append(UpdateOne(
+                {"_id": document["_id"]},
+                {"$set": refs, "$unset": {key[:-len(BLOB_SUFFIX)]: "" for key in refs}}
+            ))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            batch = []
+            logger.info(f"Offloaded {counts['documents']} {collection_name}")
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+    return counts
+
+
+async def offload_blobs(dry_run: bool = False) -> None:
+    """Offload the stored analyses and report the collection sizes and read latency."""
+    print("Connecting to database...")
+    await Database.connect_db()
+    try:
+        analyses = await get_collection("analyses")
+        ids = [document["id"] async for document in analyses.find({}, {"id": 1}).limit(LATENCY_SAMPLE_SIZE * 10)]
+        ids = random.sample(ids, min(LATENCY_SAMPLE_SIZE, len(ids)))
+        names = list(OFFLOAD_COLLECTIONS) + [BLOBS_COLLECTION]
+
+        before = {name: await collection_size(name) for name in names}
+        latency_before = await read_latency(ids)
+
+        for collection_name, fields in OFFLOAD_COLLECTIONS.items():
+            started = time.perf_counter()
+            counts = await offload_collection(collection_name, fields, dry_run=dry_run)
+            print(
+                f"{collection_name}: {counts['documents']} documents, {counts['bytes'] / 1e6:.1f} MB of text "
+                f"{'would move' if dry_run else 'moved'} in {time.perf_counter() - started:.1f}s"
+            )
+        if dry_run:
+            return
+
+        after = {name: await collection_size(name) for name in names}
+        latency_after = await read_latency(ids)
+        for name in names:
+            print(
+                f"{name}: {before[name]['count']} -> {after[name]['count']} documents, "
+                f"data {before[name]['size'] / 1e6:.1f} -> {after[name]['size'] / 1e6:.1f} MB, "
+                f"storage {before[name]['storage_size'] / 1e6:.1f} -> {after[name]['storage_size'] / 1e6:.1f} MB"
+            )
+        print(f"Median analysis read: {latency_before:.2f} -> {latency_after:.2f} ms ({len(ids)} analyses)")
+    finally:
+        await Database.close_db()
+
+if __name__ == "__main__":
+    asyncio.run(offload_blobs(dry_run="--dry-run" in sys.argv[1:]))
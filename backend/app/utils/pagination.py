@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A page ends with an opaque cursor holding the sort key of its last item.
+The next page is a range query starting after that key, which the index on
+the sort fields answers directly, instead of skipping over every earlier
+item like skip/limit does. The cursor is returned in the X-Next-Cursor
+response header and sent back in the `cursor` query parameter.
+"""
+
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+from bson.errors import BSONError
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# (field, pymongo.ASCENDING or DESCENDING) pairs ending with a unique field
+Sort = List[Tuple[str, int]]
+
+
+def encode_cursor(document: Dict[str, Any], sort: Sort) -> str:
+    """Opaque cursor positioned after a document."""
+    values = [_field(document, field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: Sort) -> List[Any]:
+    """
+    Sort key values held by a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or wasn't made for this sort
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (binascii.Error, UnicodeError, ValueError, TypeError, BSONError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise ValueError("Invalid cursor: it doesn't match this listing")
+    return values
+
+
+def _field(document: Dict[str, Any], field: str) -> Any:
+    value = document
+    for part in field.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def after_cursor(query: Dict[str, Any], sort: Sort, cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Add the range condition selecting the items after a cursor to a query.
+
+    For sort keys (a, b) that is: a past the cursor's a, or a equal and b
+    past the cursor's b.
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, sort)
+    branches = []
+    for position, (field, direction) in enumerate(sort):
+        branch = {sort[i][0]: values[i] for i in range(position)}
+        branch[field] = {"$gt" if direction > 0 else "$lt": values[position]}
+        branches.append(branch)
+    condition = {"$or": branches} if len(branches) > 1 else branches[0]
+    return {"$and": [query, condition]} if query else condition
+
+
+def next_cursor(documents: List[Dict[str, Any]], sort: Sort, limit: int) -> Optional[str]:
+    """Cursor of the page after a full page of documents; None after the last page."""
+    if not documents or len(documents) < limit:
+        return None
+    return encode_cursor(documents[-1], sort)
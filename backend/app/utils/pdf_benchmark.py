@@ -0,0 +1,55 @@
+"""
+Benchmark the available PDF text backends on the sample leases.
+
+Usage (from the backend directory):
+    python -m app.utils.pdf_benchmark [rounds]
+
+Prints the median extraction time per file and backend, plus the amount of
+text each backend recovered, so the default in AUTO_BACKEND_ORDER can be
+chosen on real lease documents.
+"""
+
+import glob
+import os
+import statistics
+import sys
+import time
+
+from app.utils.pdf_parser import PDFParser
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "sample_lease")
+
+
+def benchmark(rounds: int = 20):
+    """Time every installed backend on every sample lease PDF."""
+    paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, "*.pdf")))
+    if not paths:
+        print(f"No sample PDFs found in {os.path.abspath(SAMPLE_DIR)}")
+        return
+
+    backends = PDFParser.available_backends()
+    totals = {backend: 0.0 for backend in backends}
+    print(f"{'file':<12}" + "".join(f"{backend:>23}" for backend in backends))
+
+    for path in paths:
+        with open(path, "rb") as f:
+            content = f.read()
+        row = f"{os.path.basename(path):<12}"
+        for backend in backends:
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                text = PDFParser.extract_text_from_pdf(content, backend=backend)
+                timings.append(time.perf_counter() - start)
+            median_ms = statistics.median(timings) * 1000
+            totals[backend] += median_ms
+            row += f"{median_ms:>10.2f} ms {len(text):>6} ch"
+        print(row)
+
+    print(f"{'total':<12}" + "".join(f"{totals[backend]:>10.2f} ms {'':>9}" for backend in backends))
+    fastest = min(totals, key=totals.get)
+    print(f"\nFastest backend: {fastest}")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -1,63 +1,191 @@
 """
 PDF parser utility for extracting text from PDF documents.
+
+PyPDF2 is always available. pypdfium2 and PyMuPDF are optional, faster text
+backends that are used when installed; set PDF_TEXT_BACKEND to force one
+("pypdf2", "pdfium", "pymupdf" or "auto").
 """
 
+import os
+import threading
 import PyPDF2
 from io import BytesIO
-from typing import BinaryIO, Union
+from typing import BinaryIO, Callable, Dict, List, Optional, Union
 import logging
 
+try:
+    import pypdfium2
+except ImportError:  # optional dependency
+    pypdfium2 = None
+
+try:
+    import pymupdf
+except ImportError:  # optional dependency
+    pymupdf = None
+
 logger = logging.getLogger("rent-spiracy")
 
+# Backend selection, "auto" picks the fastest installed backend
+PDF_TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND", "auto").lower()
+
+# Preference order for "auto", fastest first. On the sample leases pdfium is
+# ~6x faster than PyPDF2 (see app/utils/pdf_benchmark.py)
+AUTO_BACKEND_ORDER = ["pdfium", "pymupdf", "pypdf2"]
+
+# PDFium isn't thread-safe and extraction runs in the threadpool, for several
+# files and requests at once; one document is read through it at a time
+_pdfium_lock = threading.Lock()
+
+
 class PDFParser:
     """Utility class for parsing PDF documents."""
-    
+
+    @staticmethod
+    def available_backends() -> List[str]:
+        """Names of the PDF text backends that can be used in this environment."""
+        backends = ["pypdf2"]
+        if pypdfium2 is not None:
+            backends.append("pdfium")
+        if pymupdf is not None:
+            backends.append("pymupdf")
+        return backends
+
+    @staticmethod
+    def resolve_backend(backend: Optional[str] = None) -> str:
+        """Resolve the configured backend name to one that is installed."""
+        backend = (backend or PDF_TEXT_BACKEND).lower()
+        available = PDFParser.available_backends()
+        if backend == "auto":
+            return next(name for name in AUTO_BACKEND_ORDER if name in available)
+        if backend not in available:
+            logger.warning(f"PDF backend '{backend}' is not installed, falling back to pypdf2")
+            return "pypdf2"
+        return backend
+
+    @staticmethod
+    def _extract_pages_pypdf2(file_content: BinaryIO) -> List[str]:
+        """Extract page texts with PyPDF2."""
+        pdf_reader = PyPDF2.PdfReader(file_content)
+
+        # Check if the PDF is encrypted
+        if pdf_reader.is_encrypted:
+            logger.error("PDF is encrypted/password-protected")
+            raise ValueError("The PDF is password-protected. Please upload an unprotected document.")
+
+        pages = []
+        for page_num in range(len(pdf_reader.pages)):
+            try:
+                pages.append(pdf_reader.pages[page_num].extract_text() or "")
+            except Exception as page_error:
+                logger.warning(f"Could not extract text from page {page_num}: {str(page_error)}")
+                # Continue with other pages
+        return pages
+
+    @staticmethod
+    def _extract_pages_pdfium(file_content: BinaryIO) -> List[str]:
+        """Extract page texts with pypdfium2 (serialized, see _pdfium_lock)."""
+        data = file_content.read()
+        with _pdfium_lock:
+            try:
+                pdf = pypdfium2.PdfDocument(data)
+            except pypdfium2.PdfiumError as e:
+                if "password" in str(e).lower():
+                    raise ValueError("The PDF is password-protected. Please upload an unprotected document.")
+                raise
+
+            pages = []
+            try:
+                for page_num in range(len(pdf)):
+                    try:
+                        page = pdf[page_num]
+                        text_page = page.get_textpage()
+                        pages.append(text_page.get_text_range())
+                        text_page.close()
+                        page.close()
+                    except Exception as page_error:
+                        logger.warning(f"Could not extract text from page {page_num}: {str(page_error)}")
+            finally:
+                pdf.close()
+            return pages
+
+    @staticmethod
+    def _extract_pages_pymupdf(file_content: BinaryIO) -> List[str]:
+        """Extract page texts with PyMuPDF."""
+        pdf = pymupdf.open(stream=file_content.read(), filetype="pdf")
+        try:
+            if pdf.needs_pass:
+                logger.error("PDF is encrypted/password-protected")
+                raise ValueError("The PDF is password-protected. Please upload an unprotected document.")
+
+            pages = []
+            for page_num in range(pdf.page_count):
+                try:
+                    pages.append(pdf[page_num].get_text())
+                except Exception as page_error:
+                    logger.warning(f"Could not extract text from page {page_num}: {str(page_error)}")
+            return pages
+        finally:
+            pdf.close()
+
+    @staticmethod
+    def extract_pages(file_content: Union[bytes, BinaryIO], backend: Optional[str] = None) -> List[str]:
+        """
+        Extract the text of each page of a PDF without any quality checks.
+
+        Args:
+            file_content: The PDF content as bytes or file-like object
+            backend: Backend name, defaults to PDF_TEXT_BACKEND
+
+        Returns:
+            List with the text of every page
+        """
+        # If input is bytes, convert to BytesIO for the PDF libraries
+        if isinstance(file_content, bytes):
+            file_content = BytesIO(file_content)
+
+        extractors: Dict[str, Callable[[BinaryIO], List[str]]] = {
+            "pypdf2": PDFParser._extract_pages_pypdf2,
+            "pdfium": PDFParser._extract_pages_pdfium,
+            "pymupdf": PDFParser._extract_pages_pymupdf,
+        }
+        return extractors[PDFParser.resolve_backend(backend)](file_content)
+
     @staticmethod
-    def extract_text_from_pdf(file_content: Union[bytes, BinaryIO]) -> str:
+    def extract_text_from_pdf(
+        file_content: Union[bytes, BinaryIO],
+        backend: Optional[str] = None,
+        page_separator: str = "\n\n"
+    ) -> str:
         """
         Extract text from a PDF file.
-        
+
         Args:
             file_content: The PDF content as bytes or file-like object
-            
+            backend: Backend name, defaults to PDF_TEXT_BACKEND
+            page_separator: Text placed after every page
+
         Returns:
             Extracted text from the PDF
-            
+
         Raises:
             ValueError: If the PDF is encrypted or cannot be parsed
         """
-        # If input is bytes, convert to BytesIO for PyPDF2
-        if isinstance(file_content, bytes):
-            file_content = BytesIO(file_content)
-            
         try:
-            # Open the PDF with PyPDF2
-            pdf_reader = PyPDF2.PdfReader(file_content)
-            
-            # Check if the PDF is encrypted
-            if pdf_reader.is_encrypted:
-                logger.error("PDF is encrypted/password-protected")
-                raise ValueError("The PDF is password-protected. Please upload an unprotected document.")
-                
             # Extract text from all pages
             text = ""
-            for page_num in range(len(pdf_reader.pages)):
-                try:
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n\n"
-                except Exception as page_error:
-                    logger.warning(f"Could not extract text from page {page_num}: {str(page_error)}")
-                    # Continue with other pages
-            
+            for page_text in PDFParser.extract_pages(file_content, backend):
+                if page_text:
+                    text += page_text + page_separator
+
             # Check if we got any meaningful text
             if not text or len(text.strip()) < 50:
                 logger.warning("Extracted text is too short or empty")
                 raise ValueError("Could not extract meaningful text from the PDF. The document might be scanned images without text, corrupted, or have content restrictions.")
-                            
+
             return text
-            
+
+        except ValueError:
+            raise
         except PyPDF2.errors.PdfReadError as e:
             logger.error(f"PDF read error: {str(e)}")
             if "encrypted" in str(e).lower():
@@ -70,18 +198,22 @@ class PDFParser:
             raise ValueError("Could not process the PDF. The file might be corrupted, password-protected, or in an unsupported format.")
 
 
-def extract_text_from_pdf(file_content: Union[bytes, BinaryIO]) -> str:
+def extract_text_from_pdf(
+    file_content: Union[bytes, BinaryIO],
+    backend: Optional[str] = None,
+    page_separator: str = "\n\n"
+) -> str:
     """
     Convenience function to extract text from PDF.
-    
+
     Raises:
         ValueError: If the PDF cannot be parsed
     """
     try:
-        return PDFParser.extract_text_from_pdf(file_content)
+        return PDFParser.extract_text_from_pdf(file_content, backend, page_separator)
     except ValueError as e:
         # Re-raise the ValueError to maintain the message
         raise e
     except Exception as e:
         # Catch any other exceptions and provide a friendly message
-        raise ValueError(f"Error processing PDF: {str(e)}") 
\ No newline at end of file
+        raise ValueError(f"Error processing PDF: {str(e)}")
@@ -0,0 +1,73 @@
+"""
+Field selection for API responses.
+
+List and detail endpoints take a `fields=` query parameter (comma-separated
+field names) and otherwise use a lean default. The selection is turned into
+a MongoDB projection, so fields nobody asked for are never read from the
+database or serialized. Fields a response model requires are always
+selected, so trimmed responses still validate against the model.
+"""
+
+import re
+from typing import Dict, Iterable, Optional, Set, Type
+
+from pydantic import BaseModel
+
+# Plain (optionally dotted) field names; no operators
+FIELD_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z0-9_]+)*$")
+
+
+def required_fields(model: Type[BaseModel]) -> Set[str]:
+    """Fields a model can't be built without."""
+    return {name for name, field in model.model_fields.items() if field.is_required()}
+
+
+def parse_fields(fields: Optional[str], model: Optional[Type[BaseModel]] = None) -> Optional[Set[str]]:
+    """
+    Field names selected by a `fields=` parameter.
+
+    Args:
+        fields: Comma-separated field names, or None/empty for the default shape
+        model: Response model; the names must be its fields, and its required
+            fields are added
+
+    Returns:
+        Selected field names, or None when no selection was made
+
+    Raises:
+        ValueError: For a field name that is invalid or not in the model
+    """
+    if not fields:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    invalid = {name for name in names if not FIELD_PATTERN.match(name)}
+    if model is not None:
+        invalid |= names - set(model.model_fields)
+    if invalid:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(invalid))}")
+    if model is not None:
+        names |= required_fields(model)
+    return names
+
+
+def mongo_projection(
+    fields: Optional[Iterable[str]],
+    exclude: Iterable[str] = (),
+    id_field: Optional[str] = None
+) -> Optional[Dict[str, int]]:
+    """
+    MongoDB projection reading only the selected fields.
+
+    Args:
+        fields: Selected fields, or None for every field but `exclude`
+        exclude: Fields left out of the default shape
+        id_field: Response field that is filled from the document's _id
+
+    Returns:
+        Projection, or None to read whole documents
+    """
+    if fields is None:
+        return {name: 0 for name in exclude} or None
+    projection = {"_id" if name == id_field else name: 1 for name in fields}
+    projection.setdefault("_id", 0)
+    return projection
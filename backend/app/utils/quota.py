@@ -0,0 +1,59 @@
+"""
+Concurrency and rate limits for calls to a metered API.
+"""
+
+import time
+import asyncio
+from typing import Optional
+
+
+class QuotaGovernor:
+    """
+    Async context manager allowing at most max_concurrency calls at a time
+    and requests_per_minute calls in any sliding minute.
+
+    Callers over the limits wait their turn instead of failing.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_minute: int = 0):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._rate_lock: Optional[asyncio.Lock] = None
+        # Start times of the calls within the last minute
+        self._recent: list = []
+        self.in_use = 0
+
+    async def __aenter__(self):
+        # asyncio primitives belong to one event loop (tests and scripts run several)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._rate_lock = asyncio.Lock()
+            self.in_use = 0
+        await self._semaphore.acquire()
+        try:
+            await self._wait_for_rate()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        self.in_use += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.in_use -= 1
+        self._semaphore.release()
+
+    async def _wait_for_rate(self):
+        if self.requests_per_minute <= 0:
+            return
+        async with self._rate_lock:
+            while True:
+                now = time.monotonic()
+                self._recent = [started for started in self._recent if started > now - 60]
+                if len(self._recent) < self.requests_per_minute:
+                    self._recent.append(now)
+                    return
+                await asyncio.sleep(self._recent[0] + 60 - now)
@@ -0,0 +1,462 @@
+"""
+Deterministic red-flag pre-screen for lease text.
+
+Well-known scam markers (wire transfers, gift-card deposits, crypto payment,
+an owner who is "out of the country", double-rent holdover clauses, ...)
+don't need an LLM to spot. All vocabulary terms are compiled into a single
+Aho-Corasick automaton, so the text is scanned once regardless of how many
+phrases there are, and rules written in a small boolean DSL are evaluated
+per paragraph against the terms found there:
+
+    wire_transfer & (deposit | rent) & !prohibited
+
+`&` binds tighter than `|`, `!` negates, parentheses group. The result is a
+list of preliminary flags and a provisional scam likelihood, typically in a
+millisecond or two for a full lease.
+"""
+
+import re
+import time
+import logging
+from collections import deque
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from app.models.rental import ScamLikelihood
+from app.utils.seed_data import COMMON_FLAGS
+
+logger = logging.getLogger("rent-spiracy")
+
+# Phrase vocabulary referenced by the rules. Phrases are matched on word
+# boundaries after lowercasing and collapsing punctuation to spaces, so
+# "wire-transfer" and "Wire  Transfer" both match "wire transfer".
+TERMS: Dict[str, List[str]] = {
+    "wire_transfer": [
+        "wire transfer", "wire the", "wire it", "wired to", "bank wire", "western union",
+        "moneygram", "money gram", "zelle only", "money order only",
+    ],
+    "gift_card": [
+        "gift card", "gift cards", "itunes card", "google play card", "steam card",
+        "amazon card", "prepaid card", "vanilla card",
+    ],
+    "crypto": [
+        "bitcoin", "btc", "cryptocurrency", "crypto", "ethereum", "usdt", "tether",
+        "crypto wallet", "bitcoin atm",
+    ],
+    "payment": ["payment", "pay", "paid", "send", "transfer", "remit"],
+    "deposit": ["deposit", "security deposit", "holding fee", "holding deposit", "first month", "first and last"],
+    "rent": ["rent", "monthly rent", "rental payment"],
+    "prohibited": [
+        "not accepted", "will not accept", "not be accepted", "never ask", "prohibited",
+        "do not", "shall not", "not permitted",
+    ],
+    "out_of_country": [
+        "out of the country", "out of country", "overseas", "abroad", "missionary work",
+        "on a mission", "deployed",
+    ],
+    # Only phrases about not meeting the tenant; "landlord" or "owner" alone
+    # are in every lease
+    "owner_absent": [
+        "cannot meet", "can't meet", "unable to meet", "not able to meet",
+        "not available to meet", "meet in person", "show you the property myself",
+    ],
+    "keys_by_mail": [
+        "mail the keys", "mail you the keys", "keys will be mailed", "keys will be shipped",
+        "ship the keys", "send you the keys", "keys by mail", "keys via courier",
+    ],
+    "no_showing": [
+        "cannot show", "can't show", "unable to show", "no showings", "no viewing",
+        "no viewings", "without viewing", "sight unseen", "drive by only", "do not disturb the occupants",
+    ],
+    "before_showing": ["before the showing", "before viewing", "before showing", "prior to viewing", "to schedule a viewing", "to hold the property"],
+    "urgency": [
+        "within 24 hours", "within 24hrs", "within 12 hours", "today only", "act fast",
+        "first come first served", "other applicants", "many applicants", "immediately or",
+    ],
+    "no_checks": [
+        "no credit check", "without a credit check", "no background check",
+        "without a background check", "no screening",
+    ],
+    # Banking credentials; an SSN for the credit check or an account number
+    # for automatic rent payments are normal in a lease
+    "bank_details": [
+        "online banking password", "banking password", "bank login", "online banking login",
+        "banking credentials", "bank pin", "atm pin",
+    ],
+    "application_fee": ["application fee", "processing fee", "screening fee"],
+    "excessive_amount": ["non refundable", "nonrefundable", "non-refundable"],
+    "holdover": ["holdover", "hold over", "holds over", "remains in possession", "after the expiration", "after termination"],
+    "double_rent": [
+        "double rent", "double the rent", "double the monthly rent", "twice the rent",
+        "twice the monthly rent", "two times the monthly rent", "two 2 times", "200%",
+    ],
+    "waive": ["waive", "waives", "waiver", "relinquish", "gives up"],
+    "tenant_rights": [
+        "warranty of habitability", "habitability", "right to a jury trial", "jury trial",
+        "right to sue", "legal action", "security deposit return", "notice before entry",
+        "right to withhold rent", "repair and deduct",
+    ],
+    "entry": ["enter the premises", "enter the unit", "entry into the premises", "access the premises", "enter at any time"],
+    "no_notice": ["without notice", "without prior notice", "at any time", "any time without", "no notice"],
+    "all_repairs": ["all repairs", "any and all repairs", "all maintenance", "structural repairs", "all damages regardless"],
+    "tenant": ["tenant", "lessee", "resident"],
+    "lockout": ["change the locks", "remove tenant's belongings", "shut off utilities", "lock out"],
+    "no_lease": ["no lease", "no written lease", "no contract", "verbal agreement only"],
+}
+
+# A rule's `flag` uses the COMMON_FLAGS vocabulary where one fits, so pre-screen
+# flags line up with the flags stored on suspect leasers.
+#
+# (name, expression, flag, severity, description)
+RULES: List[Tuple[str, str, str, str, str]] = [
+    ("wire_payment", "wire_transfer & (payment | deposit | rent) & !prohibited",
+     "asks for wire transfers", "high",
+     "Asks for payment by wire transfer or a money-transfer service, which cannot be reversed."),
+    ("gift_card_payment", "gift_card & (payment | deposit | rent) & !prohibited",
+     "requests security deposit via gift cards", "high",
+     "Asks for payment with gift cards. Legitimate landlords never accept gift cards."),
+    ("crypto_payment", "crypto & (payment | deposit | rent) & !prohibited",
+     "requires payment in cryptocurrency", "high",
+     "Asks for payment in cryptocurrency, which is untraceable and cannot be reversed."),
+    ("absent_owner", "out_of_country & owner_absent",
+     "claims to be out of the country", "high",
+     "The landlord says they are out of the country or otherwise unable to meet in person."),
+    ("keys_by_mail", "keys_by_mail",
+     "unavailable for in-person meetings", "high",
+     "Offers to mail the keys instead of handing them over in person."),
+    ("pay_before_showing", "(payment | deposit) & before_showing",
+     "requests payment before showing property", "high",
+     "Asks for money before you have seen the property."),
+    ("no_tour", "no_showing",
+     "refuses property tour", "medium",
+     "The property cannot be viewed before signing."),
+    ("no_screening", "no_checks",
+     "no background check required", "medium",
+     "No credit or background check, which scammers use to attract applicants quickly."),
+    ("bank_details", "bank_details & !prohibited",
+     "requests bank account information", "high",
+     "Asks for bank login details or other sensitive financial information."),
+    ("excessive_fees", "application_fee & excessive_amount",
+     "excessive application fees", "medium",
+     "Charges a non-refundable application or processing fee."),
+    ("pressure", "urgency & (payment | deposit | rent)",
+     "high-pressure sales tactics", "medium",
+     "Pressures you to pay quickly before you can verify the offer."),
+    ("no_lease", "no_lease",
+     "no lease agreement provided", "medium",
+     "There is no written lease agreement."),
+    ("double_rent_holdover", "holdover & double_rent",
+     "double-rent holdover penalty", "medium",
+     "Charges double rent if you stay past the lease end, which may be an unenforceable penalty."),
+    ("rights_waiver", "waive & tenant_rights & tenant",
+     "waiver of tenant rights", "medium",
+     "Asks you to waive legal rights that usually cannot be waived in a residential lease."),
+    ("entry_without_notice", "entry & no_notice",
+     "entry without notice", "medium",
+     "Lets the landlord enter without notice, most states require advance notice."),
+    ("tenant_all_repairs", "tenant & all_repairs",
+     "tenant responsible for all repairs", "low",
+     "Makes the tenant responsible for all repairs, including ones that are normally the landlord's duty."),
+    ("self_help_eviction", "lockout",
+     "self-help eviction", "high",
+     "Allows lockouts or utility shut-offs, which are illegal in nearly every state."),
+]
+
+SEVERITY_WEIGHTS = {"high": 3, "medium": 1, "low": 0.5}
+
+# Provisional likelihood thresholds on the summed weight of the flags raised
+HIGH_SCORE = 3
+MEDIUM_SCORE = 1
+
+# At least this score, from at least this many distinct high-severity rules
+# including one about the payment channel, is treated as clear-cut: the
+# analysis can skip the LLM call
+CLEAR_CUT_SCORE = 6
+CLEAR_CUT_HIGH_FLAGS = 2
+
+# Untraceable payment or money before a viewing; without one of these a
+# lease is never concluded to be a scam without the LLM
+PAYMENT_CHANNEL_RULES = frozenset({"wire_payment", "gift_card_payment", "crypto_payment", "pay_before_showing"})
+
+# Maximum characters of surrounding paragraph returned with each flag
+SNIPPET_LENGTH = 240
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def _canonical(text: str) -> str:
+    """Lowercase and collapse everything but letters, digits and % to single spaces."""
+    return " " + re.sub(r"[^a-z0-9%]+", " ", text.lower()).strip() + " "
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher: one pass over the text for all patterns."""
+
+    def __init__(self, patterns: Dict[str, Set[str]]):
+        """
+        Args:
+            patterns: Map of pattern string to the ids it reports
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+
+        for pattern, ids in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                state = next_state
+            self._output[state] |= ids
+
+        # Breadth-first construction of the failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (end_index, id) for every pattern occurrence in text."""
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in output[state]:
+                yield index, pattern_id
+
+
+# --- rule DSL -------------------------------------------------------------
+
+Predicate = Callable[[FrozenSet[str]], bool]
+
+_TOKEN_PATTERN = re.compile(r"\s*(?:([A-Za-z_][A-Za-z0-9_]*)|(.))")
+
+
+def _tokenize(expression: str) -> List[str]:
+    tokens = []
+    for name, symbol in _TOKEN_PATTERN.findall(expression):
+        token = name or symbol
+        if token.strip():
+            tokens.append(token)
+    return tokens
+
+
+def compile_rule(expression: str, known_terms: Set[str]) -> Predicate:
+    """
+    Compile a rule expression into a predicate over the set of terms found.
+
+    Grammar:
+        expr   := term ('|' term)*
+        term   := factor ('&' factor)*
+        factor := '!' factor | '(' expr ')' | NAME
+
+    Raises:
+        ValueError: On syntax errors or unknown term names
+    """
+    tokens = _tokenize(expression)
+    position = 0
+
+    def peek() -> Optional[str]:
+        return tokens[position] if position < len(tokens) else None
+
+    def take(expected: Optional[str] = None) -> str:
+        nonlocal position
+        token = peek()
+        if token is None or (expected is not None and token != expected):
+            raise ValueError(f"Invalid rule expression {expression!r}: expected {expected or 'a term'} at token {position}")
+        position += 1
+        return token
+
+    def parse_expr() -> Predicate:
+        options = [parse_term()]
+        while peek() == "|":
+            take("|")
+            options.append(parse_term())
+        if len(options) == 1:
+            return options[0]
+        return lambda found: any(option(found) for option in options)
+
+    def parse_term() -> Predicate:
+        factors = [parse_factor()]
+        while peek() == "&":
+            take("&")
+            factors.append(parse_factor())
+        if len(factors) == 1:
+            return factors[0]
+        return lambda found: all(factor(found) for factor in factors)
+
+    def parse_factor() -> Predicate:
+        token = peek()
+        if token == "!":
+            take("!")
+            inner = parse_factor()
+            return lambda found: not inner(found)
+        if token == "(":
+            take("(")
+            inner = parse_expr()
+            take(")")
+            return inner
+        name = take()
+        if name not in known_terms:
+            raise ValueError(f"Invalid rule expression {expression!r}: unknown term {name!r}")
+        return lambda found: name in found
+
+    predicate = parse_expr()
+    if peek() is not None:
+        raise ValueError(f"Invalid rule expression {expression!r}: unexpected {peek()!r}")
+    return predicate
+
+
+# --- engine ---------------------------------------------------------------
+
+class Rule:
+    """A compiled pre-screen rule."""
+
+    def __init__(self, name: str, expression: str, flag: str, severity: str, description: str, predicate: Predicate):
+        self.name = name
+        self.expression = expression
+        self.flag = flag
+        self.severity = severity
+        self.description = description
+        self.predicate = predicate
+
+    @property
+    def weight(self) -> float:
+        return SEVERITY_WEIGHTS[self.severity]
+
+
+class PrescreenResult:
+    """Preliminary flags and provisional likelihood for a document."""
+
+    def __init__(self, flags: List[Dict[str, str]], score: float, elapsed_ms: float):
+        self.flags = flags
+        self.score = score
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def scam_likelihood(self) -> ScamLikelihood:
+        if self.score >= HIGH_SCORE:
+            return ScamLikelihood.HIGH
+        if self.score >= MEDIUM_SCORE:
+            return ScamLikelihood.MEDIUM
+        return ScamLikelihood.LOW
+
+    @property
+    def clear_cut(self) -> bool:
+        """Whether the markers are strong enough to conclude without the LLM."""
+        high_flags = sum(1 for flag in self.flags if flag["severity"] == "high")
+        payment_channel = any(flag["rule"] in PAYMENT_CHANNEL_RULES for flag in self.flags)
+        return self.score >= CLEAR_CUT_SCORE and high_flags >= CLEAR_CUT_HIGH_FLAGS and payment_channel
+
+    def to_dict(self) -> Dict:
+        return {
+            "scam_likelihood": self.scam_likelihood.value,
+            "score": self.score,
+            "clear_cut": self.clear_cut,
+            "flags": self.flags,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+        }
+
+
+class RedFlagScreen:
+    """Compiled vocabulary and rules; build once, screen many documents."""
+
+    def __init__(
+        self,
+        terms: Dict[str, List[str]] = TERMS,
+        rules: List[Tuple[str, str, str, str, str]] = RULES,
+        common_flags: List[str] = COMMON_FLAGS
+    ):
+        terms = {name: list(phrases) for name, phrases in terms.items()}
+        # Literal COMMON_FLAGS phrases ("asks for wire transfers") are terms too,
+        # and satisfy the rule that reports the same flag
+        flag_terms = {f"flag_{_slug(flag)}": flag for flag in common_flags}
+        for name, phrase in flag_terms.items():
+            terms[name] = [phrase]
+
+        patterns: Dict[str, Set[str]] = {}
+        for name, phrases in terms.items():
+            for phrase in phrases:
+                key = _canonical(phrase)
+                patterns.setdefault(key, set()).add(name)
+        self._matcher = AhoCorasick(patterns)
+
+        known = set(terms)
+        self.rules: List[Rule] = []
+        for name, expression, flag, severity, description in rules:
+            if flag in common_flags:
+                expression = f"({expression}) | flag_{_slug(flag)}"
+            self.rules.append(Rule(name, expression, flag, severity, description, compile_rule(expression, known)))
+
+    def terms_in(self, text: str) -> FrozenSet[str]:
+        """Names of the vocabulary terms present in a piece of text."""
+        return frozenset(term for _, term in self._matcher.iter_matches(_canonical(text)))
+
+    @staticmethod
+    def _paragraphs(text: str) -> List[str]:
+        """Split text into the units rules are evaluated on."""
+        paragraphs = [part.strip() for part in re.split(r"\n\s*\n", text)]
+        return [part for part in paragraphs if part]
+
+    def screen(self, text: str) -> PrescreenResult:
+        """
+        Run every rule over each paragraph of the text.
+
+        Args:
+            text: Extracted (ideally normalized) lease text
+
+        Returns:
+            PrescreenResult with one flag per rule that fired, in rule order
+        """
+        start = time.perf_counter()
+        fired: Dict[str, Dict[str, str]] = {}
+        for paragraph in self._paragraphs(text or ""):
+            found = self.terms_in(paragraph)
+            if not found:
+                continue
+            for rule in self.rules:
+                if rule.name not in fired and rule.predicate(found):
+                    snippet = paragraph if len(paragraph) <= SNIPPET_LENGTH else paragraph[:SNIPPET_LENGTH].rsplit(" ", 1)[0] + "..."
+                    fired[rule.name] = {
+                        "rule": rule.name,
+                        "flag": rule.flag,
+                        "severity": rule.severity,
+                        "description": rule.description,
+                        "text": snippet,
+                    }
+
+        flags = [fired[rule.name] for rule in self.rules if rule.name in fired]
+        score = sum(SEVERITY_WEIGHTS[flag["severity"]] for flag in flags)
+        return PrescreenResult(flags, score, (time.perf_counter() - start) * 1000)
+
+
+_screen: Optional[RedFlagScreen] = None
+
+
+def get_red_flag_screen() -> RedFlagScreen:
+    """The shared, lazily compiled screen."""
+    global _screen
+    if _screen is None:
+        _screen = RedFlagScreen()
+    return _screen
+
+
+def prescreen_document(text: str) -> PrescreenResult:
+    """
+    Convenience function to pre-screen lease text for known scam markers.
+    """
+    return get_red_flag_screen().screen(text)
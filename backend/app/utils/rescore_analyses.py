@@ -0,0 +1,139 @@
+"""
+Rescore stored analyses after the trust-scoring rules change.
+
+Run after deploying new rules in app.utils.trust_scoring:
+
+    python -m app.utils.rescore_analyses [--dry-run]
+
+Stored analyses were scored from their scam likelihood and number of
+simplified clauses, so only those fields and the current scores are read,
+in cursor batches of RESCORE_BATCH_SIZE. Each batch is scored at once with
+score_batch and the analyses whose score, grade or risk level changed are
+written back with an unordered bulk_write while the next batch is read.
+The precomputed template analyses are rescored the same way.
+
+Workers keep serialized analyses and template analyses in memory, so
+restart them once the job is done.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.utils.db import Database, get_collection
+from app.utils.template_analyses import TEMPLATE_ANALYSES_COLLECTION
+from app.utils.trust_scoring import score_batch
+
+logger = logging.getLogger("rent-spiracy")
+
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "5000"))
+
+# Collection -> path of the analysis within its documents
+RESCORE_COLLECTIONS = {
+    "analyses": "",
+    TEMPLATE_ANALYSES_COLLECTION: "analysis.",
+}
+
+SCORE_FIELDS = ("trustworthiness_score", "trustworthiness_grade", "risk_level")
+
+
+def _scoring_inputs(prefix: str) -> List[Dict[str, Any]]:
+    """Aggregation reading only what scoring needs, with the clause count computed by the server."""
+    clauses = f"${prefix}simplified_clauses"
+    return [{
+        "$project": {
+            "scam_likelihood": f"${prefix}scam_likelihood",
+            "clause_count": {"$cond": [{"$isArray": clauses}, {"$size": clauses}, 0]},
+            **{field: f"${prefix}{field}" for field in SCORE_FIELDS},
+        }
+    }]
+
+
+def _changed_scores(batch: List[Dict[str, Any]], prefix: str) -> List[UpdateOne]:
+    """Updates for the analyses of a batch whose scores differ under the current rules."""
+    scores, grades, risk_levels = score_batch(
+        [document.get("scam_likelihood") for document in batch],
+        [document["clause_count"] for document in batch]
+    )
+    updates = []
+    for document, score, grade, risk_level in zip(batch, scores.tolist(), grades.tolist(), risk_levels.tolist()):
+        new = {"trustworthiness_score": score, "trustworthiness_grade": grade, "risk_level": risk_level}
+        if any(document.get(field) != new[field] for field in SCORE_FIELDS):
+            updates.append(UpdateOne(
+                {"_id": document["_id"]},
+                {"$set": {f"{prefix}{field}": value for field, value in new.items()}}
+            ))
+    return updates
+
+
+async def rescore_collection(
+    collection_name: str,
+    prefix: str = "",
+    batch_size: int = RESCORE_BATCH_SIZE,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Rescore every analysis in a collection.
+
+    Args:
+        collection_name: Collection holding analyses
+        prefix: Path of the analysis fields within each document ("" for top level)
+        batch_size: Documents scored and written per batch
+        dry_run: Count the changes without writing them
+
+    Returns:
+        Counts of analyses scanned and changed
+    """
+    collection = await get_collection(collection_name)
+    cursor = collection.aggregate(_scoring_inputs(prefix), batchSize=batch_size)
+    counts = {"scanned": 0, "changed": 0}
+    writing: Optional[asyncio.Task] = None
+
+    async def flush(batch: List[Dict[str, Any]]) -> None:
+        nonlocal writing
+        updates = _changed_scores(batch, prefix)
+        counts["scanned"] += len(batch)
+        counts["changed"] += len(updates)
+        # One write in flight at a time, overlapping the read of the next batch
+        if writing is not None:
+            await writing
+            writing = None
+        if updates and not dry_run:
+            writing = asyncio.create_task(collection.bulk_write(updates, ordered=False))
+
+    batch: List[Dict[str, Any]] = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+            logger.info(f"Rescored {counts['scanned']} {collection_name} ({counts['changed']} changed)")
+    if batch:
+        await flush(batch)
+    if writing is not None:
+        await writing
+    return counts
+
+
+async def rescore_analyses(dry_run: bool = False) -> None:
+    """Rescore the stored and template analyses"""
+    print("Connecting to database...")
+    await Database.connect_db()
+    try:
+        for collection_name, prefix in RESCORE_COLLECTIONS.items():
+            started = time.perf_counter()
+            counts = await rescore_collection(collection_name, prefix, dry_run=dry_run)
+            print(
+                f"{collection_name}: {counts['scanned']} scanned, {counts['changed']} "
+                f"{'would change' if dry_run else 'changed'} in {time.perf_counter() - started:.1f}s"
+            )
+    finally:
+        await Database.close_db()
+
+if __name__ == "__main__":
+    asyncio.run(rescore_analyses(dry_run="--dry-run" in sys.argv[1:]))
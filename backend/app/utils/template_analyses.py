@@ -0,0 +1,97 @@
+"""
+Precomputed analyses of the built-in template leases.
+
+The listing-URL and property-address flows analyze one of the template
+leases, so the Gemini analysis of each template is computed once per
+language and served from memory. Entries are keyed by a hash of the exact
+prompt, so any change to the prompt or a template gives new keys and the
+analyses are recomputed. Computed analyses are also kept in the
+`template_analyses` collection so restarts and other workers reuse them.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.models.rental import AnalysisResult
+from app.utils.db import get_collection
+from app.utils.gemini_service import GeminiService
+
+logger = logging.getLogger("rent-spiracy")
+
+# Compute missing template analyses in the background at startup (true/false)
+TEMPLATE_WARMUP = os.getenv("TEMPLATE_WARMUP", "true").lower() != "false"
+
+TEMPLATE_ANALYSES_COLLECTION = "template_analyses"
+
+# Per-request fields, set when a template analysis is served
+REQUEST_FIELDS = {
+    "id", "created_at", "preliminary_flags", "previous_analysis_id",
+    "changed_clauses", "suspect_leaser_matches", "partial", "lease_cluster_id",
+}
+
+
+def template_key(document_content: str, language) -> str:
+    """Version key of a template analysis: hash of the prompt Gemini would get."""
+    prompt = GeminiService._generate_rental_analysis_prompt(document_content=document_content, language=language)
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class TemplateAnalysisCache:
+    """Template analyses by prompt key, in memory and in MongoDB."""
+
+    _analyses: Dict[str, Dict[str, Any]] = {}
+    # document text and language -> prompt key, so serving doesn't rebuild the prompt
+    _keys: Dict[tuple, str] = {}
+
+    @classmethod
+    def key(cls, document_content: str, language) -> str:
+        language = getattr(language, "value", language)
+        cache_key = (hashlib.sha256(document_content.encode("utf-8")).hexdigest(), language)
+        if cache_key not in cls._keys:
+            cls._keys[cache_key] = template_key(document_content, language)
+        return cls._keys[cache_key]
+
+    @classmethod
+    def get(cls, document_content: str, language) -> Optional[Dict[str, Any]]:
+        """The precomputed analysis fields for a template, if it's in memory."""
+        return cls._analyses.get(cls.key(document_content, language))
+
+    @classmethod
+    async def load(cls, document_content: str, language) -> Optional[Dict[str, Any]]:
+        """Look a template analysis up in memory, then in the database."""
+        key = cls.key(document_content, language)
+        if key in cls._analyses:
+            return cls._analyses[key]
+        try:
+            collection = await get_collection(TEMPLATE_ANALYSES_COLLECTION)
+            document = await collection.find_one({"_id": key})
+        except Exception as e:
+            logger.warning(f"Template analysis lookup failed: {str(e)}")
+            return None
+        if document is not None:
+            cls._analyses[key] = document["analysis"]
+        return cls._analyses.get(key)
+
+    @classmethod
+    async def store(cls, document_content: str, language, result: AnalysisResult) -> None:
+        """Keep the request-independent fields of a template analysis."""
+        key = cls.key(document_content, language)
+        analysis = json.loads(result.json(exclude=REQUEST_FIELDS))
+        cls._analyses[key] = analysis
+        try:
+            collection = await get_collection(TEMPLATE_ANALYSES_COLLECTION)
+            await collection.replace_one(
+                {"_id": key},
+                {
+                    "analysis": analysis,
+                    "language": getattr(language, "value", language),
+                    "updated_at": datetime.now().isoformat()
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Template analysis write failed: {str(e)}")
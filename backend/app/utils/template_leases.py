@@ -0,0 +1,75 @@
+"""
+Built-in template leases used when a user provides no lease document.
+"""
+
+# Analyzed for the listing-URL and property-address flows; their analyses are
+# precomputed per language (see template_analyses)
+TEMPLATE_LEASES = [
+    """RESIDENTIAL LEASE AGREEMENT
+
+This Residential Lease Agreement ("Agreement") is made and entered into this ___ day of ________, 20__, by and between _____________ ("Landlord") and _____________ ("Tenant").
+
+1. PROPERTY: Landlord leases to Tenant the residential property located at: _________________________________ ("Property").
+
+2. TERM: This Agreement shall commence on _________, 20__ and continue until _________, 20__ ("Lease Term").
+
+3. RENT: Tenant agrees to pay Landlord the sum of $________ per month as rent, due on the 1st day of each month.
+
+4. SECURITY DEPOSIT: Tenant shall pay a security deposit of $________ upon execution of this Agreement.
+
+5. UTILITIES: Tenant shall be responsible for payment of all utilities and services, except: ________________.
+
+6. OCCUPANCY: The Property shall be occupied only by Tenant and the following persons: _________________.
+
+7. MAINTENANCE: Tenant shall maintain the Property in good, clean condition and shall not make alterations without Landlord's written consent.
+
+8. ENTRY: Landlord may enter the Property at reasonable times with 24 hours' notice to inspect, make repairs, or show to prospective tenants.
+
+9. PETS: No pets shall be kept on the Property without Landlord's written consent.
+
+10. TERMINATION: If Tenant fails to comply with any terms of this Agreement, Landlord may terminate this Agreement.
+
+11. ATTORNEY'S FEES: In any action to enforce this Agreement, the prevailing party shall be entitled to reasonable attorney's fees.
+
+12. ADDITIONAL TERMS: _________________________________________________
+
+________________________________
+Tenant                 Date
+
+________________________________
+Landlord              Date""",
+
+    """LEASE AGREEMENT
+
+THIS LEASE is made on [DATE] between [LANDLORD NAME] (hereinafter "Landlord") and [TENANT NAME] (hereinafter "Tenant").
+
+1. PREMISES: Landlord hereby leases to Tenant the premises located at [ADDRESS] ("the Premises").
+
+2. TERM: The term of this lease shall be for [LENGTH], beginning on [START DATE] and ending on [END DATE].
+
+3. RENT: Tenant agrees to pay $[AMOUNT] per month, payable in advance on the first day of each month.
+
+4. LATE CHARGES: If rent is not paid by the 5th day of the month, Tenant shall pay a late fee of $50 plus $10 per day until paid in full.
+
+5. SECURITY DEPOSIT: Upon execution of this lease, Tenant shall deposit with Landlord the sum of $[AMOUNT] as security for the performance of Tenant's obligations under this lease.
+
+6. UTILITIES: Tenant shall pay for all utilities and services except for: [LIST EXCEPTIONS IF ANY].
+
+7. OCCUPANTS: The Premises shall be occupied solely by Tenant and [NAMES OF ADDITIONAL OCCUPANTS, IF ANY].
+
+8. PETS: No pets shall be kept on the Premises without prior written consent of the Landlord.
+
+9. REPAIRS AND MAINTENANCE: Tenant acknowledges that the Premises are in good order and repair. Tenant shall be responsible for all repairs required due to Tenant's negligence.
+
+10. RIGHT OF ENTRY: Landlord may enter the Premises at reasonable hours to inspect, make repairs, or show the Premises to prospective tenants or buyers.
+
+11. ASSIGNMENT AND SUBLETTING: Tenant shall not assign this lease or sublet any portion of the Premises without prior written consent of the Landlord.
+
+12. TENANT'S HOLD OVER: If Tenant remains in possession after expiration of the term, Tenant shall become a tenant at sufferance and shall pay double rent.
+
+13. ATTORNEY'S FEES: In case of any legal action to enforce this Agreement, the prevailing party shall be entitled to attorney's fees.
+
+Tenant: ________________________ Date: ________
+
+Landlord: ______________________ Date: ________"""
+]
@@ -0,0 +1,212 @@
+"""
+Deterministic clean-up of extracted lease text before it is sent to Gemini.
+
+PDF extraction and OCR leave a lot of text that costs prompt tokens without
+carrying meaning: page headers/footers repeated on every page, page numbers,
+hyphenated and hard-wrapped lines, OCR noise, long runs of underscores from
+blank signature lines and duplicated whitespace. `normalize_lease_text`
+removes them while keeping everything the analysis relies on (clause numbers,
+amounts, and the fact that a field was left blank).
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+# Repeated lines longer than this are real content, not headers/footers
+MAX_HEADER_LINE_LENGTH = 100
+
+# Lines at the top/bottom of a page (split on form feeds) that are checked for
+# running headers and footers
+PAGE_EDGE_LINES = 3
+
+PAGE_BREAK = "\f"
+
+# Line-start patterns for clause headings and list items, which must never be
+# merged into the previous line
+LIST_ITEM_PATTERN = re.compile(
+    r"^\s*(\(?[0-9]{1,3}[\.\)]|\(?[a-zA-Z][\.\)]\s|\(?[ivxlcIVXLC]{1,5}[\.\)]\s|[-*•]\s|section\b|article\b)",
+    re.IGNORECASE
+)
+
+PAGE_NUMBER_PATTERN = re.compile(
+    r"^\s*(page\s*\d+(\s*(of|/)\s*\d+)?|-?\s*\d{1,3}\s*-?|\d{1,3}\s*(of|/)\s*\d{1,3})\s*$",
+    re.IGNORECASE
+)
+
+CONTROL_CHARS_PATTERN = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b-\u200f\ufeff]")
+
+# Gemini averages about four characters per token for English text
+CHARS_PER_TOKEN = 4
+
+
+def _header_key(line: str) -> str:
+    """Key used to recognise the same header/footer on different pages."""
+    return re.sub(r"\s+", " ", line.strip().lower())
+
+
+def _is_noise_line(line: str) -> bool:
+    """Whether a line is OCR debris rather than text."""
+    stripped = line.strip()
+    if not stripped or "___" in stripped:
+        return False
+    alnum = sum(1 for ch in stripped if ch.isalnum())
+    if alnum == 0:
+        return True
+    # Short fragments that are mostly symbols, e.g. "| ~ ." from a page edge
+    return len(stripped) <= 6 and alnum / len(stripped) < 0.5 and not LIST_ITEM_PATTERN.match(stripped)
+
+
+def _collapse_fill_runs(line: str) -> str:
+    """Shorten blank-field runs (underscores, dot leaders, rules) to 3 characters."""
+    line = re.sub(r"_{3,}", "___", line)
+    line = re.sub(r"(?:_\s+){2,}_", "___", line)
+    line = re.sub(r"(?:\.\s?){4,}", "... ", line)
+    line = re.sub(r"([-=*~])\1{3,}", r"\1\1\1", line)
+    return line
+
+
+def _page_edges(lines: List[str]) -> Tuple[Set[int], Counter]:
+    """
+    Lines at the top/bottom of each page.
+
+    Returns:
+        Indexes of the first/last PAGE_EDGE_LINES non-blank lines of every
+        page, and on how many pages each line appears among them
+    """
+    pages: List[List[int]] = [[]]
+    for index, line in enumerate(lines):
+        if line == PAGE_BREAK:
+            pages.append([])
+        elif line.strip():
+            pages[-1].append(index)
+
+    edges: Set[int] = set()
+    edge_counts: Counter = Counter()
+    if len([page for page in pages if page]) < 2:
+        return edges, edge_counts
+    for page in pages:
+        page_edges = set(page[:PAGE_EDGE_LINES] + page[-PAGE_EDGE_LINES:])
+        edges |= page_edges
+        edge_counts.update({_header_key(lines[index]) for index in page_edges})
+    return edges, edge_counts
+
+
+def _remove_repeated_lines(lines: List[str]) -> List[str]:
+    """
+    Drop page headers, footers and page numbers.
+
+    Only lines at the edge of a page are candidates, so body text is never
+    touched, however often it repeats. A page number there is dropped; a
+    short line found at the edge of two or more pages is a running header
+    or footer and only its first occurrence is kept. Text without page
+    breaks is left as is.
+    """
+    edges, edge_counts = _page_edges(lines)
+    seen = set()
+    result = []
+    for index, line in enumerate(lines):
+        if line == PAGE_BREAK:
+            continue
+        if index in edges:
+            if PAGE_NUMBER_PATTERN.match(line):
+                continue
+            key = _header_key(line)
+            if edge_counts.get(key, 0) >= 2 and len(line.strip()) <= MAX_HEADER_LINE_LENGTH and "___" not in line:
+                if key in seen:
+                    continue
+                seen.add(key)
+        result.append(line)
+    return result
+
+
+def _join_wrapped_lines(lines: List[str]) -> List[str]:
+    """Undo hyphenation and hard line wraps inside paragraphs."""
+    result: List[str] = []
+    for line in lines:
+        if result and line and result[-1]:
+            previous = result[-1]
+            # "prem-" + "ises" -> "premises"
+            if re.search(r"[a-zA-Z]-$", previous) and re.match(r"[a-z]", line) and not LIST_ITEM_PATTERN.match(line):
+                result[-1] = previous[:-1] + line
+                continue
+            # A line that ends mid-sentence followed by a lowercase continuation,
+            # or by a number continuing a phrase ("until May" + "31, 2024")
+            continues = (
+                re.match(r"[a-z(\"'$]", line)
+                or (re.match(r"[0-9]", line) and re.search(r"[a-z,]$", previous))
+            )
+            if continues and not re.search(r"[.:;!?]$", previous) and not LIST_ITEM_PATTERN.match(line):
+                result[-1] = previous + " " + line
+                continue
+        result.append(line)
+    return result
+
+
+def normalize_lease_text(text: str) -> str:
+    """
+    Normalize extracted lease text to reduce prompt tokens.
+
+    The transformation is deterministic and idempotent:
+    normalize_lease_text(normalize_lease_text(t)) == normalize_lease_text(t).
+
+    Args:
+        text: Raw text from PDF extraction, OCR or a text upload
+
+    Returns:
+        The cleaned text
+    """
+    if not text:
+        return text
+
+    # Canonical characters: ligatures, full-width forms, non-breaking spaces
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # Keep page breaks as marker lines until headers/footers have been removed
+    text = text.replace(PAGE_BREAK, "\n" + PAGE_BREAK + "\n")
+
+    lines = []
+    for line in text.split("\n"):
+        if line == PAGE_BREAK:
+            lines.append(line)
+            continue
+        line = CONTROL_CHARS_PATTERN.sub("", line)
+        line = _collapse_fill_runs(line)
+        # Collapse runs of spaces/tabs, indentation carries no meaning for the model
+        line = re.sub(r"[ \t]+", " ", line).strip()
+        if _is_noise_line(line):
+            continue
+        lines.append(line)
+
+    lines = _remove_repeated_lines(lines)
+    lines = _join_wrapped_lines(lines)
+
+    # At most one blank line between paragraphs
+    text = "\n".join(lines)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt-token estimate for Gemini."""
+    return -(-len(text or "") // CHARS_PER_TOKEN)
+
+
+def normalization_stats(original: str, normalized: str) -> Dict[str, float]:
+    """Size reduction achieved by normalization."""
+    before_tokens = estimate_tokens(original)
+    after_tokens = estimate_tokens(normalized)
+    return {
+        "chars_before": len(original),
+        "chars_after": len(normalized),
+        "tokens_before": before_tokens,
+        "tokens_after": after_tokens,
+        "token_reduction_pct": round(100 * (1 - after_tokens / before_tokens), 1) if before_tokens else 0.0,
+    }
+
+
+def normalize_with_stats(text: str) -> Tuple[str, Dict[str, float]]:
+    """Normalize text and report how much it shrank."""
+    normalized = normalize_lease_text(text)
+    return normalized, normalization_stats(text, normalized)
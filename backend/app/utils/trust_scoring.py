@@ -0,0 +1,125 @@
+"""
+Trustworthiness scoring of analysis results.
+
+The score starts from the scam likelihood and is adjusted for the number of
+concerning clauses; the grade and risk level follow from the score. The
+rules live in the tables below so a single result (score_analysis) and a
+whole batch of stored analyses (score_batch, NumPy-vectorized for the
+rescoring job) are always scored the same way.
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from app.models.rental import RiskLevel, TrustworthinessGrade
+
+# Base score by scam likelihood - MORE GENEROUS STARTING POINTS
+BASE_SCORES = {
+    "LOW": 90,     # Increased from 85
+    "MEDIUM": 70,  # Increased from 60
+    "HIGH": 40     # Increased from 30
+}
+DEFAULT_BASE_SCORE = 60  # Unknown likelihood (was 50)
+
+# (most concerning clauses, adjustment) - LESS SEVERE PENALTIES
+CLAUSE_ADJUSTMENTS = [
+    (0, 10),    # Bonus for no concerning clauses
+    (1, 0),     # Single concern is normal, no penalty
+    (3, -5),    # Minor concerns
+    (6, -10),   # Moderate concerns (was -15)
+]
+MANY_CLAUSES_ADJUSTMENT = -20  # Serious concerns (was -25)
+
+# (lowest score, grade) - MORE RELAXED GRADING
+GRADE_THRESHOLDS = [
+    (85, TrustworthinessGrade.A),  # Was 90
+    (75, TrustworthinessGrade.B),  # Was 80
+    (55, TrustworthinessGrade.C),  # Was 60
+    (35, TrustworthinessGrade.D),  # Was 40
+]
+LOWEST_GRADE = TrustworthinessGrade.F
+
+# (lowest score, risk level) - MORE RELAXED RISK ASSESSMENT
+RISK_THRESHOLDS = [
+    (75, RiskLevel.LOW_RISK),     # Was 80
+    (55, RiskLevel.MEDIUM_RISK),  # Was 60
+    (25, RiskLevel.HIGH_RISK),    # Was 30
+]
+HIGHEST_RISK = RiskLevel.VERY_HIGH_RISK
+
+
+def _likelihood_key(scam_likelihood) -> str:
+    # Accepts the enum, its name ("LOW") or its value ("Low")
+    return str(getattr(scam_likelihood, "value", scam_likelihood) or "").upper()
+
+
+def score_analysis(scam_likelihood, concerning_clauses_count: int) -> Tuple[int, TrustworthinessGrade, RiskLevel]:
+    """
+    Calculate trustworthiness score, grade, and risk level of one analysis.
+
+    Args:
+        scam_likelihood: ScamLikelihood, or its name or value
+        concerning_clauses_count: Number of concerning clauses found
+
+    Returns:
+        (score 0-100, grade, risk level)
+    """
+    base_score = BASE_SCORES.get(_likelihood_key(scam_likelihood), DEFAULT_BASE_SCORE)
+
+    adjustment = MANY_CLAUSES_ADJUSTMENT
+    for most_clauses, clause_adjustment in CLAUSE_ADJUSTMENTS:
+        if concerning_clauses_count <= most_clauses:
+            adjustment = clause_adjustment
+            break
+
+    # Keep within the 0-100 range
+    score = max(0, min(100, base_score + adjustment))
+
+    grade = next((grade for lowest, grade in GRADE_THRESHOLDS if score >= lowest), LOWEST_GRADE)
+    risk_level = next((risk for lowest, risk in RISK_THRESHOLDS if score >= lowest), HIGHEST_RISK)
+    return score, grade, risk_level
+
+
+def score_batch(
+    scam_likelihoods: Sequence,
+    concerning_clauses_counts: Sequence[int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score many analyses at once, with the same rules as score_analysis.
+
+    Args:
+        scam_likelihoods: Scam likelihood of each analysis (enum, name or value)
+        concerning_clauses_counts: Concerning clause count of each analysis
+
+    Returns:
+        Arrays of scores (int), grade values and risk level values (str)
+    """
+    likelihoods = np.array([_likelihood_key(likelihood) for likelihood in scam_likelihoods], dtype=str)
+    counts = np.asarray(concerning_clauses_counts, dtype=np.int64)
+    if likelihoods.shape != counts.shape:
+        raise ValueError("scam_likelihoods and concerning_clauses_counts must have the same length")
+
+    base_scores = np.select(
+        [likelihoods == key for key in BASE_SCORES],
+        list(BASE_SCORES.values()),
+        default=DEFAULT_BASE_SCORE
+    )
+    adjustments = np.select(
+        [counts <= most_clauses for most_clauses, _ in CLAUSE_ADJUSTMENTS],
+        [adjustment for _, adjustment in CLAUSE_ADJUSTMENTS],
+        default=MANY_CLAUSES_ADJUSTMENT
+    )
+    scores = np.clip(base_scores + adjustments, 0, 100)
+
+    grades = np.select(
+        [scores >= lowest for lowest, _ in GRADE_THRESHOLDS],
+        [grade.value for _, grade in GRADE_THRESHOLDS],
+        default=LOWEST_GRADE.value
+    )
+    risk_levels = np.select(
+        [scores >= lowest for lowest, _ in RISK_THRESHOLDS],
+        [risk.value for _, risk in RISK_THRESHOLDS],
+        default=HIGHEST_RISK.value
+    )
+    return scores, grades, risk_levels
@@ -0,0 +1,28 @@
+"""
+Precompute the template lease analyses for every language.
+
+Run at deploy time so the first listing/address analyses are already
+served from the stored analyses:
+
+    python -m app.utils.warm_templates
+"""
+
+import asyncio
+from app.utils.db import Database
+from app.utils.write_behind import analysis_write_buffer
+from app.services.analysis_service import AnalysisService
+
+
+async def warm_templates():
+    """Compute and store the missing template analyses"""
+    print("Connecting to database...")
+    await Database.connect_db()
+    try:
+        computed = await AnalysisService.warm_up_templates()
+        print(f"Template analyses computed: {computed}")
+    finally:
+        await analysis_write_buffer.stop()
+        await Database.close_db()
+
+if __name__ == "__main__":
+    asyncio.run(warm_templates())
@@ -0,0 +1,216 @@
+"""
+Write-behind buffer for MongoDB inserts.
+
+Documents are acknowledged as soon as they are buffered and written in the
+background with insert_many, in batches of WRITE_BEHIND_BATCH_SIZE or every
+WRITE_BEHIND_FLUSH_INTERVAL seconds, whichever comes first. Transient
+database errors are retried; documents stay readable from the buffer until
+they are written, and the buffer is drained on shutdown. Large text fields
+are moved to the blob store as part of the flush, not before buffering.
+
+Single writes that don't fit a buffer (upserts of caches and statistics)
+are taken off the request path with write_in_background.
+"""
+
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Coroutine, Dict, List, Optional, Set, Tuple
+
+from pymongo.errors import AutoReconnect, BulkWriteError, ConnectionFailure, NetworkTimeout
+
+from app.utils.db import get_collection
+from app.utils.blob_store import offload_fields
+
+logger = logging.getLogger("rent-spiracy")
+
+# Set to false to insert analysis results on the request path
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() != "false"
+
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "50"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1.0"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "3"))
+
+# Documents held while the database is unreachable; the oldest are dropped beyond this
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+
+# Errors worth retrying; ConnectionError is raised while the client isn't connected
+TRANSIENT_ERRORS = (AutoReconnect, ConnectionFailure, NetworkTimeout, ConnectionError)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class WriteBehindBuffer:
+    """Buffered, batched inserts into one collection."""
+
+    def __init__(
+        self,
+        collection_name: str,
+        key_field: str = "id",
+        blob_fields: Tuple[str, ...] = (),
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        max_retries: int = WRITE_BEHIND_MAX_RETRIES,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING
+    ):
+        self.collection_name = collection_name
+        self.key_field = key_field
+        # Text fields moved to the blob store when written (see offload_fields)
+        self.blob_fields = blob_fields
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        # key -> document, in insertion order; a document leaves only once written
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.written = 0
+        self.dropped = 0
+
+    def add(self, document: Dict[str, Any]) -> None:
+        """Buffer a document for insertion; returns immediately."""
+        self._pending[document[self.key_field]] = document
+        while len(self._pending) > self.max_pending:
+            key, _ = self._pending.popitem(last=False)
+            self.dropped += 1
+            logger.error(f"Write-behind buffer for {self.collection_name} full, dropped {key}")
+
+        if self._task is None or self._task.done():
+            self.start()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A document that is buffered but not written yet."""
+        return self._pending.get(key)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        """Start the background flusher (needs a running event loop)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        await self.flush()
+        if self._pending:
+            logger.error(f"Write-behind buffer for {self.collection_name}: {len(self._pending)} documents could not be written")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush for {self.collection_name} failed: {str(e)}")
+
+    async def flush(self) -> int:
+        """
+        Write all buffered documents in batches.
+
+        Returns:
+            Number of documents written
+        """
+        written = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch = list(self._pending.values())[:self.batch_size]
+                if not await self._write_batch(batch):
+                    # Database unavailable, keep the rest for the next flush
+                    break
+                for document in batch:
+                    # Unless re-added with new content while the batch was in flight
+                    if self._pending.get(document[self.key_field]) is document:
+                        del self._pending[document[self.key_field]]
+                written += len(batch)
+        self.written += written
+        return written
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """
+        insert_many one batch, retrying transient errors with backoff.
+
+        Returns:
+            True if the batch is done with (written, or failed permanently and
+            logged), False if the database stayed unreachable
+        """
+        # insert_many sets _id on the documents it is given; keep the buffered ones clean
+        documents = [dict(document) for document in batch]
+        if self.blob_fields:
+            await asyncio.gather(*(offload_fields(document, self.blob_fields) for document in documents))
+        for attempt in range(self.max_retries + 1):
+            try:
+                collection = await get_collection(self.collection_name)
+                await collection.insert_many(documents, ordered=False)
+                return True
+            except BulkWriteError as e:
+                # Documents written by an earlier attempt come back as duplicates
+                errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY_ERROR]
+                if errors:
+                    logger.error(f"Write-behind insert into {self.collection_name}: {len(errors)} documents rejected: {errors[0].get('errmsg')}")
+                return True
+            except TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries:
+                    logger.warning(f"Write-behind insert into {self.collection_name} failed after {attempt + 1} attempts: {str(e)}")
+                    return False
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+            except Exception as e:
+                logger.error(f"Write-behind insert into {self.collection_name} failed, dropping {len(batch)} documents: {str(e)}")
+                self.dropped += len(batch)
+                return True
+        return False
+
+
+# Database writes running in the background, referenced until they finish
+_background_writes: Set[asyncio.Task] = set()
+
+
+def write_in_background(write: Coroutine, description: str) -> None:
+    """
+    Run a database write without waiting for it; a failure is logged.
+
+    Args:
+        write: Coroutine doing the write
+        description: What is written, for the log
+    """
+    task = asyncio.get_running_loop().create_task(write)
+    _background_writes.add(task)
+
+    def finished(task: asyncio.Task) -> None:
+        _background_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"{description} failed: {str(task.exception())}")
+
+    task.add_done_callback(finished)
+
+
+async def drain_background_writes() -> None:
+    """Wait for the background writes still running (on shutdown)."""
+    if _background_writes:
+        await asyncio.gather(*list(_background_writes), return_exceptions=True)
+
+
+# Analysis results, served from here by id until they are written; the raw
+# Gemini response goes to the blob store with the batch
+analysis_write_buffer = WriteBehindBuffer("analyses", blob_fields=("raw_response",))
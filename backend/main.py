@@ -2,6 +2,10 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.utils.db import Database
+from app.utils.listing_fetcher import ListingFetcher
+from app.utils.write_behind import analysis_write_buffer, drain_background_writes
+from app.services.analysis_service import AnalysisService
+from app.utils.deadline import request_deadline, timeout_from_header, DEADLINE_HEADER
 from app.routers import analysis, file_upload, documents, health, lawyers, suspect_leasers
 import uvicorn
 import os
@@ -85,6 +89,13 @@ async def log_and_add_security_headers(request: Request, call_next):
     
     return response
 
+# Give every request a time budget (X-Request-Timeout header or REQUEST_TIMEOUT);
+# OCR, listing fetches and Gemini calls made for the request stop when it runs out
+@app.middleware("http")
+async def apply_request_deadline(request: Request, call_next):
+    with request_deadline(timeout_from_header(request.headers.get(DEADLINE_HEADER))):
+        return await call_next(request)
+
 # Register routers - use the routers from the imports
 app.include_router(file_upload.router)
 app.include_router(analysis.router)
@@ -105,16 +116,23 @@ async def startup_db_client():
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         # Continue anyway, as we can still function with mock data
+    analysis_write_buffer.start()
+    # Precompute the template lease analyses served to listing/address flows
+    AnalysisService.start_template_warm_up()
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     logger.info("Shutting down Rent-Spiracy API")
+    # Write out buffered analysis results while the connection is still open
+    await drain_background_writes()
+    await analysis_write_buffer.stop()
     try:
         await Database.close_db()
         logger.info("Disconnected from database")
     except Exception as e:
         logger.error(f"Error during database disconnect: {str(e)}")
+    await ListingFetcher.close()
 
 
 @app.get("/")